@@ -3,25 +3,32 @@ from __future__ import print_function, division
 import sys
 import os
 from arch import compute_routing_usage
-from arch import parse_routing
+from arch import RouteIndex
 from arch import compute_total_wire
-from arch import parse_placement, parse_cgra, compute_area_usage
-from arch.cgra_route import parse_routing_resource, build_routing_resource
+from arch import parse_placement, compute_area_usage, ArchModel
+from arch import load_packed_file, read_netlist_json
+from arch.cgra_timing import TimingGraph, DELAY_TYPES, get_blk_timing_types
+
+NUM_CRITICAL_PATHS = 3
 
 
 def main():
-    if len(sys.argv) != 4:
+    if len(sys.argv) != 4 and len(sys.argv) != 5:
         print("Usage:", sys.argv[0], "<cgra_info.txt>", "<netlist.json>",
-              "<netlist.route>",
+              "<netlist.route>", "[num_critical_paths]",
               file=sys.stderr)
         exit(1)
     cgra_file = sys.argv[1]
     netlist = sys.argv[2]
     route_file = sys.argv[3]
+    num_paths = int(sys.argv[4]) if len(sys.argv) == 5 else \
+        NUM_CRITICAL_PATHS
     packed_file = route_file.replace(".route", ".packed")
     placement_file = route_file.replace(".route", ".place")
-    board_layout = parse_cgra(cgra_file)["CGRA"]
-    routing_result = parse_routing(route_file)
+    arch_model = ArchModel(cgra_file)
+    board_layout = arch_model.get_layout()
+    # nets are only turned into lists when the timing analysis asks for them
+    routing_result = RouteIndex.open(route_file)
     placement, _ = parse_placement(placement_file)
 
     if hasattr(sys.stdout, 'isatty') and sys.stdout.isatty():
@@ -49,12 +56,41 @@ def main():
     total_wire = sum([net_wire[x] for x in net_wire])
     print("Total wire:", total_wire)
 
-    # timing removed for future development
+    print("-" * cols)
+    netlists, folded_blocks, id_to_name, changed_pe = \
+        load_packed_file(packed_file)
+    blk_types = {}
+    if os.path.isfile(netlist):
+        _, instances = read_netlist_json(netlist)
+        blk_types = get_blk_timing_types(instances, id_to_name, changed_pe)
+    timing_graph = TimingGraph(netlists, routing_result, folded_blocks,
+                               changed_pe, blk_types)
+    delay = timing_graph.analyze()
+    print("Critical Path:")
+    print("Delay: {0:.2f} ns Max Clock Speed: {1:.2f} MHz".format(
+        delay / 1000, timing_graph.get_fmax()))
+    paths = timing_graph.get_critical_paths(num_paths)
+    breakdown = timing_graph.get_delay_breakdown(paths[0]) if paths else {}
+    for delay_type in DELAY_TYPES:
+        percentage = breakdown.get(delay_type, 0) / max(delay, 1) * 100
+        num_bar = int(percentage / 100 * scale)
+        print("{0:4s} {1} {2} {3:.2f}%".format(delay_type.upper(),
+                                               num_bar * '█',
+                                               ' ' * (scale - num_bar - 2),
+                                               percentage))
+    for index, path in enumerate(paths):
+        blks = []
+        for node in path:
+            blk_id = timing_graph.node_blks[node]
+            if not blks or blks[-1] != blk_id:
+                blks.append(blk_id)
+        print("Path {0}: {1:.2f} ns".format(
+            index, timing_graph.arrival[path[-1]] / 1000))
+        print("   ", " -> ".join(blks))
 
     print("-" * cols)
-    r = parse_routing_resource(cgra_file)
-    routing_resource = build_routing_resource(r)
-    resource_usage = compute_routing_usage(routing_result, routing_resource)
+    resource_usage = compute_routing_usage(routing_result,
+                                           arch_model.routing_resource)
     for bus in resource_usage:
         print("BUS:", bus)
         for track in resource_usage[bus]:
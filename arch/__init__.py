@@ -1,9 +1,13 @@
 from .arch import parse_cgra, parse_vpr, parse_fpga, get_layout
+from .arch_model import ArchModel
+from .routing_resource import RoutingResource
+from .route_index import RouteIndex
 from .netlist import group_reg_nets
 from .cgra_packer import load_packed_file
 from .cgra_packer import read_netlist_json
 from .cgra_analytics import compute_routing_usage
 from .cgra_analytics import compute_total_wire, compute_area_usage
+from .cgra_analytics import compute_hpwl, compute_routing_overflow
 from .cgra import parse_placement, save_placement
 from .bookshelf import mock_board_meta
 from .parser import parse_routing
@@ -3,6 +3,7 @@ from lxml import etree
 import sys
 import os
 import pythunder
+from .cgra_route import iter_tiles
 
 
 """
@@ -211,19 +212,29 @@ def set_io_mask(layout, io_mask_table):
     layout.add_layer_mask(mask)
 
 
-def parse_cgra(filename, use_tile_addr=False):
-    root = etree.parse(filename)
-    layout_name = "CGRA"
-    # only one layout in CGRA files
+def copy_layout_tile(tile):
+    """copies the parts of a tile element read_cgra_info reads, so that the
+       copy outlives iter_tiles freeing the tile"""
+    tile_copy = etree.Element("tile", dict(tile.attrib))
+    for tag in ("p2f_wide", "io_bit"):
+        elem = tile.find(tag)
+        if elem is not None:
+            etree.SubElement(tile_copy, tag).text = elem.text
+    return tile_copy
+
+
+def read_cgra_info(tiles):
+    """reads the layout grid, tile addresses and IO pads off the tile
+       elements of a CGRA info file. returns the layout board, io info, tile
+       mapping and the io mask table"""
     board_dict = {}     # because CGRA file doesn't tell the size beforehand
-    available_types = set()
     tile_mapping = {}
     io_pad_name = {}
     io_pad_bit = {}
     io16_tile = {}
     io_mask_table = {}
 
-    for tile in root.iter("tile"):
+    for tile in tiles:
         if "type" not in tile.attrib or tile.attrib["type"] == "gst":
             continue
         tile_type = tile.attrib["type"]
@@ -232,7 +243,6 @@ def parse_cgra(filename, use_tile_addr=False):
         tile_addr = int(tile.attrib["tile_addr"], 16)
         blk_type = convert_cgra_type(tile_type)
         board_dict[(x, y)] = blk_type
-        available_types.add(blk_type)
         tile_mapping[(x, y)] = tile_addr
         # figure out where the 16 bit IO tiles
         if tile_type == "io1bit":
@@ -265,21 +275,27 @@ def parse_cgra(filename, use_tile_addr=False):
     for x, y in board_dict:
         layout_board[y][x] = board_dict[(x, y)]
 
-    blk_height = {}
-    blk_capacity = {}
-    for blk in available_types:
-        blk_height[blk] = 1
-        blk_capacity[blk] = 1
-
     info = {"io_pad_name": io_pad_name,
             "io_pad_bit": io_pad_bit, "io16_tile": io16_tile}
+    return layout_board, info, tile_mapping, io_mask_table
+
 
+def make_cgra_layout(layout_board, io_mask_table):
     # NOTE:
     # the CGRA file sets the height for each tiles implicitly
     # no need to worry about the height
-    layouts = {}
     layout = get_layout(layout_board)
     set_io_mask(layout, io_mask_table)
+    return layout
+
+
+def parse_cgra(filename, use_tile_addr=False):
+    layout_name = "CGRA"
+    # only one layout in CGRA files
+    layout_board, info, tile_mapping, io_mask_table = \
+        read_cgra_info(iter_tiles(filename))
+    layouts = {}
+    layout = make_cgra_layout(layout_board, io_mask_table)
     if use_tile_addr:
         layouts[layout_name] = (layout, info,
                                 tile_mapping)
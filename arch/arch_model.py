@@ -0,0 +1,133 @@
+"""
+Architecture model of a CGRA info file. The XML is only parsed once: the
+layout grid, tile addresses, IO pads and routing resources are stored in the
+stage cache, keyed on the content hash of the XML, and each stage only loads
+the parts it asks for.
+"""
+from __future__ import print_function
+import os
+import sys
+import tempfile
+import zlib
+from six.moves import cPickle as pickle
+from .arch import read_cgra_info, make_cgra_layout, copy_layout_tile
+from .cgra_route import iter_tiles
+from .routing_resource import RoutingResource
+
+LAYOUT_ENTRY = "arch_layout"
+ROUTING_ENTRY = "arch_routing"
+# fast compression is good enough, most of the entry is repeated wires
+COMPRESS_LEVEL = 1
+
+
+class ArchModel(object):
+    def __init__(self, cgra_file):
+        self.cgra_file = cgra_file
+        self.__digest = None
+        # layout board, io info, tile mapping and io mask table
+        self.__layout_info = None
+        self.__routing_resource = None
+
+    @property
+    def board(self):
+        return self.__get_layout_info()[0]
+
+    @property
+    def info(self):
+        """io_pad_name, io_pad_bit and io16_tile"""
+        return self.__get_layout_info()[1]
+
+    @property
+    def tile_mapping(self):
+        return self.__get_layout_info()[2]
+
+    @property
+    def routing_resource(self):
+        """RoutingResource of the CGRA"""
+        if self.__routing_resource is None:
+            self.__routing_resource = self.__load(ROUTING_ENTRY)
+        return self.__routing_resource
+
+    def get_layout(self):
+        """returns a new layout every time, since the placer changes it"""
+        layout_board, _, _, io_mask_table = self.__get_layout_info()
+        return make_cgra_layout(layout_board, io_mask_table)
+
+    def get_board_meta(self):
+        """the same as parse_cgra(cgra_file, True)["CGRA"]"""
+        return self.get_layout(), self.info, self.tile_mapping
+
+    def __get_layout_info(self):
+        if self.__layout_info is None:
+            self.__layout_info = self.__load(LAYOUT_ENTRY)
+        return self.__layout_info
+
+    def __get_key(self, cache, entry):
+        from stage_cache import hash_file
+        if self.__digest is None:
+            self.__digest = hash_file(self.cgra_file).hexdigest()
+        arch_dir = os.path.dirname(os.path.abspath(__file__))
+        tools = [os.path.join(arch_dir, filename) for filename in
+                 ("arch.py", "cgra_route.py", "routing_resource.py",
+                  "arch_model.py")]
+        # pickles are not portable between python 2 and 3
+        return cache.key(entry, params={"xml": self.__digest,
+                                        "python": sys.version_info[0]},
+                         tools=tools)
+
+    def __load(self, entry):
+        from stage_cache import StageCache, is_cache_enabled
+        if not is_cache_enabled():
+            return self.__parse(entry)
+        cache = StageCache()
+        key = self.__get_key(cache, entry)
+        fd, filename = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            if cache.fetch(key, [filename]):
+                with open(filename, "rb") as f:
+                    return pickle.loads(zlib.decompress(f.read()))
+            # both entries come off the same pass over the XML, so store them
+            # together
+            self.__parse_all()
+            for name in (LAYOUT_ENTRY, ROUTING_ENTRY):
+                with open(filename, "wb+") as f:
+                    f.write(zlib.compress(pickle.dumps(
+                        self.__parse(name), pickle.HIGHEST_PROTOCOL),
+                        COMPRESS_LEVEL))
+                cache.store(self.__get_key(cache, name), [filename])
+            return self.__parse(entry)
+        finally:
+            os.remove(filename)
+
+    def __parse_all(self):
+        """reads the layout and the routing resource off a single pass over
+           the XML. only the few layout elements of each tile are kept"""
+        tiles = iter_tiles(self.cgra_file)
+        layout_tiles = []
+
+        def iter_shared_tiles():
+            for tile in tiles:
+                layout_tiles.append(copy_layout_tile(tile))
+                yield tile
+
+        routing_resource = RoutingResource.read(iter_shared_tiles())
+        # the routing entries stop at the first gst tile
+        for tile in tiles:
+            layout_tiles.append(copy_layout_tile(tile))
+        if self.__layout_info is None:
+            self.__layout_info = read_cgra_info(layout_tiles)
+        if self.__routing_resource is None:
+            self.__routing_resource = routing_resource
+
+    def __parse(self, entry):
+        # without the cache only the requested part is read. it streams the
+        # XML on its own, which keeps the memory bounded by a single tile
+        if entry == LAYOUT_ENTRY:
+            if self.__layout_info is None:
+                self.__layout_info = read_cgra_info(
+                    iter_tiles(self.cgra_file))
+            return self.__layout_info
+        if self.__routing_resource is None:
+            self.__routing_resource = RoutingResource.load(self.cgra_file)
+        return self.__routing_resource
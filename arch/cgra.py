@@ -1,10 +1,16 @@
 from __future__ import print_function, division
 import arch
+import hashlib
 import json
+import os
 import six
+from collections import OrderedDict
 
 from . import load_packed_file, read_netlist_json
-from .parser import parse_routing
+from .parser import split_routing, parse_net_routing
+
+# bump it whenever the bitstream or its index changes
+INDEX_VERSION = 1
 
 
 def save_placement(board_pos, id_to_name, _, place_file):
@@ -94,21 +100,21 @@ def get_blks(netlist):
 def generate_bitstream(board_filename, netlist_filename,
                        packed_filename, placement_filename,
                        routing_filename, output_filename,
-                       io_json):
+                       io_json, jobs=1):
+    """writes the bitstream section by section, together with the index
+       update_bitstream needs. the routing text of the nets is generated in
+       jobs processes"""
     netlists, folded_blocks, id_to_name, changed_pe = \
         load_packed_file(packed_filename)
     blks = get_blks(netlists)
-    board_meta = arch.parse_cgra(board_filename, True)["CGRA"]
+    arch_model = arch.ArchModel(board_filename)
     placement, _ = parse_placement(placement_filename)
-    tile_mapping = board_meta[-1]
-    board_layout = board_meta[0]
-    io_pad_name = board_meta[-2]["io_pad_name"]
-    io_pad_bit = board_meta[-2]["io_pad_bit"]
-    io16_tile = board_meta[-2]["io16_tile"]
+    tile_mapping = arch_model.tile_mapping
+    io_tiles = get_io_tiles(arch_model.board)
 
     connections, instances = read_netlist_json(netlist_filename)
-
-    output_string = ""
+    connection_pins = index_connection_pins(connections)
+    folded_pins = index_folded_pins(folded_blocks, instances)
 
     # TODO: refactor this
     name_to_id = {}
@@ -136,171 +142,386 @@ def generate_bitstream(board_filename, netlist_filename,
         tile_op, print_order = get_tile_op(instance, blk_id, changed_pe)
         if tile_op is None:
             continue
-        pins = get_tile_pins(blk_id, tile_op, folded_blocks, instances,
-                             changed_pe, id_to_name, connections)
+        pins = get_tile_pins(blk_id, tile_op, folded_pins, instances,
+                             changed_pe, id_to_name, connection_pins)
 
         # parse pins from the packing
 
         pe_tiles[blk_id] = (tile, tile_op, pins, print_order)
 
-    tab = "\t" * 6
     # generate tile mapping
     # sort them for pretty printing
     pe_keys = list(pe_tiles.keys())
     pe_keys.sort(key=lambda x: int(pe_tiles[x][0]))
     pe_keys.sort(key=lambda x: pe_tiles[x][-1])
-    output_string += "# PLACEMENT\n"
+    # the placement lines without the tile address, which is all the index
+    # needs to move a block
+    tiles = []
     for blk_id in pe_keys:
-        tile, op, pins, _ = pe_tiles[blk_id]
-        if "mem" in op:
-            output_string += "Tx{:04X}_{}{}#{}\n".format(tile, op,
-                                                         tab,
-                                                         id_to_name[blk_id])
-        else:
-            output_string += "Tx{:04X}_{}({}){}# {}\n".format(tile, op,
-                                                              ",".join(pins),
-                                                              tab,
-                                                              id_to_name[
-                                                                  blk_id])
+        _, op, pins, print_order = pe_tiles[blk_id]
+        tiles.append((blk_id, get_tile_line(op, pins, id_to_name[blk_id]),
+                      print_order))
+    io_names = [(blk_id, id_to_name[blk_id]) for blk_id in id_to_name
+                if blk_id[0] == "i" or blk_id[0] == "I"]
     # IO info
-    io_pad_info, io_strings = generate_io(id_to_name, io16_tile, io_pad_bit,
-                                          io_pad_name, placement, tile_mapping)
+    io_pad_info, io_strings = generate_io(id_to_name,
+                                          arch_model.info["io16_tile"],
+                                          arch_model.info["io_pad_bit"],
+                                          arch_model.info["io_pad_name"],
+                                          placement, tile_mapping)
+
+    routes = {}
+    digests = {}
+    for net_id, lines in split_routing(routing_filename):
+        routes[net_id] = parse_net_routing(lines)
+        digests[net_id] = get_net_digest(lines)
+
+    def get_nets():
+        for net_id, route in generate_routing(routes, tile_mapping,
+                                              io_tiles, jobs):
+            lines = ["\n# net id: {}\n".format(net_id)]
+            netlist = netlists[net_id]
+            for p in netlist:
+                lines.append("# {}: {}::{}\n".format(p[0], id_to_name[p[0]],
+                                                     p[1]))
+            yield net_id, "".join(lines).encode("utf-8"), \
+                (route + "\n").encode("utf-8"), digests[net_id]
+
+    net_ranges = write_bitstream(output_filename, tiles, placement,
+                                 tile_mapping, io_strings, get_nets())
+    save_bitstream_index(output_filename, {
+        "version": INDEX_VERSION,
+        "inputs": get_input_digests(board_filename, netlist_filename,
+                                    packed_filename),
+        "placement": placement,
+        "tiles": tiles,
+        "io_names": io_names,
+        "nets": net_ranges})
+
+    with open(io_json, "w+") as f:
+        json.dump(io_pad_info, f, indent=2, separators=(',', ': '))
+
+
+def update_bitstream(board_filename, netlist_filename,
+                     packed_filename, placement_filename,
+                     routing_filename, output_filename,
+                     io_json, previous_filename, jobs=1):
+    """regenerates only the nets whose routes changed since the previous
+       bitstream was written. falls back to generate_bitstream if the
+       netlist, the packing or the architecture changed"""
+    index = load_bitstream_index(previous_filename)
+    inputs = get_input_digests(board_filename, netlist_filename,
+                               packed_filename)
+    if index is None or index["version"] != INDEX_VERSION or \
+            index["inputs"] != inputs:
+        print("INFO:", "netlist changed, regenerating the whole bitstream")
+        return generate_bitstream(board_filename, netlist_filename,
+                                  packed_filename, placement_filename,
+                                  routing_filename, output_filename,
+                                  io_json, jobs)
+
+    placement, _ = parse_placement(placement_filename)
+    previous_placement = {}
+    for blk_id, pos in index["placement"].items():
+        previous_placement[blk_id] = tuple(pos)
+    moved = [blk_id for blk_id in placement
+             if previous_placement.get(blk_id) != placement[blk_id]]
+
+    routes = {}
+    digests = {}
+    for net_id, lines in split_routing(routing_filename):
+        digests[net_id] = get_net_digest(lines)
+        net_range = index["nets"].get(net_id)
+        if net_range is None or net_range[-1] != digests[net_id]:
+            routes[net_id] = parse_net_routing(lines)
+    if set(placement.keys()) != set(previous_placement.keys()) or \
+            set(digests.keys()) != set(index["nets"].keys()):
+        print("INFO:", "netlist changed, regenerating the whole bitstream")
+        return generate_bitstream(board_filename, netlist_filename,
+                                  packed_filename, placement_filename,
+                                  routing_filename, output_filename,
+                                  io_json, jobs)
+    print("INFO:", "moved blocks:", len(moved))
+    print("INFO:", "changed nets:", len(routes), "/", len(digests))
+
+    arch_model = arch.ArchModel(board_filename)
+    tile_mapping = arch_model.tile_mapping
+    io_tiles = get_io_tiles(arch_model.board)
+    io_pad_info, io_strings = generate_io(OrderedDict(index["io_names"]),
+                                          arch_model.info["io16_tile"],
+                                          arch_model.info["io_pad_bit"],
+                                          arch_model.info["io_pad_name"],
+                                          placement, tile_mapping)
+    net_routes = dict(generate_routing(routes, tile_mapping, io_tiles, jobs))
+    index["tiles"] = sort_tiles(index["tiles"], placement, tile_mapping)
+
+    def get_nets(f):
+        net_id_list = list(digests.keys())
+        net_id_list.sort(key=lambda x: int(x[1:]))
+        for net_id in net_id_list:
+            start, route_start, end, _ = index["nets"][net_id]
+            f.seek(start)
+            # the pin comments only depend on the netlist
+            header = f.read(route_start - start)
+            if net_id in net_routes:
+                route = (net_routes[net_id] + "\n").encode("utf-8")
+            else:
+                route = f.read(end - route_start)
+            yield net_id, header, route, digests[net_id]
+
+    # the output may well be the previous bitstream
+    temp_filename = output_filename + ".tmp"
+    with open(previous_filename, "rb") as f:
+        net_ranges = write_bitstream(temp_filename, index["tiles"],
+                                     placement, tile_mapping, io_strings,
+                                     get_nets(f))
+    os.rename(temp_filename, output_filename)
+    index["placement"] = placement
+    index["nets"] = net_ranges
+    save_bitstream_index(output_filename, index)
 
+    with open(io_json, "w+") as f:
+        json.dump(io_pad_info, f, indent=2, separators=(',', ': '))
+
+
+def get_tile_line(op, pins, name):
+    tab = "\t" * 6
+    if "mem" in op:
+        return "_{}{}#{}\n".format(op, tab, name)
+    else:
+        return "_{}({}){}# {}\n".format(op, ",".join(pins), tab, name)
+
+
+def write_bitstream(output_filename, tiles, placement, tile_mapping,
+                    io_strings, nets):
+    """tiles are (blk_id, placement line, print order) sorted by
+       sort_tiles. nets yields the net id, pin comments, routing text and
+       route digest of every net in order. returns the byte ranges of the
+       nets"""
+    header = ["# PLACEMENT\n"]
+    for blk_id, line, _ in tiles:
+        header.append("Tx{:04X}{}".format(tile_mapping[placement[blk_id]],
+                                          line))
     assert len(io_strings) > 0
-    output_string += "\n\n#IO\n"
-    output_string += "\n".join(io_strings)
+    header.append("\n\n#IO\n")
+    header.append("\n".join(io_strings))
+    header.append("\n\n#ROUTING\n")
+
+    net_ranges = {}
+    with open(output_filename, "wb+") as f:
+        data = "".join(header).encode("utf-8")
+        f.write(data)
+        offset = len(data)
+        for net_id, pins, route, digest in nets:
+            f.write(pins)
+            f.write(route)
+            net_ranges[net_id] = (offset, offset + len(pins),
+                                  offset + len(pins) + len(route), digest)
+            offset += len(pins) + len(route)
+    return net_ranges
+
+
+def sort_tiles(tiles, placement, tile_mapping):
+    """the same order as generate_bitstream prints the tiles in"""
+    tiles = list(tiles)
+    tiles.sort(key=lambda x: tile_mapping[placement[x[0]]])
+    tiles.sort(key=lambda x: x[-1])
+    return tiles
+
+
+def get_index_filename(bitstream_filename):
+    return bitstream_filename + ".idx"
+
+
+def save_bitstream_index(bitstream_filename, index):
+    index = dict(index)
+    # json keys have to be strings
+    index["placement"] = dict([(blk_id, list(pos)) for blk_id, pos in
+                               index["placement"].items()])
+    with open(get_index_filename(bitstream_filename), "w+") as f:
+        json.dump(index, f)
+
+
+def load_bitstream_index(bitstream_filename):
+    index_filename = get_index_filename(bitstream_filename)
+    if not os.path.isfile(bitstream_filename) or \
+            not os.path.isfile(index_filename):
+        return None
+    with open(index_filename) as f:
+        return json.load(f)
 
-    output_string += "\n\n#ROUTING\n"
 
-    routes = generate_routing(routing_filename, tile_mapping, board_layout)
-    net_id_list = list(routes.keys())
-    net_id_list.sort(key=lambda x: int(x[1:]))
+def get_input_digests(board_filename, netlist_filename, packed_filename):
+    """everything but the placement and the routing"""
+    from stage_cache import hash_file
+    return {"arch": hash_file(board_filename).hexdigest(),
+            "netlist": hash_file(netlist_filename).hexdigest(),
+            "packed": hash_file(packed_filename).hexdigest()}
 
-    for net_id in net_id_list:
-        output_string += "\n# net id: {}\n".format(net_id)
-        netlist = netlists[net_id]
-        for p in netlist:
-            output_string += "# {}: {}::{}\n".format(p[0], id_to_name[p[0]],
-                                                     p[1])
-        output_string += routes[net_id]
 
-        output_string += "\n"
+def get_net_digest(lines):
+    h = hashlib.sha256()
+    for line in lines:
+        h.update(line.strip().encode("utf-8"))
+    return h.hexdigest()
 
-    with open(output_filename, "w+") as f:
-        f.write(output_string)
 
-    with open(io_json, "w+") as f:
-        json.dump(io_pad_info, f, indent=2, separators=(',', ': '))
+def get_io_tiles(board):
+    """positions of the IO tiles, whose ports are implicit in the
+       bitstream"""
+    io_tiles = set()
+    for y, row in enumerate(board):
+        for x, blk_type in enumerate(row):
+            if blk_type == "i" or blk_type == "I":
+                io_tiles.add((x, y))
+    return io_tiles
 
 
-def generate_routing(routing_file, tile_mapping, board_layout):
-    routes = parse_routing(routing_file)
-    result = {}
-    for net_id in routes:
-        lines = []
-        line = ""
-        for segment in routes[net_id]:
-            last_node = ""
-            seg_index = 0
-            while seg_index < len(segment):
-                seg = segment[seg_index]
-                node_type = seg[0]
-                if node_type == "PORT" and seg_index == 0:
-                    port_name = seg[1]
-                    if port_name == "out" or port_name == "outb":
-                        port_name = "pe_" + port_name
-                    elif port_name == "valid":
-                        port_name = "validb"
-                    x, y = seg[2], seg[3]
-                    pos = (x, y)
-                    blk_type = board_layout.get_blk_type(x, y)
-                    if blk_type == "i" or blk_type == "I":
-                        seg_index += 2
-                        line = ""
-                        continue
-                    last_node = "Tx{:04X}".format(tile_mapping[pos]) \
-                                + "_" + port_name
+# tile mapping and IO tiles of the routing workers
+_routing_arch = None
 
-                    line += last_node + " -> "
-                elif node_type == "REG" and seg_index != 0:
-                    # in BSB we actually don't care about the reg node
-                    # since it's implicit
-                    # we rewind the last line and add (r) to it
-                    # FIXME: change it back once steve fixed it
-                    assert seg_index == len(segment) - 1
-                    lines[-1] = lines[-1] + " (r)"
+
+def init_routing_worker(tile_mapping, io_tiles):
+    global _routing_arch
+    _routing_arch = tile_mapping, io_tiles
+
+
+def generate_routing_chunk(routes):
+    tile_mapping, io_tiles = _routing_arch
+    return [generate_net_routing(route, tile_mapping, io_tiles)
+            for route in routes]
+
+
+def generate_routing(routes, tile_mapping, io_tiles, jobs=1):
+    """yields the routing text of every net, sorted by net id"""
+    net_id_list = list(routes.keys())
+    net_id_list.sort(key=lambda x: int(x[1:]))
+    if jobs <= 1:
+        for net_id in net_id_list:
+            yield net_id, generate_net_routing(routes[net_id], tile_mapping,
+                                               io_tiles)
+        return
+
+    import multiprocessing
+    # a few chunks per worker to balance the load
+    chunk_size = max(len(net_id_list) // (jobs * 4), 1)
+    chunks = []
+    for i in range(0, len(net_id_list), chunk_size):
+        chunks.append([routes[net_id] for net_id in
+                       net_id_list[i:i + chunk_size]])
+    pool = multiprocessing.Pool(jobs, init_routing_worker,
+                                (tile_mapping, io_tiles))
+    try:
+        net_ids = iter(net_id_list)
+        for result in pool.imap(generate_routing_chunk, chunks):
+            for route in result:
+                yield next(net_ids), route
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def generate_net_routing(route, tile_mapping, io_tiles):
+    lines = []
+    line = ""
+    for segment in route:
+        last_node = ""
+        seg_index = 0
+        while seg_index < len(segment):
+            seg = segment[seg_index]
+            node_type = seg[0]
+            if node_type == "PORT" and seg_index == 0:
+                port_name = seg[1]
+                if port_name == "out" or port_name == "outb":
+                    port_name = "pe_" + port_name
+                elif port_name == "valid":
+                    port_name = "validb"
+                x, y = seg[2], seg[3]
+                pos = (x, y)
+                if pos in io_tiles:
+                    seg_index += 2
                     line = ""
-                elif node_type == "SB":
-                    track = seg[1]
-                    pos = (seg[2], seg[3])
-                    side = seg[4]
-                    io = seg[5]
-                    one_bit = seg[6] != 16
-                    last_node = "Tx{:04X}".format(tile_mapping[pos]) \
-                                + "_{}_".format("out" if io else "in") \
-                                + "s{}t{}{}".format(side, track,
-                                                    "b" if one_bit else "")
-                    line += last_node
-                    if io == 0:
-                        # coming in
-                        line += " -> "
-                    else:
-                        lines.append(line)
-                        line = ""
-                elif node_type == "PORT" and seg_index != 0:
-                    # this is sink
-                    # we need to double check if the previous one is coming
-                    # in or out
-                    # FIXME:
-                    # fix this hack
-                    pre_node = segment[seg_index - 1]
-                    port_name = seg[1]
-                    one_bit = seg[-1] != 16
-                    x, y = seg[2], seg[3]
-                    pos = (x, y)
-                    blk_type = board_layout.get_blk_type(x, y)
-                    if blk_type == "i" or blk_type == "I":
-                        seg_index += 1
-                        continue
-                    if pre_node[0] == "SB":
-                        if pre_node[2] != seg[2] or pre_node[3] != seg[3]:
-                            # we need to produce a fake one
-                            side = (pre_node[4] + 2) % 4
-                            track = pre_node[1]
-                            last_node = "Tx{:04X}".format(tile_mapping[pos]) \
-                                        + "_in_" \
-                                        + "s{}t{}{}".format(side, track,
-                                                            "b" if one_bit
-                                                            else "")
-                            line += last_node + " -> "
-                        else:
-                            line += last_node + " -> "
-                    elif pre_node[0] == "REG":
-                        # FIXME: hack an input track
-                        #        by using the register name
-                        _, reg_io, reg_side = pre_node[1].split("_")
-                        reg_track = int(reg_io)
-                        reg_side = (int(reg_side) + 2) % 4
-                        one_bit = False
-                        track = pre_node[2]
-                        assert reg_track == track
+                    continue
+                last_node = "Tx{:04X}".format(tile_mapping[pos]) \
+                            + "_" + port_name
+
+                line += last_node + " -> "
+            elif node_type == "REG" and seg_index != 0:
+                # in BSB we actually don't care about the reg node
+                # since it's implicit
+                # we rewind the last line and add (r) to it
+                # FIXME: change it back once steve fixed it
+                assert seg_index == len(segment) - 1
+                lines[-1] = lines[-1] + " (r)"
+                line = ""
+            elif node_type == "SB":
+                track = seg[1]
+                pos = (seg[2], seg[3])
+                side = seg[4]
+                io = seg[5]
+                one_bit = seg[6] != 16
+                last_node = "Tx{:04X}".format(tile_mapping[pos]) \
+                            + "_{}_".format("out" if io else "in") \
+                            + "s{}t{}{}".format(side, track,
+                                                "b" if one_bit else "")
+                line += last_node
+                if io == 0:
+                    # coming in
+                    line += " -> "
+                else:
+                    lines.append(line)
+                    line = ""
+            elif node_type == "PORT" and seg_index != 0:
+                # this is sink
+                # we need to double check if the previous one is coming
+                # in or out
+                # FIXME:
+                # fix this hack
+                pre_node = segment[seg_index - 1]
+                port_name = seg[1]
+                one_bit = seg[-1] != 16
+                x, y = seg[2], seg[3]
+                pos = (x, y)
+                if pos in io_tiles:
+                    seg_index += 1
+                    continue
+                if pre_node[0] == "SB":
+                    if pre_node[2] != seg[2] or pre_node[3] != seg[3]:
+                        # we need to produce a fake one
+                        side = (pre_node[4] + 2) % 4
+                        track = pre_node[1]
                         last_node = "Tx{:04X}".format(tile_mapping[pos]) \
                                     + "_in_" \
-                                    + "s{}t{}{}".format(reg_side, track,
+                                    + "s{}t{}{}".format(side, track,
                                                         "b" if one_bit
                                                         else "")
                         line += last_node + " -> "
                     else:
-                        raise Exception("Unknown node " + str(pre_node))
-                    line += "Tx{:04X}".format(tile_mapping[pos]) \
-                            + "_" + port_name
-                    lines.append(line)
-                    line = ""
-
-                seg_index += 1
-        result[net_id] = "\n".join(lines)
+                        line += last_node + " -> "
+                elif pre_node[0] == "REG":
+                    # FIXME: hack an input track
+                    #        by using the register name
+                    _, reg_io, reg_side = pre_node[1].split("_")
+                    reg_track = int(reg_io)
+                    reg_side = (int(reg_side) + 2) % 4
+                    one_bit = False
+                    track = pre_node[2]
+                    assert reg_track == track
+                    last_node = "Tx{:04X}".format(tile_mapping[pos]) \
+                                + "_in_" \
+                                + "s{}t{}{}".format(reg_side, track,
+                                                    "b" if one_bit
+                                                    else "")
+                    line += last_node + " -> "
+                else:
+                    raise Exception("Unknown node " + str(pre_node))
+                line += "Tx{:04X}".format(tile_mapping[pos]) \
+                        + "_" + port_name
+                lines.append(line)
+                line = ""
 
-    return result
+            seg_index += 1
+    return "\n".join(lines)
 
 
 def generate_io(id_to_name, io16_tile, io_pad_bit, io_pad_name, placement,
@@ -384,35 +605,24 @@ def get_lut_pins(instance):
     return int(bit0_value), int(bit1_value), int(bit2_value)
 
 
-def get_tile_pins(blk_id, op, folded_block, instances, changed_pe,
-                  id_to_name, connections):
-    instance_name = id_to_name[blk_id]
-    if op[:3] == "mem":
-        return None
-    if "lut" in op:
-        lut_pins = get_lut_pins(instances[instance_name])
-        pins = ["const{0}_{0}".format(i) for i in lut_pins]
-        assert len(pins) == 3
-    elif op[:3] == "mux" or op[:3] == "sel":
-        pins = [None, None, None]
-    else:
-        pins = [None, None]
-
-    # second pass to write wires
+def index_connection_pins(connections):
+    """maps instance names to the ports they are driven on"""
+    result = {}
     for net in connections:
         for conn in net:
             pin_name = conn.split(".")[0]
             pin_port = ".".join(conn.split(".")[1:])
-            if pin_name == instance_name and "out" not in pin_port:
-                if (op == "mux" or op == "sel") and "bit.in.0" == pin_port:
-                    index = 2
-                elif pin_port != "in":
-                    index = int(pin_port[-1])
-                else:
-                    index = 0
-                pins[index] = "wire"
+            if "out" not in pin_port:
+                if pin_name not in result:
+                    result[pin_name] = []
+                result[pin_name].append(pin_port)
+    return result
 
-    # third pass to determine the consts/regs
+
+def index_folded_pins(folded_block, instances):
+    """maps block ids to the (port, pin name) of the blocks folded into
+       them"""
+    result = {}
     for entry in folded_block:
         entry_data = folded_block[entry]
         if len(entry_data) == 2:
@@ -426,14 +636,47 @@ def get_tile_pins(blk_id, op, folded_block, instances, changed_pe,
             pin_name = get_const_value(instances[pin_name])
         else:
             raise Exception("Unknown folded block data " + str(entry_data))
-        if b_id == blk_id:
-            # mux is very special
-            if port == "bit0" and (op == "mux" or op == "sel"):
-                index = 2
-            else:
-                index = int(port[-1])
-            assert (pin_name is not None)
-            pins[index] = pin_name
+        if b_id not in result:
+            result[b_id] = []
+        result[b_id].append((port, pin_name))
+    return result
+
+
+def get_tile_pins(blk_id, op, folded_pins, instances, changed_pe,
+                  id_to_name, connection_pins):
+    """folded_pins and connection_pins are built by index_folded_pins and
+       index_connection_pins"""
+    instance_name = id_to_name[blk_id]
+    if op[:3] == "mem":
+        return None
+    if "lut" in op:
+        lut_pins = get_lut_pins(instances[instance_name])
+        pins = ["const{0}_{0}".format(i) for i in lut_pins]
+        assert len(pins) == 3
+    elif op[:3] == "mux" or op[:3] == "sel":
+        pins = [None, None, None]
+    else:
+        pins = [None, None]
+
+    # second pass to write wires
+    for pin_port in connection_pins.get(instance_name, []):
+        if (op == "mux" or op == "sel") and "bit.in.0" == pin_port:
+            index = 2
+        elif pin_port != "in":
+            index = int(pin_port[-1])
+        else:
+            index = 0
+        pins[index] = "wire"
+
+    # third pass to determine the consts/regs
+    for port, pin_name in folded_pins.get(blk_id, []):
+        # mux is very special
+        if port == "bit0" and (op == "mux" or op == "sel"):
+            index = 2
+        else:
+            index = int(port[-1])
+        assert (pin_name is not None)
+        pins[index] = pin_name
     if blk_id in changed_pe:
         pins[0] = "reg"
         pins[1] = "const0_0"
@@ -1,3 +1,6 @@
+import numpy as np
+from .route_index import RouteIndex, NODE_TYPES
+
 # FIXME
 # random numbers
 TIMING_INFO = {
@@ -39,6 +42,8 @@ def convert_timed_path(timed_paths, netlists, folded_blocks, name_to_id):
 
 
 def compute_total_wire(routing_result):
+    if isinstance(routing_result, RouteIndex):
+        return compute_index_wire(routing_result)
     wire_length = {}
     for net_id in routing_result:
         path = routing_result[net_id]
@@ -62,6 +67,37 @@ def compute_total_wire(routing_result):
     return wire_length
 
 
+def compute_index_wire(route_index):
+    """compute_total_wire over the node arrays of a RouteIndex"""
+    nodes = route_index.nodes
+    is_sb = nodes["type"] == NODE_TYPES.index("SB")
+    segments = route_index.get_node_segments()
+    # switch box pairs within a segment
+    start = np.nonzero(is_sb[:-1] & is_sb[1:] &
+                       (segments[:-1] == segments[1:]))[0]
+    nets = route_index.get_node_nets()[start]
+    fields = [nodes[name][start] for name in ("track", "x", "y", "side", "io",
+                                              "width")]
+    # only the first pair a switch box starts in each net counts
+    order = np.lexsort([start] + fields[::-1] + [nets])
+    first = np.ones(len(order), dtype=bool)
+    for values in [nets] + fields:
+        values = values[order]
+        first[1:] &= values[1:] == values[:-1]
+    first[1:] = ~first[1:]
+    start = start[order[first]]
+    nets = nets[order[first]]
+    # and only if it connects to a different track or tile
+    moved = np.zeros(len(start), dtype=bool)
+    for name in ("track", "x", "y"):
+        moved |= nodes[name][start] != nodes[name][start + 1]
+    length = np.bincount(nets[moved], minlength=len(route_index))
+    wire_length = {}
+    for net_id, net_length in zip(route_index.net_ids, length.tolist()):
+        wire_length[net_id] = max(net_length, 1)
+    return wire_length
+
+
 def compute_area_usage(placement, board_layout):
     result = {}
     height = board_layout.height()
@@ -92,44 +128,98 @@ def compute_area_usage(placement, board_layout):
 
 
 def compute_routing_usage(routing_result, routing_resource):
-    route_resource = {}
-    for pos in routing_resource:
-        route_resource[pos] = routing_resource[pos]["route_resource"]
-
-    # construct all the available switch boxes, by bus, and then tracks
-    total_resource = {}
-    for tile in route_resource:
-        resource = route_resource[tile]
-        for conn1, conn2 in resource:
-            conns = [conn1, conn2]
-            for width, io, side, track in conns:
-                if width not in total_resource:
-                    total_resource[width] = {}
-                if track not in total_resource[width]:
-                    total_resource[width][track] = set()
-                total_resource[width][track].add((tile, io, side))
-
-    total_resource_count = {}
-    for bus in total_resource:
-        total_resource_count[bus] = {}
-        for track in total_resource[bus]:
-            total_resource_count[bus][track] = len(total_resource[bus][track])
-
-    for net_id in routing_result:
-        path = routing_result[net_id]
-        for segments in path:
-            for seg in segments:
-                if seg[0] == "SB":
-                    track, x, y, side, io, bus = seg[1:]
-                    entry = ((x, y), io, side)
-                    if entry in total_resource[bus][track]:
-                        total_resource[bus][track].remove(entry)
-
+    """routing_resource is a RoutingResource. returns the total and unused
+       switch box wires indexed by bus and then track"""
+    conns = routing_resource.conns
+    wires = np.concatenate([conns["src"], conns["dst"]])
+    wire_tiles = np.tile(routing_resource.get_conn_tiles(), 2)
+    buses = np.unique(wires["bus"])
+    num_tracks = int(wires["track"].max()) + 1 if len(wires) > 0 else 0
+    num_tiles = len(routing_resource)
+
+    # a switch box wire is identified by its bus, track, tile, io and side.
+    # they are marked in a dense bitmap
+    def encode(bus_index, track, tile, io, side):
+        return (((bus_index * num_tracks + track) * num_tiles + tile) * 2 +
+                io) * 8 + side
+
+    wires = [wires[name].astype(np.int64) for name in
+             ("bus", "track", "io", "side")]
+    total_resource = np.zeros(len(buses) * num_tracks * num_tiles * 16,
+                              dtype=bool)
+    total_resource[encode(np.searchsorted(buses, wires[0]), wires[1],
+                          wire_tiles, wires[2], wires[3])] = True
+
+    if isinstance(routing_result, RouteIndex):
+        nodes = routing_result.nodes
+        nodes = nodes[nodes["type"] == NODE_TYPES.index("SB")]
+        used = [nodes[name].astype(np.int64) for name in
+                ("track", "x", "y", "side", "io", "width")]
+    else:
+        used = []
+        for net_id in routing_result:
+            path = routing_result[net_id]
+            for segments in path:
+                for seg in segments:
+                    if seg[0] == "SB":
+                        used.append(seg[1:])
+        used = np.array(used, dtype=np.int64).reshape((-1, 6)).T
+    track, x, y, side, io, bus = used
+    # tile of every position, -1 if there is none
+    tiles = routing_resource.tiles
+    width = int(max(tiles["x"].max(initial=0), x.max(initial=0))) + 1
+    height = int(max(tiles["y"].max(initial=0), y.max(initial=0))) + 1
+    tile_grid = np.full((width, height), -1, dtype=np.int64)
+    tile_grid[tiles["x"], tiles["y"]] = np.arange(len(tiles))
+    tile = np.full(len(x), -1, dtype=np.int64)
+    on_grid = (x >= 0) & (y >= 0)
+    tile[on_grid] = tile_grid[x[on_grid], y[on_grid]]
+    bus_index = np.minimum(np.searchsorted(buses, bus), max(len(buses) - 1,
+                                                            0))
+    valid = (tile >= 0) & (track < num_tracks) & (len(buses) > 0)
+    if len(buses) > 0:
+        valid &= buses[bus_index] == bus
+    used_resource = np.zeros_like(total_resource)
+    used_resource[encode(bus_index[valid], track[valid], tile[valid],
+                         io[valid], side[valid])] = True
+    used_resource &= total_resource
+
+    shape = (len(buses), num_tracks, -1)
+    total_count = total_resource.reshape(shape).sum(axis=2)
+    used_count = used_resource.reshape(shape).sum(axis=2)
     resource_usage = {}
-    for bus in total_resource_count:
+    for i, bus in enumerate(buses.tolist()):
         resource_usage[bus] = {}
-        for track in total_resource_count[bus]:
-            resource_usage[bus][track] = (total_resource_count[bus][track],
-                                          len(total_resource[bus][track]))
+        for track in range(num_tracks):
+            total = int(total_count[i, track])
+            if total > 0:
+                left = total - int(used_count[i, track])
+                resource_usage[bus][track] = (total, left)
 
     return resource_usage
+
+
+def compute_hpwl(placement, netlists):
+    """half-perimeter wire length. netlists hold block ids"""
+    total = 0
+    for net_id in netlists:
+        xs = [placement[blk_id][0] for blk_id in netlists[net_id]]
+        ys = [placement[blk_id][1] for blk_id in netlists[net_id]]
+        total += max(xs) - min(xs) + max(ys) - min(ys)
+    return total
+
+
+def compute_routing_overflow(placement, netlists, capacity):
+    """fast routability estimate: spread each net's wire length uniformly
+    over its bounding box (RUDY) and sum up the demand above capacity"""
+    demand = {}
+    for net_id in netlists:
+        xs = [placement[blk_id][0] for blk_id in netlists[net_id]]
+        ys = [placement[blk_id][1] for blk_id in netlists[net_id]]
+        width = max(xs) - min(xs) + 1
+        height = max(ys) - min(ys) + 1
+        density = (width + height - 2) / float(width * height)
+        for x in range(min(xs), max(xs) + 1):
+            for y in range(min(ys), max(ys) + 1):
+                demand[(x, y)] = demand.get((x, y), 0) + density
+    return sum([max(0, d - capacity) for d in demand.values()])
@@ -10,44 +10,63 @@ import sys
 import json
 import os
 from .netlist import is_conn_out, is_conn_in
+from .coreir_stream import load_top_module
+from .packed_binary import is_packed_binary, load_packed_binary, \
+    write_packed_binary
 
 
 def convert2netlist(connections):
-    netlists = []
-    skip_index = set()
-    for i in range(len(connections)):
-        if i in skip_index:
-            continue
-        conn = connections[i]
+    """merge point-to-point connections into nets.
+    connection endpoints are indexed with a union-find, so the nets are built
+    in near-linear time. nets are ordered by their first connection and pins
+    by their first appearance, i.e. the same order as a brute-force scan
+    """
+    parent = {}
+    endpoints = []
+
+    def find(key):
+        root = key
+        while parent[root] != root:
+            root = parent[root]
+        # path compression
+        while parent[key] != root:
+            parent[key], key = root, parent[key]
+        return root
+
+    for conn in connections:
         assert(len(conn) == 2)
-        # brute force search
-        net = [conn[0], conn[1]]
-        for j in range(len(connections)):
-            if i == j:
-                continue
-            conn0 = connections[j][0]
-            conn1 = connections[j][1]
-
-            if conn0 in net and conn1 not in net:
-                net.append(conn1)
-                skip_index.add(j)
-            if conn1 in net and conn0 not in net:
-                skip_index.add(j)
-                net.append(conn0)
-
-        def sort_value(key):
-            raw_splits = key.split(".")
-            if is_conn_in(raw_splits):
-                return 2
-            elif is_conn_out(raw_splits):
-                return 0
-            else:
-                return 1
+        for key in conn:
+            if key not in parent:
+                parent[key] = key
+                endpoints.append(key)
+        root0 = find(conn[0])
+        root1 = find(conn[1])
+        if root0 != root1:
+            parent[root1] = root0
+
+    nets = {}
+    netlists = []
+    for key in endpoints:
+        root = find(key)
+        if root not in nets:
+            nets[root] = []
+            netlists.append(nets[root])
+        nets[root].append(key)
+
+    def sort_value(key):
+        raw_splits = key.split(".")
+        if is_conn_in(raw_splits):
+            return 2
+        elif is_conn_out(raw_splits):
+            return 0
+        else:
+            return 1
+
+    for net in netlists:
         # rearrange the net so that it's src -> sink
         net.sort(key=lambda p: sort_value(p))
         # sanity check to make sure that the first one is indeed an out
         assert (is_conn_out(net[0]))
-        netlists.append(net)
     # print("INFO: before conversion connections", len(connections),
     #       "after conversion netlists:", len(netlists))
     return netlists
@@ -83,15 +102,20 @@ def determine_track_bus(netlists, id_to_name):
     return track_mode
 
 
-def save_packing_result(netlist_filename, pack_filename, fold_reg=True):
+def save_packing_result(netlist_filename, pack_filename, fold_reg=True,
+                        binary_filename=None, stream=False):
     netlists, folded_blocks, id_to_name, changed_pe = \
-        parse_and_pack_netlist(netlist_filename, fold_reg=fold_reg)
+        parse_and_pack_netlist(netlist_filename, fold_reg=fold_reg,
+                               stream=stream)
 
     rename_id_changed(id_to_name, changed_pe)
     track_mode = determine_track_bus(netlists, id_to_name)
 
     write_packing_result(changed_pe, folded_blocks, id_to_name, netlists,
                          pack_filename, track_mode)
+    if binary_filename is not None:
+        write_packed_binary(changed_pe, folded_blocks, id_to_name, netlists,
+                            binary_filename, track_mode)
 
 
 def write_packing_result(changed_pe, folded_blocks, id_to_name, netlists,
@@ -142,6 +166,9 @@ def write_packing_result(changed_pe, folded_blocks, id_to_name, netlists,
 
 
 def load_packed_file(pack_filename, load_track_mode=False):
+    if is_packed_binary(pack_filename):
+        return load_packed_binary(pack_filename,
+                                  load_track_mode=load_track_mode)
     with open(pack_filename) as f:
         lines = f.readlines()
 
@@ -257,8 +284,8 @@ def load_packed_file(pack_filename, load_track_mode=False):
         return netlists, folded_blocks, id_to_name, changed_pe
 
 
-def parse_and_pack_netlist(netlist_filename, fold_reg=True):
-    connections, instances = read_netlist_json(netlist_filename)
+def parse_and_pack_netlist(netlist_filename, fold_reg=True, stream=False):
+    connections, instances = read_netlist_json(netlist_filename, stream=stream)
     netlists, name_to_id = generate_netlists(connections, instances)
     before_packing = len(netlists)
     netlists, folded_blocks, changed_pe = pack_netlists(netlists, name_to_id,
@@ -548,30 +575,31 @@ def change_name_to_id(instances):
     return name_to_id
 
 
-def read_netlist_json(netlist_filename):
+def read_netlist_json(netlist_filename, stream=False):
     assert (os.path.isfile(netlist_filename))
-    with open(netlist_filename) as f:
-        raw_data = json.load(f)
-    namespace = raw_data["namespaces"]
-    # load design names
-    top = raw_data["top"].split(".")[-1]
-    design = namespace["global"]["modules"][top]
-    instances = design["instances"]
-    connections = design["connections"]
+    instances, connections = load_top_module_json(netlist_filename, stream)
     # the standard json input is not a netlist
     connections = convert2netlist(connections)
     return connections, instances
 
 
-def load_unmapped_netlist(netlist_filename):
+def load_top_module_json(netlist_filename, stream=False):
+    """returns instances and connections of the top module. if stream is set,
+    the json is scanned incrementally without building the whole document"""
+    if stream:
+        instances, connections, _ = load_top_module(netlist_filename)
+        return instances, connections
     with open(netlist_filename) as f:
         data = json.load(f)
 
     # load design names
     top = data["top"].split(".")[-1]
     design = data["namespaces"]["global"]["modules"][top]
-    instances = design["instances"]
-    connections = design["connections"]
+    return design["instances"], design["connections"]
+
+
+def load_unmapped_netlist(netlist_filename, stream=False):
+    instances, connections = load_top_module_json(netlist_filename, stream)
 
     pe_count = 0
     name_to_id = {}
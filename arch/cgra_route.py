@@ -3,12 +3,45 @@ from lxml import etree
 import sys
 
 
+def iter_tiles(cgra_file):
+    """streams the tile elements of a CGRA info file. each tile is freed once
+       the next one is read, so only one tile is in memory at a time"""
+    for _, tile_elem in etree.iterparse(cgra_file, events=("end",),
+                                        tag="tile"):
+        yield tile_elem
+        tile_elem.clear()
+        # the root still holds on to the cleared tiles
+        while tile_elem.getprevious() is not None:
+            del tile_elem.getparent()[0]
+
+
 def parse_routing_resource(cgra_file):
     """build routing resource files based on the CGRA definition
        returns resources indexed by """
-    root = etree.parse(cgra_file)
+    return read_routing_resource(iter_tiles(cgra_file))
+
+
+def read_routing_resource(tiles):
+    """reads the routing resource off the tile elements"""
+    return dict(iter_routing_entries(tiles))
+
+
+def load_routing_resource(cgra_file):
+    """the same as build_routing_resource(parse_routing_resource(cgra_file)),
+       but each tile is built as soon as it's parsed so that the raw wire
+       names never pile up"""
+    wire_info = {}
     result = {}
-    for tile_elem in root.iter("tile"):
+    for pos, entry in iter_routing_entries(iter_tiles(cgra_file)):
+        result[pos] = build_tile_resource(entry, wire_info)
+    return result
+
+
+def iter_routing_entries(tiles):
+    """yields the position and the raw routing entry of each tile. wire names
+       are interned so that tiles share the same strings"""
+    wires = {}
+    for tile_elem in tiles:
         tile_attr = tile_elem.attrib
         if tile_attr["type"] == "gst":
             # don't care about gst for now
@@ -35,7 +68,8 @@ def parse_routing_resource(cgra_file):
                 sink_connections = set()
                 # find all tracks connected to the sink
                 for src_elem in mux_elem.iter("src"):
-                    sink_connections.add(src_elem.text)
+                    wire = src_elem.text
+                    sink_connections.add(wires.setdefault(wire, wire))
 
                 # add it to cb bus collection
                 if bus not in cb_bus:
@@ -50,10 +84,12 @@ def parse_routing_resource(cgra_file):
                 # we will have reg and mux
                 for mux_elem in sb_elem.iter("mux"):
                     sink = mux_elem.attrib["snk"]
+                    sink = wires.setdefault(sink, sink)
                     sink_connections = set()
                     # find all tracks connected to the sink
                     for src_elem in mux_elem.iter("src"):
-                        sink_connections.add(src_elem.text)
+                        wire = src_elem.text
+                        sink_connections.add(wires.setdefault(wire, wire))
                     sb_entry["mux"][sink] = sink_connections
                 for reg_elem in sb_elem.iter("reg"):
                     src = reg_elem.attrib["src"]
@@ -68,7 +104,7 @@ def parse_routing_resource(cgra_file):
                     sb_bus[bus] = sb_entry
 
             # put into result, using (col, row) as an index
-            result[(col, row)] = {"cb": cb_bus, "sb": sb_bus}
+            yield (col, row), {"cb": cb_bus, "sb": sb_bus}
 
         else:
             # IO direction
@@ -104,8 +140,7 @@ def parse_routing_resource(cgra_file):
                 for elem in tile_elem.findall("f2p_1bit"):
                     io_entry["input"].add(elem.text)
 
-            result[(col, row)] = io_entry
-    return result
+            yield (col, row), io_entry
 
 
 def convert_bus_to_tuple(wire):
@@ -158,104 +193,115 @@ def build_routing_resource(parsed_resource):
     """
     # indexed by pos (x, y)
     result = {}
+    wire_info = {}
     for x, y in parsed_resource:
         entry = parsed_resource[(x, y)]
-        if "cb" not in entry:
-            # io entry
-            operands = {"in": set(), "out": set(), "inb": set(), "outb": set()}
-            port_io = {"in": 0, "out": 1, "inb": 0, "outb": 1}
-            input_channels = entry["input"]
-            output_channels = entry["output"]
-            for wire_info in input_channels:
-                wire = convert_bus_to_tuple(wire_info)
-                if wire is not None:
-                    assert wire[1] == 0
-                    if wire[0] == 1:
-                        sink = "inb"
-                    else:
-                        sink = "in"
-                    operands[sink].add(wire)
-            for wire_info in output_channels:
-                wire = convert_bus_to_tuple(wire_info)
-                if wire is not None:
-                    assert wire[1] == 1
-                    if wire[0] == 1:
-                        sink = "outb"
-                    else:
-                        sink = "out"
-                    operands[sink].add(wire)
-
-            # clean up
-            if len(operands["out"]) == 0:
-                operands.pop("out", None)
-            if len(operands["outb"]) == 0:
-                operands.pop("outb", None)
-            if len(operands["in"]) == 0:
-                operands.pop("in", None)
-            if len(operands["inb"]) == 0:
-                operands.pop("inb", None)
-
-            result[(x, y)] = {"route_resource": set(),
-                              "port": operands,
-                              "port_io": port_io}
-            continue
-        # build operand connection
-        operands = {"out": set(), "outb": set(), "rdata": set(), "valid": set()}
-        port_io = {}
-        for port in operands:
-            port_io[port] = 1
-        connections = {}
-        for bus in entry["cb"]:
-            for sink in entry["cb"][bus]:
-                assert sink not in operands
-                operands[sink] = set()
-                wires = entry["cb"][bus][sink]
-                for wire in wires:
-                    wire_info = convert_bus_to_tuple(wire)
-                    if wire_info is not None:
-                        operands[sink].add(wire_info)
-                        port_io[sink] = 0
+        result[(x, y)] = build_tile_resource(entry, wire_info)
+    return result
 
-        for bus in entry["sb"]:
-            muxes = entry["sb"][bus]["mux"]
-            for sink in muxes:
-                sink_wire = convert_bus_to_tuple(sink)
-                if sink not in connections:
-                    connections[sink] = set()
-                for wire in muxes[sink]:
-                    sink_info = convert_bus_to_tuple(wire)
-                    if sink_info is not None:
-                        connections[sink].add(sink_info)
-                    elif wire == "pe_out_res":
-                        operands["out"].add(sink_wire)
-                    elif wire == "pe_out_res_p":
-                        operands["outb"].add(sink_wire)
-                    elif wire == "rdata":
-                        operands["rdata"].add(sink_wire)
-                    elif wire == "valid":
-                        operands["valid"].add(sink_wire)
 
+def convert_wire(wire, wire_info):
+    """convert_bus_to_tuple with a cache, so that every tile shares the same
+       wire tuples"""
+    if wire not in wire_info:
+        wire_info[wire] = convert_bus_to_tuple(wire)
+    return wire_info[wire]
+
+
+def build_tile_resource(entry, wire_info):
+    if "cb" not in entry:
+        # io entry
+        operands = {"in": set(), "out": set(), "inb": set(), "outb": set()}
+        port_io = {"in": 0, "out": 1, "inb": 0, "outb": 1}
+        input_channels = entry["input"]
+        output_channels = entry["output"]
+        for wire_name in input_channels:
+            wire = convert_wire(wire_name, wire_info)
+            if wire is not None:
+                assert wire[1] == 0
+                if wire[0] == 1:
+                    sink = "inb"
+                else:
+                    sink = "in"
+                operands[sink].add(wire)
+        for wire_name in output_channels:
+            wire = convert_wire(wire_name, wire_info)
+            if wire is not None:
+                assert wire[1] == 1
+                if wire[0] == 1:
+                    sink = "outb"
+                else:
+                    sink = "out"
+                operands[sink].add(wire)
+
+        # clean up
         if len(operands["out"]) == 0:
             operands.pop("out", None)
-        if len(operands["rdata"]) == 0:
-            operands.pop("rdata", None)
-        if len(operands["valid"]) == 0:
-            operands.pop("valid", None)
-
-        # build real routing resources on the chip
-        route_resource = set()
-        for w1 in connections:
-            w1_info = convert_bus_to_tuple(w1)
-            for w2 in connections[w1]:
-                # NOTE:
-                # we might not use all the mem routing resource, which allows
-                # in -> in on different rows
-                route_resource.add((w2, w1_info))
-        result[(x, y)] = {"route_resource": route_resource,
-                          "port": operands,
-                          "port_io": port_io}
+        if len(operands["outb"]) == 0:
+            operands.pop("outb", None)
+        if len(operands["in"]) == 0:
+            operands.pop("in", None)
+        if len(operands["inb"]) == 0:
+            operands.pop("inb", None)
 
-    return result
+        return {"route_resource": set(),
+                "port": operands,
+                "port_io": port_io}
+    # build operand connection
+    operands = {"out": set(), "outb": set(), "rdata": set(), "valid": set()}
+    port_io = {}
+    for port in operands:
+        port_io[port] = 1
+    connections = {}
+    for bus in entry["cb"]:
+        for sink in entry["cb"][bus]:
+            assert sink not in operands
+            operands[sink] = set()
+            wires = entry["cb"][bus][sink]
+            for wire in wires:
+                wire_tuple = convert_wire(wire, wire_info)
+                if wire_tuple is not None:
+                    operands[sink].add(wire_tuple)
+                    port_io[sink] = 0
+
+    for bus in entry["sb"]:
+        muxes = entry["sb"][bus]["mux"]
+        for sink in muxes:
+            sink_wire = convert_wire(sink, wire_info)
+            if sink not in connections:
+                connections[sink] = set()
+            for wire in muxes[sink]:
+                sink_info = convert_wire(wire, wire_info)
+                if sink_info is not None:
+                    connections[sink].add(sink_info)
+                elif wire == "pe_out_res":
+                    operands["out"].add(sink_wire)
+                elif wire == "pe_out_res_p":
+                    operands["outb"].add(sink_wire)
+                elif wire == "rdata":
+                    operands["rdata"].add(sink_wire)
+                elif wire == "valid":
+                    operands["valid"].add(sink_wire)
+
+    if len(operands["out"]) == 0:
+        operands.pop("out", None)
+    if len(operands["rdata"]) == 0:
+        operands.pop("rdata", None)
+    if len(operands["valid"]) == 0:
+        operands.pop("valid", None)
+
+    # build real routing resources on the chip
+    route_resource = set()
+    for w1 in connections:
+        w1_info = convert_wire(w1, wire_info)
+        for w2 in connections[w1]:
+            # NOTE:
+            # we might not use all the mem routing resource, which allows
+            # in -> in on different rows
+            route_resource.add((w2, w1_info))
+    return {"route_resource": route_resource,
+            "port": operands,
+            "port_io": port_io}
 
 
 def simple_route_stats(parsed_routing_resource):
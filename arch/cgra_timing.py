@@ -0,0 +1,325 @@
+"""static timing analysis over routed designs.
+
+the timing graph has a node for the source and every sink of each net. route
+edges go from a net source to its sinks, and block edges go from the inputs of
+a combinational block to the sources of the nets it drives. memories, IOs,
+registers and PE inputs with a folded register start and end paths. nodes and
+edges are kept in flat arrays so that arrival and required times are computed
+one topological level at a time"""
+from __future__ import print_function, division
+import numpy as np
+
+from .cgra_analytics import TIMING_INFO
+
+# delay types of the critical path breakdown, in print order
+DELAY_TYPES = ("mul", "sb", "alu", "cb", "mem", "reg")
+
+
+def get_blk_timing_types(instances, id_to_name, changed_pe):
+    """timing type of every PE block, i.e. alu or mul, using the op of its
+    instance in the netlist json"""
+    from .cgra import get_tile_op
+    result = {}
+    for blk_id in id_to_name:
+        if blk_id[0] != "p" or id_to_name[blk_id] not in instances:
+            continue
+        instance = instances[id_to_name[blk_id]]
+        if "genref" not in instance:
+            continue
+        op, _ = get_tile_op(instance, blk_id, changed_pe)
+        if op is not None and "mul" in op:
+            result[blk_id] = "mul"
+        else:
+            result[blk_id] = "alu"
+    return result
+
+
+def get_registered_ports(folded_blocks):
+    """block inputs with a register folded into them"""
+    result = set()
+    for (blk_id, _), folded in folded_blocks.items():
+        if blk_id[0] == "r":
+            result.add((folded[0], folded[-1]))
+    return result
+
+
+def compute_route_delays(net, segments, timing_info=TIMING_INFO):
+    """delay vector (in DELAY_TYPES order) from the net source to each sink.
+    segments are in pin order, and each one starts either at the source or
+    at a node of another segment"""
+    num_types = len(DELAY_TYPES)
+    sb_index = DELAY_TYPES.index("sb")
+    reg_index = DELAY_TYPES.index("reg")
+    cb_index = DELAY_TYPES.index("cb")
+    result = np.zeros((len(net) - 1, num_types))
+    if not segments:
+        return result
+    reached = set()
+    for segment in segments:
+        for node in segment[1:]:
+            reached.add(tuple(node))
+    node_delays = {}
+    pending = list(range(min(len(segments), len(net) - 1)))
+    progress = True
+    while pending:
+        next_pending = []
+        for seg_index in pending:
+            segment = segments[seg_index]
+            start = tuple(segment[0])
+            if start in node_delays:
+                delay = node_delays[start].copy()
+            elif progress and start in reached:
+                # starts on a segment that hasn't been resolved yet
+                next_pending.append(seg_index)
+                continue
+            else:
+                delay = np.zeros(num_types)
+            node_delays.setdefault(start, delay.copy())
+            for node in segment[1:]:
+                node_type = node[0]
+                # switch box muxes sit on the outputs
+                if node_type == "SB" and node[5] == 1:
+                    delay[sb_index] += timing_info["sb"]
+                elif node_type == "REG":
+                    delay[reg_index] += timing_info["reg"]
+                elif node_type == "PORT":
+                    delay[cb_index] += timing_info["cb"]
+                node_delays.setdefault(tuple(node), delay.copy())
+            result[seg_index] = delay
+        progress = len(next_pending) < len(pending)
+        pending = next_pending
+    return result
+
+
+class TimingGraph(object):
+    def __init__(self, netlists, routes, folded_blocks=None, changed_pe=None,
+                 blk_types=None, timing_info=TIMING_INFO):
+        """netlists are the packed netlists, routes the parsed routing
+        result. blk_types gives the PE timing types, see
+        get_blk_timing_types. every other PE is an alu"""
+        self.timing_info = timing_info
+        folded_blocks = folded_blocks if folded_blocks is not None else {}
+        changed_pe = changed_pe if changed_pe is not None else set()
+        blk_types = blk_types if blk_types is not None else {}
+        registered_ports = get_registered_ports(folded_blocks)
+        num_types = len(DELAY_TYPES)
+
+        net_ids = list(netlists.keys())
+        net_ids.sort(key=lambda n: int(n[1:]) if n[1:].isdigit() else n)
+        # node tables. source node of a net is followed by its sinks
+        self.node_blks = []
+        self.node_ports = []
+        self.node_nets = []
+        self.source_nodes = {}
+        route_src, route_dst, route_delays = [], [], []
+        blk_sources = {}
+        comb_sinks = []
+        for net_id in net_ids:
+            net = netlists[net_id]
+            src = len(self.node_blks)
+            self.source_nodes[net_id] = src
+            for blk_id, port in net:
+                self.node_blks.append(blk_id)
+                self.node_ports.append(port)
+                self.node_nets.append(net_id)
+            blk_sources.setdefault(net[0][0], []).append(src)
+            route_src += [src] * (len(net) - 1)
+            route_dst += range(src + 1, src + len(net))
+            route_delays.append(compute_route_delays(net,
+                                                     routes.get(net_id, []),
+                                                     timing_info))
+            for index in range(1, len(net)):
+                blk_id, port = net[index]
+                if blk_id[0] == "p" and blk_id not in changed_pe and \
+                        (blk_id, port) not in registered_ports:
+                    comb_sinks.append(src + index)
+        num_nodes = len(self.node_blks)
+
+        # block edges through the combinational PEs
+        blk_src, blk_dst, blk_delays = [], [], []
+        for sink in comb_sinks:
+            blk_id = self.node_blks[sink]
+            delay = np.zeros(num_types)
+            blk_type = blk_types.get(blk_id, "alu")
+            delay[DELAY_TYPES.index(blk_type)] = timing_info[blk_type]
+            for src in blk_sources.get(blk_id, []):
+                blk_src.append(sink)
+                blk_dst.append(src)
+                blk_delays.append(delay)
+
+        self.edge_src = np.array(route_src + blk_src, dtype=np.int64)
+        self.edge_dst = np.array(route_dst + blk_dst, dtype=np.int64)
+        delays = route_delays + [np.array(blk_delays).reshape((-1,
+                                                               num_types))]
+        self.edge_delays = np.concatenate(delays).reshape((-1, num_types))
+        self.edge_delay = self.edge_delays.sum(axis=1)
+
+        # paths start at the sources of sequential blocks, and at PEs with a
+        # register on any of their inputs. combinational PEs only start a
+        # path when it has to be broken up on a combinational loop
+        self.launch_delays = np.zeros((num_nodes, num_types))
+        self.launch = np.full(num_nodes, -np.inf)
+        self.is_source = np.zeros(num_nodes, dtype=bool)
+        self._loop_delays = {}
+        has_comb_input = set(self.node_blks[sink] for sink in comb_sinks)
+        registered_blks = set(blk_id for blk_id, _ in registered_ports)
+        for net_id in net_ids:
+            src = self.source_nodes[net_id]
+            self.is_source[src] = True
+            blk_id = self.node_blks[src]
+            delay = np.zeros(num_types)
+            if blk_id[0] == "p":
+                blk_type = blk_types.get(blk_id, "alu")
+                delay[DELAY_TYPES.index(blk_type)] = timing_info[blk_type]
+                if blk_id in registered_blks or blk_id in changed_pe:
+                    delay[DELAY_TYPES.index("reg")] = timing_info["reg"]
+                elif blk_id in has_comb_input:
+                    self._loop_delays[src] = delay
+                    continue
+            elif blk_id[0] == "m":
+                delay[DELAY_TYPES.index("mem")] = timing_info["mem"]
+            elif blk_id[0] == "r":
+                delay[DELAY_TYPES.index("reg")] = timing_info["reg"]
+            self.launch_delays[src] = delay
+            self.launch[src] = delay.sum()
+
+        self.arrival = None
+        self.required = None
+        self.critical_path_delay = 0
+        self.levels = []
+        self._pred_edge = None
+
+    def _levelize(self):
+        """nodes in topological levels. a combinational loop is broken at
+        its net source with the lowest id, which then starts a path. edges
+        that go back to an earlier level are not timed"""
+        num_nodes = len(self.node_blks)
+        order = np.argsort(self.edge_src, kind="stable")
+        self._out_edges = order
+        self._out_offsets = np.searchsorted(self.edge_src[order],
+                                            np.arange(num_nodes + 1))
+        in_degree = np.bincount(self.edge_dst, minlength=num_nodes)
+        done = np.zeros(num_nodes, dtype=bool)
+        levels = []
+        level_edges = []
+        frontier = np.flatnonzero(in_degree == 0)
+        num_done = 0
+        while num_done < num_nodes:
+            if len(frontier) == 0:
+                frontier = np.flatnonzero(~done & self.is_source)[:1]
+                if len(frontier) == 0:
+                    frontier = np.flatnonzero(~done)[:1]
+                node = int(frontier[0])
+                if node in self._loop_delays:
+                    self.launch_delays[node] = self._loop_delays[node]
+                    self.launch[node] = self._loop_delays[node].sum()
+            done[frontier] = True
+            num_done += len(frontier)
+            levels.append(frontier)
+            edges = self._get_out_edges(frontier)
+            level_edges.append(edges)
+            dst = self.edge_dst[edges]
+            np.subtract.at(in_degree, dst, 1)
+            dst = np.unique(dst)
+            frontier = dst[(in_degree[dst] <= 0) & ~done[dst]]
+
+        level_of = np.zeros(num_nodes, dtype=np.int64)
+        for index, level in enumerate(levels):
+            level_of[level] = index
+        self._forward = level_of[self.edge_dst] > level_of[self.edge_src]
+        self._level_edges = [edges[self._forward[edges]]
+                             for edges in level_edges]
+        return levels
+
+    def _get_out_edges(self, nodes):
+        starts = self._out_offsets[nodes]
+        counts = self._out_offsets[nodes + 1] - starts
+        total = counts.sum()
+        if total == 0:
+            return np.zeros(0, dtype=np.int64)
+        # concatenated ranges [start, start + count)
+        offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+        return self._out_edges[np.arange(total) + offsets]
+
+    def _get_endpoints(self):
+        """paths end at nodes without forward fanout"""
+        out_degree = np.bincount(self.edge_src[self._forward],
+                                 minlength=len(self.node_blks))
+        return out_degree == 0
+
+    def analyze(self):
+        """computes the arrival and required times. returns the critical
+        path delay"""
+        self.levels = self._levelize()
+        arrival = self.launch.copy()
+        for edges in self._level_edges:
+            np.maximum.at(arrival, self.edge_dst[edges],
+                          arrival[self.edge_src[edges]] +
+                          self.edge_delay[edges])
+        arrival[np.isneginf(arrival)] = 0
+        self.arrival = arrival
+
+        endpoints = self._get_endpoints()
+        self.critical_path_delay = arrival[endpoints].max() \
+            if endpoints.any() else 0
+        required = np.full(len(arrival), np.inf)
+        required[endpoints] = self.critical_path_delay
+        for edges in reversed(self._level_edges):
+            np.minimum.at(required, self.edge_src[edges],
+                          required[self.edge_dst[edges]] -
+                          self.edge_delay[edges])
+        self.required = required
+        self._pred_edge = None
+        return self.critical_path_delay
+
+    def get_slack(self):
+        return self.required - self.arrival
+
+    def get_fmax(self):
+        """max clock frequency in MHz. delays are in ps"""
+        if self.critical_path_delay <= 0:
+            return float("inf")
+        return 1e6 / self.critical_path_delay
+
+    def _compute_pred_edges(self):
+        """the latest forward in edge of every node, or -1 if the node
+        starts its path"""
+        edges = np.flatnonzero(self._forward)
+        arrival = self.arrival[self.edge_src[edges]] + self.edge_delay[edges]
+        order = np.lexsort((arrival, self.edge_dst[edges]))
+        dst = self.edge_dst[edges[order]]
+        last = np.flatnonzero(np.append(dst[1:] != dst[:-1], True))
+        best = order[last]
+        # launched nodes start a path unless an input arrives later
+        later = arrival[best] > self.launch[self.edge_dst[edges[best]]]
+        self._pred_edge = np.full(len(self.arrival), -1, dtype=np.int64)
+        self._pred_edge[self.edge_dst[edges[best[later]]]] = \
+            edges[best[later]]
+
+    def get_critical_paths(self, num_paths=1):
+        """the paths to the num_paths latest endpoints, latest first. each
+        path is a list of node indices, starting at where the path is
+        launched"""
+        if self.arrival is None:
+            self.analyze()
+        if self._pred_edge is None:
+            self._compute_pred_edges()
+        endpoints = np.flatnonzero(self._get_endpoints())
+        endpoints = endpoints[np.argsort(-self.arrival[endpoints],
+                                         kind="stable")]
+        paths = []
+        for node in endpoints[:num_paths]:
+            path = [int(node)]
+            while self._pred_edge[path[-1]] >= 0:
+                path.append(int(self.edge_src[self._pred_edge[path[-1]]]))
+            path.reverse()
+            paths.append(path)
+        return paths
+
+    def get_delay_breakdown(self, path):
+        """delay of a path from get_critical_paths per delay type, as a
+        dict"""
+        delays = self.launch_delays[path[0]].copy()
+        if len(path) > 1:
+            delays += self.edge_delays[self._pred_edge[path[1:]]].sum(axis=0)
+        return dict(zip(DELAY_TYPES, delays))
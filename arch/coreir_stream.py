@@ -0,0 +1,254 @@
+"""
+Incremental reader for CoreIR json files. Only the instances and connections
+of the top module are materialized; everything else in the document (other
+namespaces, generators, library modules) is skipped without being decoded,
+so the peak memory stays close to the size of the top module instead of a
+multiple of the file size.
+
+This module is also imported by the standalone coreir_fix scripts, hence it
+only depends on the standard library.
+"""
+from __future__ import print_function
+import io
+import json
+import re
+import sys
+
+CHUNK_SIZE = 1 << 20
+
+_WHITESPACE = re.compile(r"\s*")
+# used to skip the content of a container up to the next bracket. complete
+# strings are consumed as a whole so that brackets inside them are ignored
+_SKIP_CONTENT = re.compile(r'(?:[^"{}\[\]]+|"[^"\\]*(?:\\.[^"\\]*)*")*')
+
+
+class JsonStream(object):
+    """a pull-style json scanner over a text file. containers can be iterated
+    element by element with iter_object()/iter_array(); the caller has to
+    consume every value through read_value() or skip_value()
+    """
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.__file = f
+        self.__chunk_size = chunk_size
+        self.__buf = ""
+        self.__pos = 0
+        # absolute offset of the first character in the buffer
+        self.__base = 0
+        self.__eof = False
+        self.__decoder = json.JSONDecoder()
+
+    @property
+    def offset(self):
+        return self.__base + self.__pos
+
+    def __read_more(self, size=None):
+        if self.__eof:
+            return False
+        data = self.__file.read(max(size or 0, self.__chunk_size))
+        if not data:
+            self.__eof = True
+            return False
+        # drop everything that has been consumed
+        self.__base += self.__pos
+        self.__buf = self.__buf[self.__pos:] + data
+        self.__pos = 0
+        return True
+
+    def __skip_whitespace(self):
+        while True:
+            self.__pos = _WHITESPACE.match(self.__buf, self.__pos).end()
+            if self.__pos < len(self.__buf) or not self.__read_more():
+                return
+
+    def __error(self, msg):
+        return ValueError(msg + " at offset " + str(self.offset))
+
+    def peek(self):
+        self.__skip_whitespace()
+        if self.__pos >= len(self.__buf):
+            raise self.__error("Unexpected end of json")
+        return self.__buf[self.__pos]
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise self.__error("Expect " + char)
+        self.__pos += 1
+
+    def read_value(self):
+        self.__skip_whitespace()
+        while True:
+            try:
+                value, end = self.__decoder.raw_decode(self.__buf, self.__pos)
+                # a number at the end of the buffer might be truncated
+                if end < len(self.__buf) or self.__eof:
+                    self.__pos = end
+                    return value
+            except ValueError:
+                if self.__eof:
+                    raise
+            # grow geometrically so that large values are not re-parsed
+            # over and over again
+            self.__read_more(len(self.__buf) - self.__pos)
+
+    def skip_value(self):
+        if self.peek() not in "{[":
+            # scalars are small
+            self.read_value()
+            return
+        depth = 0
+        while True:
+            self.__pos = _SKIP_CONTENT.match(self.__buf, self.__pos).end()
+            if self.__pos == len(self.__buf) or \
+                    self.__buf[self.__pos] == '"':
+                # either the end of buffer or an incomplete string
+                if not self.__read_more(len(self.__buf) - self.__pos):
+                    raise self.__error("Unexpected end of json")
+                continue
+            char = self.__buf[self.__pos]
+            self.__pos += 1
+            if char == "{" or char == "[":
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return
+
+    def __iter_container(self, begin, end, read_key):
+        self.expect(begin)
+        if self.peek() == end:
+            self.__pos += 1
+            return
+        index = 0
+        while True:
+            if read_key:
+                key = self.read_value()
+                self.expect(":")
+                yield key
+            else:
+                yield index
+                index += 1
+            char = self.peek()
+            self.__pos += 1
+            if char == end:
+                return
+            elif char != ",":
+                raise self.__error("Expect , or " + end)
+
+    def iter_object(self):
+        """yields the keys of an object"""
+        return self.__iter_container("{", "}", True)
+
+    def iter_array(self):
+        """yields the indices of an array"""
+        return self.__iter_container("[", "]", False)
+
+
+def open_json(filename):
+    return io.open(filename, encoding="utf-8")
+
+
+def find_top(filename):
+    """scans the root object for the top module name"""
+    with open_json(filename) as f:
+        stream = JsonStream(f)
+        for key in stream.iter_object():
+            if key == "top":
+                return stream.read_value().split(".")[-1]
+            stream.skip_value()
+    return None
+
+
+def load_top_module(filename, top=None, load_instances=True):
+    """returns instances and connections of the top module, as well as the
+    character spans of their json values in the file, which can be used to
+    rewrite the file with rewrite_spans(). if top is None, it is read from the
+    document
+    """
+    if top is None:
+        top = find_top(filename)
+        assert top is not None, "Unable to find top in " + filename
+    instances = {}
+    connections = []
+    spans = {}
+
+    def walk(stream, path, handler):
+        # descend into the object following path and call the handler on
+        # the value at the end of it
+        for key in stream.iter_object():
+            if key != path[0]:
+                stream.skip_value()
+            elif len(path) == 1:
+                handler(stream, key)
+            else:
+                walk(stream, path[1:], handler)
+
+    def read_design(stream, _):
+        for key in stream.iter_object():
+            if key == "instances" and load_instances:
+                stream.peek()
+                start = stream.offset
+                for name in stream.iter_object():
+                    instances[name] = stream.read_value()
+                spans[key] = (start, stream.offset)
+            elif key == "connections":
+                stream.peek()
+                start = stream.offset
+                for _ in stream.iter_array():
+                    connections.append(stream.read_value())
+                spans[key] = (start, stream.offset)
+            else:
+                stream.skip_value()
+
+    with open_json(filename) as f:
+        walk(JsonStream(f), ["namespaces", "global", "modules", top],
+             read_design)
+    return instances, connections, spans
+
+
+def rewrite_spans(input_filename, output_filename, replacements,
+                  chunk_size=CHUNK_SIZE):
+    """copies the input file to the output, replacing the character spans
+    given as [(start, end, text)]"""
+    replacements = sorted(replacements)
+    with open_json(input_filename) as fin, \
+            io.open(output_filename, "w+", encoding="utf-8") as fout:
+        pos = 0
+
+        def copy(size):
+            while size > 0:
+                data = fin.read(min(size, chunk_size))
+                if not data:
+                    break
+                fout.write(data)
+                size -= len(data)
+
+        for start, end, text in replacements:
+            assert start >= pos
+            copy(start - pos)
+            # skip the replaced span
+            skipped = 0
+            while skipped < end - start:
+                data = fin.read(min(end - start - skipped, chunk_size))
+                if not data:
+                    break
+                skipped += len(data)
+            fout.write(u"" + text)
+            pos = end
+        data = fin.read(chunk_size)
+        while data:
+            fout.write(data)
+            data = fin.read(chunk_size)
+
+
+def peak_memory_usage():
+    """peak resident memory of the current process in MB, or None if it
+    cannot be determined on this platform"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports in bytes, Linux in KB
+    if sys.platform == "darwin":
+        return usage / float(1 << 20)
+    return usage / float(1 << 10)
@@ -1,5 +1,4 @@
 from __future__ import print_function
-import json
 import numpy as np
 import sys
 import os.path
@@ -10,8 +9,10 @@ if __name__ == '__main__':
     sys.path.append(os.path.dirname(
         os.path.dirname(os.path.abspath(__file__))))
     from netlist import is_conn_out
+    from coreir_stream import load_top_module
 else:
     from ..netlist import is_conn_out
+    from ..coreir_stream import load_top_module
 
 
 def build_raw_graph(raw_connections):
@@ -102,10 +103,8 @@ def handle_emb_clustering(filename, raw_names):
 
 
 def get_raw_connections(filename):
-    with open(filename) as f:
-        design = json.load(f)
-    design_connections = design["namespaces"]["global"]["modules"]["DesignTop"]\
-            ["connections"]
+    _, design_connections, _ = load_top_module(filename, top="DesignTop",
+                                               load_instances=False)
     return design_connections
 
 
@@ -1,3 +1,4 @@
+from collections import deque
 import six
 
 
@@ -6,16 +7,24 @@ def group_reg_nets(netlists):
     linked_nets = {}
 
     reg_srcs = {}
-    reg_srcs_nets = set()
+    # reg id -> non-reg nets that have the reg as a sink, in netlists order
+    reg_sinks = {}
     # first pass to find any nets whose sources are a reg
     for net_id in netlists:
         net = netlists[net_id]
         if net[0][0][0] == "r":
             reg_id = net[0][0]
             reg_srcs[reg_id] = net_id
-            reg_srcs_nets.add(net_id)
             # also means we have to remove it from the main netlists
             net_id_to_remove.add(net_id)
+    for net_id in netlists:
+        if net_id in net_id_to_remove:
+            continue
+        for blk_id, _ in netlists[net_id]:
+            if blk_id[0] == "r":
+                if blk_id not in reg_sinks:
+                    reg_sinks[blk_id] = []
+                reg_sinks[blk_id].append(net_id)
 
     # Keyi:
     # because a reg cannot drive more than one wire (otherwise they will be
@@ -26,12 +35,16 @@ def group_reg_nets(netlists):
     # merged into the main net.
 
     def squash_net(nets, src_id):
-        result = [src_id]
-        for b_id, _ in nets[src_id][1:]:
-            if b_id[0] == "r":
-                # found another one
-                next_id = reg_srcs[b_id]
-                result += squash_net(nets, next_id)
+        # pre-order walk down the reg chain. use an explicit stack since the
+        # chain can be deeper than the recursion limit
+        result = []
+        working_set = [src_id]
+        while len(working_set) > 0:
+            n_id = working_set.pop()
+            result.append(n_id)
+            next_ids = [reg_srcs[b_id] for b_id, _ in nets[n_id][1:]
+                        if b_id[0] == "r"]
+            working_set += reversed(next_ids)
         return result
 
     resolved_net = set()
@@ -40,22 +53,16 @@ def group_reg_nets(netlists):
         if r_net_id in resolved_net:
             continue
         # search for the ultimate src
-        reg = netlists[r_net_id][0][0]  # id for that reg
-        for net_id in netlists:
-            if net_id in reg_srcs_nets:
-                continue
-            net = netlists[net_id]
-            for blk_id, _ in net:
-                if blk_id == reg:
-                    # found the ultimate src
-                    # now do a squash to obtain the set of all nets
-                    merged_nets = squash_net(netlists, r_net_id)
-                    for m_id in merged_nets:
-                        resolved_net.add(m_id)
-                    if net_id in linked_nets:
-                        linked_nets[net_id] += merged_nets
-                    else:
-                        linked_nets[net_id] = merged_nets
+        for net_id in reg_sinks.get(reg_id, []):
+            # found the ultimate src
+            # now do a squash to obtain the set of all nets
+            merged_nets = squash_net(netlists, r_net_id)
+            for m_id in merged_nets:
+                resolved_net.add(m_id)
+            if net_id in linked_nets:
+                linked_nets[net_id] += merged_nets
+            else:
+                linked_nets[net_id] = merged_nets
 
     # make sure we've merged every nets
     assert(len(resolved_net) == len(net_id_to_remove))
@@ -64,20 +71,26 @@ def group_reg_nets(netlists):
     reg_net_order = {}
     for net_id in linked_nets:
         reg_nets = linked_nets[net_id]
+        # src reg -> reg nets in the group it drives
+        reg_net_src = {}
+        for reg_net_id in reg_nets:
+            reg = netlists[reg_net_id][0][0]
+            if reg not in reg_net_src:
+                reg_net_src[reg] = []
+            reg_net_src[reg].append(reg_net_id)
         reg_net_index = {}
         index = 0
-        working_set = [net_id]
+        working_set = deque([net_id])
         while len(working_set) > 0:
-            n_id = working_set.pop(0)
+            n_id = working_set.popleft()
             for blk, _ in netlists[n_id][1:]:
                 if blk[0] == "r":
                     # find the reg_net that has it as src
-                    for reg_net_id in reg_nets:
-                        if netlists[reg_net_id][0][0] == blk:
-                            working_set.append(reg_net_id)
-                            reg_net_index[reg_net_id] = index
-                            index += 1
-                            reg_net_order[reg_net_id] = n_id
+                    for reg_net_id in reg_net_src.get(blk, []):
+                        working_set.append(reg_net_id)
+                        reg_net_index[reg_net_id] = index
+                        index += 1
+                        reg_net_order[reg_net_id] = n_id
         reg_nets.sort(key=lambda x: reg_net_index[x])
 
     return linked_nets, net_id_to_remove, reg_net_order
@@ -0,0 +1,270 @@
+"""
+Binary container for packed netlists. It holds the same information as the
+text .packed file, but block ids and ports are interned into a string table
+and every section is stored as flat little-endian uint32 arrays, so that the
+file can be mmap-ed and the arrays viewed directly with numpy.
+
+Layout:
+    header:   magic (8 bytes), version (u32), number of sections (u32)
+    table:    per section: name (8 bytes), offset (u64), size (u64)
+    section:  number of arrays (u32), array lengths (u32 each), the arrays,
+              then any trailing raw bytes (used by the string table)
+Every section starts on an 8-byte boundary. The same container is used for
+the binary routing graph, see routing_graph_binary.py.
+"""
+from __future__ import print_function
+import mmap
+import struct
+import six
+
+MAGIC = b"CGRAPKD\x00"
+VERSION = 1
+
+_HEADER = struct.Struct("<8sII")
+_SECTION_ENTRY = struct.Struct("<8sQQ")
+_ALIGNMENT = 8
+
+SECTION_STRINGS = "strings"
+SECTION_NETLISTS = "netlists"
+SECTION_FOLDED = "folded"
+SECTION_ID_TO_NAME = "id2name"
+SECTION_CHANGED_PE = "changed"
+SECTION_TRACK_MODE = "trackmd"
+
+
+def is_packed_binary(filename):
+    with open(filename, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class _StringTable(object):
+    def __init__(self):
+        self.index = {}
+        self.strings = []
+
+    def intern(self, value):
+        value = str(value)
+        if value not in self.index:
+            self.index[value] = len(self.strings)
+            self.strings.append(value)
+        return self.index[value]
+
+    def to_section(self):
+        blob = [s.encode("utf-8") for s in self.strings]
+        offsets = [0]
+        for entry in blob:
+            offsets.append(offsets[-1] + len(entry))
+        return _pack_section([offsets], b"".join(blob))
+
+
+def _pack_section(arrays, raw=b""):
+    header = struct.pack("<I", len(arrays))
+    header += b"".join([struct.pack("<I", len(a)) for a in arrays])
+    body = b"".join([struct.pack("<%dI" % len(a), *a) for a in arrays])
+    return header + body + raw
+
+
+def _net_id_key(net_id):
+    return int(net_id[1:])
+
+
+def write_packed_binary(changed_pe, folded_blocks, id_to_name, netlists,
+                        pack_filename, track_mode):
+    """same arguments as write_packing_result, but emits the binary format"""
+    table = _StringTable()
+    sections = []
+
+    net_ids = list(netlists.keys())
+    net_ids.sort(key=_net_id_key)
+    net_names, net_offsets, pin_blks, pin_ports = [], [0], [], []
+    for net_id in net_ids:
+        net_names.append(table.intern(net_id))
+        for blk_id, port in netlists[net_id]:
+            pin_blks.append(table.intern(blk_id))
+            pin_ports.append(table.intern(port))
+        net_offsets.append(len(pin_blks))
+    sections.append((SECTION_NETLISTS, _pack_section([net_names, net_offsets,
+                                                      pin_blks, pin_ports])))
+
+    key_blks, key_ports, value_offsets, values = [], [], [0], []
+    for entry in folded_blocks:
+        key_blks.append(table.intern(entry[0]))
+        key_ports.append(table.intern(entry[1]))
+        values += [table.intern(val) for val in folded_blocks[entry]]
+        value_offsets.append(len(values))
+    sections.append((SECTION_FOLDED, _pack_section([key_blks, key_ports,
+                                                    value_offsets, values])))
+
+    ids = list(id_to_name.keys())
+    ids.sort(key=_net_id_key)
+    sections.append((SECTION_ID_TO_NAME,
+                     _pack_section([[table.intern(i) for i in ids],
+                                    [table.intern(id_to_name[i])
+                                     for i in ids]])))
+
+    sections.append((SECTION_CHANGED_PE,
+                     _pack_section([[table.intern(blk_id)
+                                     for blk_id in changed_pe]])))
+
+    track_ids = list(track_mode.keys())
+    sections.append((SECTION_TRACK_MODE,
+                     _pack_section([[table.intern(i) for i in track_ids],
+                                    [track_mode[i] for i in track_ids]])))
+
+    # string table goes first so that readers can resolve every section
+    sections.insert(0, (SECTION_STRINGS, table.to_section()))
+
+    def align(pos):
+        return (pos + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+    offset = align(_HEADER.size + _SECTION_ENTRY.size * len(sections))
+    entries = []
+    for name, data in sections:
+        entries.append((name, offset, len(data)))
+        offset = align(offset + len(data))
+
+    with open(pack_filename, "wb+") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(sections)))
+        for name, offset, size in entries:
+            f.write(_SECTION_ENTRY.pack(name.encode("ascii"), offset, size))
+        for (_, offset, _), (_, data) in zip(entries, sections):
+            f.write(b"\x00" * (offset - f.tell()))
+            f.write(data)
+
+
+class SectionFile(object):
+    """mmap-ed view of a binary container. raw uint32 arrays are available
+    through get_arrays(), which returns zero-copy numpy views when numpy is
+    installed
+    """
+    def __init__(self, filename, magic=MAGIC, max_version=VERSION):
+        with open(filename, "rb") as f:
+            self.__buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        file_magic, version, num_sections = _HEADER.unpack_from(self.__buf, 0)
+        if file_magic != magic:
+            raise Exception("Unexpected file format " + filename)
+        if version > max_version:
+            raise Exception("Unsupported file version " + str(version))
+        self.version = version
+        self.sections = {}
+        for i in range(num_sections):
+            name, offset, size = _SECTION_ENTRY.unpack_from(
+                self.__buf, _HEADER.size + i * _SECTION_ENTRY.size)
+            name = name.rstrip(b"\x00").decode("ascii")
+            self.sections[name] = (offset, size)
+
+        self.__strings = None
+
+    def get_arrays(self, section_name, use_numpy=True):
+        """returns the uint32 arrays in the section, and the offset/size of
+        the raw bytes after them"""
+        if section_name not in self.sections:
+            raise Exception("Missing section " + section_name)
+        offset, size = self.sections[section_name]
+        num_arrays, = struct.unpack_from("<I", self.__buf, offset)
+        lengths = struct.unpack_from("<%dI" % num_arrays, self.__buf,
+                                     offset + 4)
+        np = None
+        if use_numpy:
+            try:
+                import numpy as np
+            except ImportError:
+                np = None
+        pos = offset + 4 * (1 + num_arrays)
+        arrays = []
+        for length in lengths:
+            if np is not None:
+                arrays.append(np.frombuffer(self.__buf, dtype="<u4",
+                                            count=length, offset=pos))
+            else:
+                arrays.append(struct.unpack_from("<%dI" % length, self.__buf,
+                                                 pos))
+            pos += 4 * length
+        return arrays, (pos, offset + size - pos)
+
+    @property
+    def strings(self):
+        if self.__strings is None:
+            (offsets, ), (pos, _) = self.get_arrays(SECTION_STRINGS,
+                                                    use_numpy=False)
+            blob = self.__buf[pos:pos + offsets[-1]]
+            self.__strings = [six.ensure_str(blob[offsets[i]:offsets[i + 1]])
+                              for i in range(len(offsets) - 1)]
+        return self.__strings
+
+
+class PackedNetlist(SectionFile):
+    """binary packed netlist. sections are decoded on first access"""
+    def __init__(self, pack_filename):
+        if not is_packed_binary(pack_filename):
+            raise Exception("Not a binary packed file " + pack_filename)
+        SectionFile.__init__(self, pack_filename)
+        self.__cache = {}
+
+    def __get_list_arrays(self, section_name):
+        arrays, _ = self.get_arrays(section_name, use_numpy=False)
+        return arrays
+
+    def __section(self, name, decode):
+        if name not in self.__cache:
+            if name not in self.sections:
+                raise Exception("Missing section " + name)
+            self.__cache[name] = decode(self.__get_list_arrays(name))
+        return self.__cache[name]
+
+    @property
+    def netlists(self):
+        def decode(arrays):
+            s = self.strings
+            net_names, net_offsets, pin_blks, pin_ports = arrays
+            result = {}
+            for i, net_name in enumerate(net_names):
+                start, end = net_offsets[i], net_offsets[i + 1]
+                result[s[net_name]] = [(s[pin_blks[j]], s[pin_ports[j]])
+                                       for j in range(start, end)]
+            return result
+        return self.__section(SECTION_NETLISTS, decode)
+
+    @property
+    def folded_blocks(self):
+        def decode(arrays):
+            s = self.strings
+            key_blks, key_ports, value_offsets, values = arrays
+            result = {}
+            for i in range(len(key_blks)):
+                start, end = value_offsets[i], value_offsets[i + 1]
+                result[(s[key_blks[i]], s[key_ports[i]])] = \
+                    tuple([s[values[j]] for j in range(start, end)])
+            return result
+        return self.__section(SECTION_FOLDED, decode)
+
+    @property
+    def id_to_name(self):
+        def decode(arrays):
+            s = self.strings
+            return {s[blk_id]: s[name] for blk_id, name in zip(*arrays)}
+        return self.__section(SECTION_ID_TO_NAME, decode)
+
+    @property
+    def changed_pe(self):
+        def decode(arrays):
+            s = self.strings
+            return {s[blk_id] for blk_id in arrays[0]}
+        return self.__section(SECTION_CHANGED_PE, decode)
+
+    @property
+    def track_mode(self):
+        def decode(arrays):
+            s = self.strings
+            return {s[net_id]: mode for net_id, mode in zip(*arrays)}
+        return self.__section(SECTION_TRACK_MODE, decode)
+
+
+def load_packed_binary(pack_filename, load_track_mode=False):
+    packed = PackedNetlist(pack_filename)
+    if load_track_mode:
+        return packed.netlists, packed.folded_blocks, packed.id_to_name, \
+               packed.changed_pe, packed.track_mode
+    else:
+        return packed.netlists, packed.folded_blocks, packed.id_to_name, \
+               packed.changed_pe
@@ -23,32 +23,61 @@ def parse_emb(filename, filter_hyperedge=True):
 
 
 def parse_routing(filename):
+    return dict(iter_routing(filename))
+
+
+def iter_routing(filename):
+    """yields the net id and route of every net, one net at a time"""
     with open(filename) as f:
-        lines = f.readlines()
+        for line in f:
+            line = line.strip()
+            if line[:3] == "Net":
+                yield line.split(" ")[2], read_net_routing(line, f)
+
+
+def split_routing(filename):
+    """yields the net id and the lines of every net in the routing file"""
+    net_id = None
+    lines = []
+    with open(filename) as f:
+        for line in f:
+            stripped = line.strip()
+            if stripped[:3] == "Net":
+                if net_id is not None:
+                    yield net_id, lines
+                net_id = stripped.split(" ")[2]
+                lines = []
+            if net_id is not None:
+                lines.append(line)
+    if net_id is not None:
+        yield net_id, lines
+
+
+def parse_net_routing(lines):
+    """parses the lines of a single net, starting with its Net line"""
+    lines = iter(lines)
+    return read_net_routing(next(lines), lines)
+
+
+def read_net_routing(net_line, lines):
+    """reads the segments of a net from lines, which are right after its
+       Net line"""
+    route = []
+    num_seg = int(net_line.split()[-1])
+    for seg_index in range(num_seg):
+        line = next(lines).strip()
+        assert line[:len("Segment")] == "Segment"
+        seg_size = int(line.split()[-1])
+        route.append([parse_node(next(lines)) for _ in range(seg_size)])
+    return route
+
 
-    routes = {}
-    line_index = 0
-    while line_index < len(lines):
-        line = lines[line_index].strip()
-        line_index += 1
-        if line[:3] == "Net":
-            tokens = line.split(" ")
-            net_id = tokens[2]
-            routes[net_id] = []
-            num_seg = int(tokens[-1])
-            for seg_index in range(num_seg):
-                segment = []
-                line = lines[line_index].strip()
-                line_index += 1
-                assert line[:len("Segment")] == "Segment"
-                tokens = line.split()
-                seg_size = int(tokens[-1])
-                for i in range(seg_size):
-                    line = lines[line_index].strip()
-                    line_index += 1
-                    line = "".join([x for x in line if x not in ",()"])
-                    tokens = line.split()
-                    tokens = [int(x) if x.isdigit() else x for x in tokens]
-                    segment.append(tokens)
-                routes[net_id].append(segment)
-    return routes
+def parse_node(line):
+    """e.g. SB (3, 27, 27, 2, 1, 16) -> ["SB", 3, 27, 27, 2, 1, 16]"""
+    head, _, values = line.partition("(")
+    # node names are never numbers
+    tokens = head.split()
+    values = values.rstrip()
+    if values:
+        tokens.extend(map(int, values[:-1].split(",")))
+    return tokens
@@ -0,0 +1,250 @@
+"""
+Binary index of a routing result, stored next to it as <design.route>.idx.
+Every node of every segment is a fixed size record, and the segments of each
+net are CSR ranges into the flat node array. The arrays are memory mapped,
+so a net is only turned into the nested lists of parse_routing when it is
+asked for.
+"""
+from __future__ import print_function
+import hashlib
+import json
+import os
+import struct
+import numpy as np
+from .parser import iter_routing
+
+# bump it whenever the layout of the index changes
+INDEX_VERSION = 1
+MAGIC = b"CGRAROUTE"
+NODE_TYPES = ("SB", "PORT", "REG", "RMUX", "NODE")
+# name indexes names. nodes without a track or a side/io leave them as 0
+NODE_DTYPE = np.dtype([("type", np.uint8), ("name", np.int32),
+                       ("track", np.int32), ("x", np.int32), ("y", np.int32),
+                       ("side", np.uint8), ("io", np.uint8),
+                       ("width", np.uint8)])
+# name, dtype in the order they are stored
+ARRAYS = (("offsets", np.dtype(np.int64)), ("net_ptr", np.dtype(np.int64)),
+          ("seg_ptr", np.dtype(np.int64)), ("nodes", NODE_DTYPE))
+ALIGNMENT = 8
+
+
+def get_index_filename(route_file):
+    return route_file + ".idx"
+
+
+def hash_route(route_file):
+    """digest and byte offset of every net in the route file"""
+    h = hashlib.sha256()
+    offsets = []
+    offset = 0
+    with open(route_file, "rb") as f:
+        for line in f:
+            h.update(line)
+            if line.lstrip()[:3] == b"Net":
+                offsets.append(offset)
+            offset += len(line)
+    return h.hexdigest(), offsets
+
+
+def get_node_record(node, name_index, names):
+    node_type = node[0]
+    if node_type == "SB":
+        _, track, x, y, side, io, width = node
+        return 0, -1, track, x, y, side, io, width
+    name = node[1]
+    if name not in name_index:
+        name_index[name] = len(names)
+        names.append(name)
+    if node_type == "PORT" or node_type == "RMUX":
+        _, _, x, y, width = node
+        return NODE_TYPES.index(node_type), name_index[name], 0, x, y, 0, 0, \
+            width
+    elif node_type == "REG" or node_type == "NODE":
+        _, _, track, x, y, width = node
+        return NODE_TYPES.index(node_type), name_index[name], track, x, y, \
+            0, 0, width
+    raise Exception("Unknown node " + str(node))
+
+
+class RouteIndex(object):
+    def __init__(self, net_ids, names, offsets, net_ptr, seg_ptr, nodes,
+                 digest=""):
+        self.net_ids = net_ids
+        self.names = names
+        # byte offset of every net in the route file
+        self.offsets = offsets
+        # segments of net i are net_ptr[i]:net_ptr[i + 1]
+        self.net_ptr = net_ptr
+        self.seg_ptr = seg_ptr
+        self.nodes = nodes
+        self.digest = digest
+        self.__net_index = None
+
+    @staticmethod
+    def build(route_file):
+        digest, offsets = hash_route(route_file)
+        net_ids = []
+        names = []
+        name_index = {}
+        seg_sizes = [0]
+        net_sizes = [0]
+        records = []
+        for net_id, route in iter_routing(route_file):
+            net_ids.append(net_id)
+            net_sizes.append(len(route))
+            for segment in route:
+                seg_sizes.append(len(segment))
+                for node in segment:
+                    records.append(get_node_record(node, name_index, names))
+        assert len(offsets) == len(net_ids)
+        return RouteIndex(net_ids, names, np.array(offsets, dtype=np.int64),
+                          np.cumsum(net_sizes, dtype=np.int64),
+                          np.cumsum(seg_sizes, dtype=np.int64),
+                          np.array(records, dtype=NODE_DTYPE).reshape(-1),
+                          digest)
+
+    @staticmethod
+    def load(filename):
+        """memory maps the arrays of an index file"""
+        with open(filename, "rb") as f:
+            magic = f.read(len(MAGIC))
+            if magic != MAGIC:
+                raise Exception(filename + " is not a route index")
+            header_size, = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(header_size).decode("utf-8"))
+        if header["version"] != INDEX_VERSION:
+            raise Exception("Unsupported route index version " +
+                            str(header["version"]))
+        arrays = {}
+        for name, dtype in ARRAYS:
+            offset, count = header["arrays"][name]
+            if count == 0:
+                arrays[name] = np.empty(0, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(filename, dtype=dtype, mode="r",
+                                         offset=offset, shape=(count,))
+        return RouteIndex(header["net_ids"], header["names"],
+                          arrays["offsets"], arrays["net_ptr"],
+                          arrays["seg_ptr"], arrays["nodes"],
+                          header["digest"])
+
+    @staticmethod
+    def open(route_file, save=True):
+        """loads the index of the route file if it is up to date. otherwise
+           builds it, and saves it next to the route file if save is set"""
+        from stage_cache import hash_file
+        filename = get_index_filename(route_file)
+        if os.path.isfile(filename):
+            try:
+                index = RouteIndex.load(filename)
+                if index.digest == hash_file(route_file).hexdigest():
+                    return index
+            except Exception:
+                # stale or broken, rebuild it below
+                pass
+        index = RouteIndex.build(route_file)
+        if save:
+            try:
+                index.save(filename)
+            except (IOError, OSError):
+                # read only directory, which is fine
+                pass
+        return index
+
+    def save(self, filename):
+        arrays = [(name, np.ascontiguousarray(getattr(self, name),
+                                              dtype=dtype))
+                  for name, dtype in ARRAYS]
+        header = {"version": INDEX_VERSION, "digest": self.digest,
+                  "net_ids": list(self.net_ids), "names": list(self.names),
+                  "arrays": {}}
+        # offsets depend on the header size, which depends on the offsets
+        data_start = 0
+        while True:
+            offset = data_start
+            for name, array in arrays:
+                header["arrays"][name] = (offset, len(array))
+                offset += (array.nbytes + ALIGNMENT - 1) // ALIGNMENT * \
+                    ALIGNMENT
+            data = json.dumps(header).encode("utf-8")
+            header_end = len(MAGIC) + 8 + len(data)
+            start = (header_end + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+            if start == data_start:
+                break
+            data_start = start
+        temp_filename = filename + ".tmp"
+        with open(temp_filename, "wb+") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<Q", len(data)))
+            f.write(data)
+            for name, array in arrays:
+                f.seek(header["arrays"][name][0])
+                f.write(array.tobytes())
+        os.rename(temp_filename, filename)
+
+    def __len__(self):
+        return len(self.net_ids)
+
+    def __iter__(self):
+        return iter(self.net_ids)
+
+    def __contains__(self, net_id):
+        return net_id in self.__get_net_index()
+
+    def __getitem__(self, net_id):
+        """the same nested lists parse_routing produces"""
+        return self.get_route(self.__get_net_index()[net_id])
+
+    def get(self, net_id, default=None):
+        if net_id in self:
+            return self[net_id]
+        return default
+
+    def keys(self):
+        return list(self.net_ids)
+
+    def items(self):
+        for index, net_id in enumerate(self.net_ids):
+            yield net_id, self.get_route(index)
+
+    def get_net_nodes(self, index):
+        """node records of the index-th net"""
+        start = self.seg_ptr[self.net_ptr[index]]
+        end = self.seg_ptr[self.net_ptr[index + 1]]
+        return self.nodes[start:end]
+
+    def get_node_nets(self):
+        """net index of every node"""
+        net_sizes = np.diff(self.seg_ptr[self.net_ptr])
+        return np.repeat(np.arange(len(self.net_ids)), net_sizes)
+
+    def get_node_segments(self):
+        """segment index of every node"""
+        return np.repeat(np.arange(len(self.seg_ptr) - 1),
+                         np.diff(self.seg_ptr))
+
+    def get_route(self, index):
+        route = []
+        for seg_index in range(self.net_ptr[index],
+                               self.net_ptr[index + 1]):
+            nodes = self.nodes[self.seg_ptr[seg_index]:
+                               self.seg_ptr[seg_index + 1]].tolist()
+            route.append([self.__to_list(node) for node in nodes])
+        return route
+
+    def __to_list(self, node):
+        node_type, name, track, x, y, side, io, width = node
+        node_type = NODE_TYPES[node_type]
+        if node_type == "SB":
+            return [node_type, track, x, y, side, io, width]
+        elif node_type == "PORT" or node_type == "RMUX":
+            return [node_type, self.names[name], x, y, width]
+        else:
+            return [node_type, self.names[name], track, x, y, width]
+
+    def __get_net_index(self):
+        if self.__net_index is None:
+            self.__net_index = {}
+            for index, net_id in enumerate(self.net_ids):
+                self.__net_index[net_id] = index
+        return self.__net_index
@@ -0,0 +1,68 @@
+"""
+Reader for the binary routing graph written by
+pycyclone.io.dump_routing_graph_binary (process_graph.py --binary). It uses the
+container in packed_binary.py with its own magic number and these sections:
+    switches: switch ids, widths, number of tracks, wire offsets and the
+              internal wires as (track from, side from, track to, side to)
+    tiles:    x, y, height, switch id
+    nodes:    node table of NODE_FIELDS columns (type, x, y, width, track,
+              side, io, name index) and the node delays
+    edges:    compressed sparse row adjacency. the out edges of node i are
+              targets[offsets[i]:offsets[i + 1]], with their edge costs
+Every array is exposed as a zero-copy numpy view into the mmap-ed file.
+"""
+from __future__ import print_function
+import numpy as np
+from .packed_binary import SectionFile
+
+MAGIC = b"CGRAGRF\x00"
+VERSION = 1
+
+NODE_FIELDS = 8
+NODE_TYPE, NODE_X, NODE_Y, NODE_WIDTH, NODE_TRACK, NODE_SIDE, NODE_IO, \
+    NODE_NAME = range(NODE_FIELDS)
+
+SECTION_SWITCHES = "switches"
+SECTION_TILES = "tiles"
+SECTION_NODES = "nodes"
+SECTION_EDGES = "edges"
+
+
+def is_routing_graph_binary(filename):
+    with open(filename, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class RoutingGraphFile(SectionFile):
+    def __init__(self, graph_filename):
+        if not is_routing_graph_binary(graph_filename):
+            raise Exception("Not a binary routing graph " + graph_filename)
+        SectionFile.__init__(self, graph_filename, MAGIC, VERSION)
+
+        (nodes, self.delays), _ = self.get_arrays(SECTION_NODES)
+        self.nodes = nodes.reshape(-1, NODE_FIELDS)
+        (self.offsets, self.targets, self.costs), _ = \
+            self.get_arrays(SECTION_EDGES)
+        self.tiles, _ = self.get_arrays(SECTION_TILES)
+        self.switches, _ = self.get_arrays(SECTION_SWITCHES)
+
+    def __len__(self):
+        return len(self.delays)
+
+    @property
+    def num_edges(self):
+        return len(self.targets)
+
+    def neighbors(self, node_id):
+        """returns the target node ids and edge costs of node_id"""
+        start, end = self.offsets[node_id], self.offsets[node_id + 1]
+        return self.targets[start:end], self.costs[start:end]
+
+    def get_name(self, node_id):
+        """name of a port, register or register mux node"""
+        return self.strings[self.nodes[node_id, NODE_NAME]]
+
+    def get_sources(self):
+        """source node id of every edge, aligned with targets and costs"""
+        return np.repeat(np.arange(len(self), dtype=np.uint32),
+                         np.diff(self.offsets))
@@ -0,0 +1,140 @@
+"""
+Array-backed routing resource of a CGRA. A wire, i.e. (bus, io, side, track),
+is a 4-byte record. The switch box connections and the ports of each tile are
+CSR ranges into flat arrays, and so are the wires of each port.
+"""
+from __future__ import print_function
+import itertools
+import numpy as np
+from .cgra_route import iter_tiles, iter_routing_entries, build_tile_resource
+
+WIRE_DTYPE = np.dtype([("bus", np.uint8), ("io", np.uint8),
+                       ("side", np.uint8), ("track", np.uint8)])
+# a connection goes from an incoming track to a switch box sink
+CONN_DTYPE = np.dtype([("src", WIRE_DTYPE), ("dst", WIRE_DTYPE)])
+TILE_DTYPE = np.dtype([("x", np.int32), ("y", np.int32)])
+# name indexes port_names
+PORT_DTYPE = np.dtype([("name", np.int32), ("io", np.uint8)])
+
+
+def wires_to_array(wires, count):
+    """converts count wire tuples into a WIRE_DTYPE array"""
+    data = np.fromiter(itertools.chain.from_iterable(wires), dtype=np.uint8,
+                       count=count * 4)
+    return data.view(WIRE_DTYPE)
+
+
+def get_ptr(counts):
+    ptr = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=ptr[1:])
+    return ptr
+
+
+class RoutingResource(object):
+    def __init__(self, tiles, conn_ptr, conns, port_names, port_ptr, ports,
+                 wire_ptr, port_wires):
+        # tiles are sorted by y and then x
+        self.tiles = tiles
+        self.conn_ptr = conn_ptr
+        self.conns = conns
+        self.port_names = port_names
+        self.port_ptr = port_ptr
+        # sorted by name within a tile
+        self.ports = ports
+        self.wire_ptr = wire_ptr
+        # sorted by track, side, io and bus within a port
+        self.port_wires = port_wires
+
+    @staticmethod
+    def load(cgra_file):
+        """streams the CGRA info file one tile at a time"""
+        return RoutingResource.read(iter_tiles(cgra_file))
+
+    @staticmethod
+    def read(tiles):
+        """builds each tile as soon as it's read off the tile elements"""
+        wire_info = {}
+        return RoutingResource.from_tiles(
+            (pos, build_tile_resource(entry, wire_info)) for pos, entry in
+            iter_routing_entries(tiles))
+
+    @staticmethod
+    def from_dict(routing_resource):
+        """converts the output of build_routing_resource"""
+        return RoutingResource.from_tiles(routing_resource.items())
+
+    @staticmethod
+    def from_tiles(entries):
+        positions = []
+        conns = []
+        ports = []
+        port_wires = []
+        wire_counts = []
+        name_index = {}
+        port_names = []
+        for pos, entry in entries:
+            positions.append(pos)
+            route_resource = entry["route_resource"]
+            conns.append(wires_to_array(
+                itertools.chain.from_iterable(route_resource),
+                len(route_resource) * 2).view(CONN_DTYPE))
+            tile_ports = np.empty(len(entry["port"]), dtype=PORT_DTYPE)
+            tile_wires = []
+            for i, port_name in enumerate(sorted(entry["port"].keys())):
+                if port_name not in name_index:
+                    name_index[port_name] = len(port_names)
+                    port_names.append(port_name)
+                wires = entry["port"][port_name]
+                tile_ports[i] = name_index[port_name], \
+                    entry["port_io"][port_name]
+                tile_wires.append(wires_to_array(wires, len(wires)))
+                wire_counts.append(len(wires))
+            ports.append(tile_ports)
+            port_wires.append(tile_wires)
+
+        tiles = np.array(positions, dtype=np.int32).reshape((-1, 2))
+        order = np.lexsort((tiles[:, 0], tiles[:, 1]))
+        tiles = tiles[order].copy().view(TILE_DTYPE).reshape(-1)
+        conns = [conns[i] for i in order]
+        conn_ptr = get_ptr([len(c) for c in conns])
+        ports = [ports[i] for i in order]
+        port_ptr = get_ptr([len(p) for p in ports])
+        port_wires = list(itertools.chain.from_iterable(
+            [port_wires[i] for i in order]))
+        wire_ptr = get_ptr([len(w) for w in port_wires])
+        wires = np.concatenate(port_wires + [np.empty(0, dtype=WIRE_DTYPE)])
+        # the order the routing graph adds port edges in
+        wire_ports = np.repeat(np.arange(len(wire_ptr) - 1),
+                               np.diff(wire_ptr))
+        wire_order = np.lexsort((wires["bus"], wires["io"], wires["side"],
+                                 wires["track"], wire_ports))
+        return RoutingResource(
+            tiles, conn_ptr,
+            np.concatenate(conns + [np.empty(0, dtype=CONN_DTYPE)]),
+            port_names, port_ptr,
+            np.concatenate(ports + [np.empty(0, dtype=PORT_DTYPE)]),
+            wire_ptr, wires[wire_order])
+
+    def __len__(self):
+        return len(self.tiles)
+
+    def get_conn_tiles(self):
+        """tile index of every connection"""
+        return np.repeat(np.arange(len(self.tiles)), np.diff(self.conn_ptr))
+
+    def get_port_tiles(self):
+        """tile index of every port"""
+        return np.repeat(np.arange(len(self.tiles)), np.diff(self.port_ptr))
+
+    def get_wire_ports(self):
+        """port index of every port wire"""
+        return np.repeat(np.arange(len(self.ports)), np.diff(self.wire_ptr))
+
+    def get_tile_conns(self, index):
+        return self.conns[self.conn_ptr[index]:self.conn_ptr[index + 1]]
+
+    def get_tile_ports(self, index):
+        return self.ports[self.port_ptr[index]:self.port_ptr[index + 1]]
+
+    def get_port_wires(self, index):
+        return self.port_wires[self.wire_ptr[index]:self.wire_ptr[index + 1]]
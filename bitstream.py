@@ -1,6 +1,6 @@
 from __future__ import print_function
 from argparse import ArgumentParser
-from arch.cgra import generate_bitstream
+from arch.cgra import generate_bitstream, update_bitstream
 
 
 def main():
@@ -33,6 +33,15 @@ def main():
                                           "<output.json>",
                         required=False, action="store", dest="io_json",
                         default="")
+    parser.add_argument("-j", "--jobs", help="Number of processes that " +
+                        "generate the routing text. Default is 1",
+                        required=False, type=int, action="store",
+                        dest="jobs", default=1)
+    parser.add_argument("--previous", help="Previous bitstream of the " +
+                        "same netlist. Only the nets whose routes changed " +
+                        "are regenerated",
+                        required=False, action="store", dest="previous",
+                        default="")
     args = parser.parse_args()
     arch_filename = args.arch_filename
     netlist_file = args.netlist_file
@@ -54,10 +63,16 @@ def main():
     print("INFO:", "fold_reg:", fold_reg)
     print("INFO:", "io_json:", io_json)
 
-    generate_bitstream(arch_filename, netlist_file, packed_filename,
-                       placement_file,
-                       routing_file,
-                       output_filename, io_json)
+    if len(args.previous) > 0:
+        print("INFO:", "previous:", args.previous)
+        update_bitstream(arch_filename, netlist_file, packed_filename,
+                         placement_file, routing_file, output_filename,
+                         io_json, args.previous, args.jobs)
+    else:
+        generate_bitstream(arch_filename, netlist_file, packed_filename,
+                           placement_file,
+                           routing_file,
+                           output_filename, io_json, args.jobs)
 
 
 if __name__ == "__main__":
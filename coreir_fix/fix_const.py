@@ -1,7 +1,12 @@
 from __future__ import print_function
 import json
+import os
 import sys
 
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), "arch"))
+from coreir_stream import load_top_module, rewrite_spans  # noqa
+
 
 def main():
     if len(sys.argv) != 3:
@@ -11,12 +16,8 @@ def main():
 
     input_filename = sys.argv[1]
     output_filename = sys.argv[2]
-    with open(input_filename) as f:
-        data = json.load(f)
-    connections = \
-        data["namespaces"]["global"]["modules"]["DesignTop"]["connections"]
-    instances = data["namespaces"]["global"]["modules"]["DesignTop"][
-        "instances"]
+    instances, connections, spans = load_top_module(input_filename,
+                                                    top="DesignTop")
     # first pass to get all the connections
     duplicated_set = find_duplicates(connections)
     print("We have", len(duplicated_set), "consts to fix")
@@ -57,10 +58,12 @@ def main():
     # sanity check
     assert len(find_duplicates(connections)) == 0
 
-    # save to output
-    with open(output_filename, "w+") as f:
-        print("save result to", output_filename)
-        json.dump(data, f)
+    # save to output. only the top module is re-serialized, the rest of the
+    # document is copied over as is
+    print("save result to", output_filename)
+    rewrite_spans(input_filename, output_filename,
+                  [spans["instances"] + (json.dumps(instances), ),
+                   spans["connections"] + (json.dumps(connections), )])
 
 
 def fix_conn(instances, const_name, other_conn, new_name):
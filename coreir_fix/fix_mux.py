@@ -1,7 +1,11 @@
 from __future__ import print_function
-import json
+import os
 import sys
 
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), "arch"))
+from coreir_stream import load_top_module  # noqa
+
 
 def main():
     if len(sys.argv) != 3:
@@ -11,14 +15,8 @@ def main():
 
     input_filename = sys.argv[1]
     output_filename = sys.argv[2]
-    with open(input_filename) as f:
-        data = json.load(f)
-        f.seek(0, 0)
-        raw_lines = f.readlines()
-    connections = \
-        data["namespaces"]["global"]["modules"]["DesignTop"]["connections"]
-    instances = data["namespaces"]["global"]["modules"]["DesignTop"][
-        "instances"]
+    instances, connections, _ = load_top_module(input_filename,
+                                                top="DesignTop")
     # first pass to find all the mux instances
     mux_set = find_mux(instances)
     print("We have", len(mux_set), "muxes to fix:")
@@ -60,9 +58,8 @@ def main():
 
     # save to output
     count = 0
-    with open(output_filename, "w+") as f:
-        for i in range(len(raw_lines)):
-            line = raw_lines[i]
+    with open(input_filename) as fin, open(output_filename, "w+") as f:
+        for line in fin:
             for j in range(len(connection_to_remove)):
                 conn1, conn2 = connection_to_remove[j]
                 if conn1 in line and conn2 in line:
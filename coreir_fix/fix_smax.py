@@ -1,7 +1,11 @@
 from __future__ import print_function
-import json
+import os
 import sys
 
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), "arch"))
+from coreir_stream import load_top_module  # noqa
+
 
 def main():
     if len(sys.argv) != 3:
@@ -11,14 +15,7 @@ def main():
 
     input_filename = sys.argv[1]
     output_filename = sys.argv[2]
-    with open(input_filename) as f:
-        data = json.load(f)
-        f.seek(0, 0)
-        raw_lines = f.readlines()
-    connections = \
-        data["namespaces"]["global"]["modules"]["DesignTop"]["connections"]
-    instances = data["namespaces"]["global"]["modules"]["DesignTop"][
-        "instances"]
+    instances, _, _ = load_top_module(input_filename, top="DesignTop")
     # first pass to find all the mux instances
     smax_set = find_smax(instances)
     print("We have", len(smax_set), "smaxes to fix:")
@@ -27,9 +24,8 @@ def main():
 
     # save to output
     count = 0
-    with open(output_filename, "w+") as f:
-        for i in range(len(raw_lines)):
-            line = raw_lines[i]
+    with open(input_filename) as fin, open(output_filename, "w+") as f:
+        for line in fin:
             if "\"alu_op_debug\":[\"String\",\"max\"]" in line:
                 count += 1
                 line = line.replace("\"alu_op_debug\":[\"String\",\"max\"]",
@@ -0,0 +1,133 @@
+from __future__ import print_function, division
+import random
+import threading
+import time
+from pycyclone import RoutingGraph, SwitchBoxNode, PortNode, SwitchBoxSide
+from pycyclone import GlobalRouter, SwitchBoxIO, Switch
+from pycyclone.util import gsi, get_disjoint_sb_wires
+
+WIDTH = 1
+NUM_TRACK = 4
+SIDES = 4
+SIZE = 16
+SWITCH_ID = 0
+NUM_NETS = 80
+
+
+def create_routing_graph():
+    switchbox = Switch(0, 0, NUM_TRACK, WIDTH, SWITCH_ID,
+                       get_disjoint_sb_wires(NUM_TRACK))
+    g = RoutingGraph(SIZE, SIZE, switchbox)
+    in_port = PortNode("in", 0, 0, WIDTH)
+    out_port = PortNode("out", 0, 0, WIDTH)
+    sb = SwitchBoxNode(0, 0, WIDTH, 0, SwitchBoxSide.Bottom,
+                       SwitchBoxIO.SB_IN)
+    for t_p in g:
+        tile = g[t_p]
+        in_port.x = tile.x
+        in_port.y = tile.y
+        out_port.x = tile.x
+        out_port.y = tile.y
+        for i in range(NUM_TRACK):
+            sb.track = i
+            sb.x = tile.x
+            sb.y = tile.y
+            for side in range(SIDES):
+                sb.side = gsi(side)
+                sb.io = SwitchBoxIO.SB_OUT
+                g.add_edge(out_port, sb)
+                sb.io = SwitchBoxIO.SB_IN
+                g.add_edge(sb, in_port)
+
+    for y in range(SIZE - 1):
+        for x in range(SIZE):
+            for track in range(NUM_TRACK):
+                sb_top = SwitchBoxNode(x, y, WIDTH, track,
+                                       SwitchBoxSide.Bottom,
+                                       SwitchBoxIO.SB_OUT)
+                sb_bottom = SwitchBoxNode(x, y + 1, WIDTH, track,
+                                          SwitchBoxSide.Top,
+                                          SwitchBoxIO.SB_IN)
+                g.add_edge(sb_top, sb_bottom)
+
+                sb_bottom.io = SwitchBoxIO.SB_OUT
+                sb_top.io = SwitchBoxIO.SB_IN
+                g.add_edge(sb_bottom, sb_top)
+
+    for y in range(SIZE):
+        for x in range(SIZE - 1):
+            for track in range(NUM_TRACK):
+                sb_left = SwitchBoxNode(x, y, WIDTH, track,
+                                        SwitchBoxSide.Right,
+                                        SwitchBoxIO.SB_OUT)
+                sb_right = SwitchBoxNode(x + 1, y, WIDTH, track,
+                                         SwitchBoxSide.Left,
+                                         SwitchBoxIO.SB_IN)
+                g.add_edge(sb_left, sb_right)
+
+                sb_right.io = SwitchBoxIO.SB_OUT
+                sb_left.io = SwitchBoxIO.SB_IN
+                g.add_edge(sb_right, sb_left)
+    return g
+
+
+def create_router(g, seed):
+    rand = random.Random(seed)
+    r = GlobalRouter(40, g)
+    positions = [(x, y) for x in range(SIZE) for y in range(SIZE)]
+    rand.shuffle(positions)
+    blocks = []
+    for i, (x, y) in enumerate(positions):
+        blk_id = "p" + str(i)
+        r.add_placement(x, y, blk_id)
+        blocks.append(blk_id)
+    # each block has a single in and out port, so a block can only be used
+    # by one net
+    rand.shuffle(blocks)
+    for i in range(NUM_NETS):
+        src, sink1, sink2 = blocks[i * 3:i * 3 + 3]
+        r.add_net("e" + str(i), [(src, "out"), (sink1, "in"),
+                                 (sink2, "in")])
+    return r
+
+
+def route(router):
+    router.route()
+
+
+def main():
+    # two independent routers, first one after another then in two threads.
+    # route releases the GIL so the threaded run should take about half the
+    # time on a multi-core machine
+    graphs = [create_routing_graph() for _ in range(2)]
+    routers = [create_router(g, i) for i, g in enumerate(graphs)]
+    start = time.time()
+    for router in routers:
+        route(router)
+    serial_time = time.time() - start
+    serial_result = [router.realize() for router in routers]
+
+    routers = [create_router(g, i) for i, g in enumerate(graphs)]
+    threads = [threading.Thread(target=route, args=(router,))
+               for router in routers]
+    start = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    threaded_time = time.time() - start
+    threaded_result = [router.realize() for router in routers]
+
+    # routing is deterministic, so both runs have to agree
+    for result1, result2 in zip(serial_result, threaded_result):
+        for net_id in result1:
+            assert [[str(n) for n in seg] for seg in result1[net_id]] == \
+                [[str(n) for n in seg] for seg in result2[net_id]]
+
+    print("serial:  ", serial_time, "seconds")
+    print("threaded:", threaded_time, "seconds")
+    print("speedup: ", serial_time / threaded_time)
+
+
+if __name__ == "__main__":
+    main()
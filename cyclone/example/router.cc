@@ -1,9 +1,13 @@
 #include "../src/global.hh"
 #include "../src/graph.hh"
 #include "../src/io.hh"
+#include <chrono>
 #include <cstdio>
+#include <exception>
 #include <fstream>
 #include <iostream>
+#include <memory>
+#include <thread>
 
 using namespace std;
 
@@ -16,25 +20,56 @@ inline bool exists(const std::string &filename) {
 
 void print_help(const string &program_name) {
     cerr << "Usage: " << endl;
-    cerr << "    " << program_name << " [--pd] <packed_file>"
+    cerr << "    " << program_name << " [--pd] [--parallel] [--lookahead]"
+         << " [--threads <num_threads>] [--incremental] [--timing]"
+         << " <packed_file>"
          << " <placement_file> <bit_width> <routing_graph_file> ... "
             "<routing_result.route>"
          << endl;
+    cerr << "    --parallel routes each bit width graph on its own thread"
+         << endl;
+    cerr << "    --lookahead uses the A* lookahead cached next to each routing"
+            " graph, building it if needed" << endl;
+    cerr << "    --threads routes the nets of each bit width graph on several"
+            " threads" << endl;
+    cerr << "    --incremental only rips up the nets on overused nodes after"
+            " the first iteration" << endl;
+    cerr << "    --timing routes critical pin pairs for delay, using the node"
+            " delays of the routing graphs" << endl;
 }
 
-bool process_args(int argc, char *argv[], ::vector<::string> &args) {
-    bool pd_aware = false;
+struct RouterOptions {
+    bool power_domain = false;
+    bool parallel = false;
+    bool lookahead = false;
+    uint32_t num_threads = 1;
+    bool incremental = false;
+    bool timing_driven = false;
+};
+
+RouterOptions process_args(int argc, char *argv[], ::vector<::string> &args) {
+    RouterOptions options;
     args.reserve(argc - 1);
     for (int i = 0; i < argc; i++) {
         ::string value = argv[i];
-        if (value != "--pd") {
-            args.emplace_back(value);
+        if (value == "--pd") {
+            options.power_domain = true;
+        } else if (value == "--parallel") {
+            options.parallel = true;
+        } else if (value == "--lookahead") {
+            options.lookahead = true;
+        } else if (value == "--threads" && i + 1 < argc) {
+            options.num_threads = static_cast<uint32_t>(stoi(argv[++i]));
+        } else if (value == "--incremental") {
+            options.incremental = true;
+        } else if (value == "--timing") {
+            options.timing_driven = true;
         } else {
-            pd_aware = true;
+            args.emplace_back(value);
         }
     }
 
-    return pd_aware;
+    return options;
 }
 
 void
@@ -53,20 +88,76 @@ adjust_node_cost_power_domain(RoutingGraph *graph,
             for (uint32_t i = 0; i < 4; i++) {
                 auto sbs = switchbox.get_sbs_by_side(SwitchBoxSide(i));
                 for (auto sb: sbs) {
-                    sb->delay = power_domain_cost;
+                    sb->set_delay(power_domain_cost);
                 }
             }
         }
     }
 }
 
+struct RoutingJob {
+    uint32_t bit_width;
+    ::string graph_filename;
+    std::unique_ptr<GlobalRouter> router;
+    double setup_time = 0;
+    double route_time = 0;
+    std::exception_ptr error;
+};
+
+double elapsed(const std::chrono::steady_clock::time_point &start) {
+    auto const end = std::chrono::steady_clock::now();
+    return std::chrono::duration<double>(end - start).count();
+}
+
+void route_job(RoutingJob &job,
+               const ::map<::string,
+                           ::vector<::pair<::string, ::string>>> &netlist,
+               const ::map<::string, uint32_t> &track_mode,
+               const ::map<::string, ::pair<uint32_t, uint32_t>> &placement,
+               const RouterOptions &options) {
+    try {
+        auto start = std::chrono::steady_clock::now();
+        auto graph = load_routing_graph(job.graph_filename);
+
+        // adjust the node cost
+        if (options.power_domain) {
+            adjust_node_cost_power_domain(&graph, placement);
+        }
+
+        // set up the router
+        job.router = std::make_unique<GlobalRouter>(100, graph);
+        auto &r = *job.router;
+        for (auto const &it : placement) {
+            auto[x, y] = it.second;
+            r.add_placement(x, y, it.first);
+        }
+
+        for (const auto &iter : netlist) {
+            if (track_mode.at(iter.first) == job.bit_width)
+                r.add_net(iter.first, iter.second);
+        }
+        if (options.lookahead)
+            r.set_lookahead(job.graph_filename + ".lookahead");
+        r.set_num_threads(options.num_threads);
+        r.set_incremental(options.incremental);
+        r.set_timing_driven(options.timing_driven);
+        job.setup_time = elapsed(start);
+
+        start = std::chrono::steady_clock::now();
+        r.route();
+        job.route_time = elapsed(start);
+    } catch (...) {
+        job.error = std::current_exception();
+    }
+}
+
 int main(int argc, char *argv[]) {
     if (argc < 6) {
         print_help(argv[0]);
         return EXIT_FAILURE;
     }
     ::vector<::string> args;
-    bool power_domain = process_args(argc, argv, args);
+    auto options = process_args(argc, argv, args);
 
     string packed_filename = args[1];
     string placement_filename = args[2];
@@ -85,35 +176,58 @@ int main(int argc, char *argv[]) {
         }
     }
 
+    ::vector<RoutingJob> jobs;
     for (int arg_index = 3; arg_index < argc - 1; arg_index += 2) {
-        auto bit_width = static_cast<uint32_t>(stoi(args[arg_index]));
-        string graph_filename = args[arg_index + 1];
-        cout << "using bit_width " << bit_width << endl;
-        auto graph = load_routing_graph(graph_filename);
-
-        // adjust the node cost
-        if (power_domain) {
-            cout << "Adjusting power domain cost for bit_width " << bit_width << endl;
-            adjust_node_cost_power_domain(&graph, placement);
+        RoutingJob job;
+        job.bit_width = static_cast<uint32_t>(stoi(args[arg_index]));
+        job.graph_filename = args[arg_index + 1];
+        cout << "using bit_width " << job.bit_width << endl;
+        if (options.power_domain) {
+            cout << "Adjusting power domain cost for bit_width "
+                 << job.bit_width << endl;
         }
+        jobs.emplace_back(std::move(job));
+    }
 
-        // set up the router
-        GlobalRouter r(100, graph);
-        for (auto const &it : placement) {
-            auto[x, y] = it.second;
-            r.add_placement(x, y, it.first);
+    auto start = std::chrono::steady_clock::now();
+    if (options.parallel) {
+        // the graphs and nets of different bit widths are independent
+        ::vector<std::thread> threads;
+        threads.reserve(jobs.size());
+        for (auto &job : jobs) {
+            threads.emplace_back(route_job, std::ref(job), std::cref(netlist),
+                                 std::cref(track_mode), std::cref(placement),
+                                 std::cref(options));
         }
-
-        for (const auto &iter : netlist) {
-            // Note
-            // we only route 1bit at this time
-            if (track_mode.at(iter.first) == bit_width)
-                r.add_net(iter.first, iter.second);
+        for (auto &t : threads)
+            t.join();
+    } else {
+        for (auto &job : jobs) {
+            route_job(job, netlist, track_mode, placement, options);
+            if (job.error)
+                break;
         }
+    }
+    auto total_time = elapsed(start);
+
+    // results are written in the order of the arguments regardless of
+    // which graph finishes first
+    for (auto &job : jobs) {
+        if (job.error)
+            std::rethrow_exception(job.error);
+        if (job.router)
+            dump_routing_result(*job.router, output_file);
+    }
 
-        r.route();
-
-        dump_routing_result(r, output_file);
+    printf("%10s%8s%12s%12s%14s%12s\n", "bit width", "nets", "setup (s)",
+           "route (s)", "expansions", "delay");
+    for (auto const &job : jobs) {
+        auto const &stats = job.router->get_iteration_stats();
+        double delay = stats.empty() ? 0 : stats.back().critical_path_delay;
+        printf("%10u%8lu%12.2f%12.2f%14lu%12.0f\n", job.bit_width,
+               job.router->get_netlist().size(), job.setup_time,
+               job.route_time, job.router->get_num_expansions(), delay);
     }
+    printf("Routing takes %.2f seconds\n", total_time);
     return EXIT_SUCCESS;
 }
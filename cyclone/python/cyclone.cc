@@ -1,4 +1,5 @@
 #include <pybind11/pybind11.h>
+#include <pybind11/numpy.h>
 #include <pybind11/stl.h>
 #include <sstream>
 #include "../src/graph.hh"
@@ -14,6 +15,24 @@ using std::vector;
 const int Switch::SIDES;
 const int Switch::IOS;
 
+using NodeArray = py::array_t<uint32_t,
+                              py::array::c_style | py::array::forcecast>;
+
+void add_edges(RoutingGraph &g, const NodeArray &src, const NodeArray &dst,
+               const ::vector<std::string> &names) {
+    // nodes are encoded as rows of RoutingGraph::NODE_FIELDS integers, so
+    // that the graph can be constructed without creating a python node per
+    // edge
+    const ssize_t fields = RoutingGraph::NODE_FIELDS;
+    if (src.ndim() != 2 || src.shape(1) != fields || dst.ndim() != 2 ||
+        dst.shape(1) != fields)
+        throw std::runtime_error("nodes have to be encoded as (n, " +
+                                 to_string(fields) + ") arrays");
+    if (src.shape(0) != dst.shape(0))
+        throw std::runtime_error("src and dst have different sizes");
+    g.add_edges(src.data(), dst.data(), src.shape(0), names);
+}
+
 // just to be lazy with meta programming
 template<class T>
 void init_node_class(py::class_<T, std::shared_ptr<T>> &class_) {
@@ -23,7 +42,9 @@ void init_node_class(py::class_<T, std::shared_ptr<T>> &class_) {
         .def_readwrite("x", &T::x)
         .def_readwrite("y", &T::y)
         .def_readwrite("width", &T::width)
-        .def_readwrite("delay", &T::delay)
+        .def_property("delay", [](const T &node) { return node.delay; },
+                      &T::set_delay)
+        .def("set_delay", &T::set_delay)
         .def_readwrite("track", &T::track)
         .def("size", &T::size)
         .def("add_edge",
@@ -43,14 +64,21 @@ void init_router_class(py::class_<T> &class_) {
         .def("add_net", &T::add_net)
         .def("add_placement", &T::add_placement)
         .def("overflow", &T::overflow)
-        .def("route", &T::route)
+        // release the GIL so that routers can run concurrently in Python
+        // threads
+        .def("route", &T::route, py::call_guard<py::gil_scoped_release>())
         .def("realize", &T::realize)
         // getter & setter
         .def("get_init_pn", &T::get_init_pn)
         .def("set_init_pn", &T::set_init_pn)
         .def("get_pn_factor", &T::get_pn_factor)
         .def("set_pn_factor", &T::set_pn_factor)
-        .def("get_netlist", &T::get_netlist);
+        .def("get_netlist", &T::get_netlist)
+        .def("set_lookahead", &T::set_lookahead, py::arg("filename") = "",
+             py::call_guard<py::gil_scoped_release>())
+        .def("clear_lookahead", &T::clear_lookahead)
+        .def("has_lookahead", &T::has_lookahead)
+        .def("get_num_expansions", &T::get_num_expansions);
 }
 
 void init_netlist(py::module &m) {
@@ -209,7 +237,11 @@ void init_graph(py::module &m) {
              py::overload_cast<const Node &,
                                const Node &,
                                uint32_t>(&RoutingGraph::add_edge))
-
+        .def("add_edges", &add_edges, py::arg("src"), py::arg("dst"),
+             py::arg("names") = ::vector<std::string>())
+        .def("set_delay", &RoutingGraph::set_delay)
+        .def("set_delays", &RoutingGraph::set_delays)
+        .def("set_sb_delays", &RoutingGraph::set_sb_delays)
         .def("get_sb", &RoutingGraph::get_sb)
         .def("get_port", &RoutingGraph::get_port)
         .def("has_tile",
@@ -251,10 +283,32 @@ void init_router(py::module &m) {
     router.def(py::init<RoutingGraph>());
     init_router_class<Router>(router);
 
+    py::class_<IterationStats>(m, "IterationStats")
+        .def_readonly("iteration", &IterationStats::iteration)
+        .def_readonly("overused_nodes", &IterationStats::overused_nodes)
+        .def_readonly("max_occupancy", &IterationStats::max_occupancy)
+        .def_readonly("wirelength", &IterationStats::wirelength)
+        .def_readonly("nets_rerouted", &IterationStats::nets_rerouted)
+        .def_readonly("num_expansions", &IterationStats::num_expansions)
+        .def_readonly("duration", &IterationStats::duration)
+        .def_readonly("critical_path_delay",
+                      &IterationStats::critical_path_delay);
+
     py::class_<GlobalRouter> gr(m, "GlobalRouter", router);
     gr.def(py::init<uint32_t, RoutingGraph>())
       .def_readwrite("route_strategy_ratio",
-                     &GlobalRouter::route_strategy_ratio);
+                     &GlobalRouter::route_strategy_ratio)
+      .def("get_num_threads", &GlobalRouter::get_num_threads)
+      .def("set_num_threads", &GlobalRouter::set_num_threads)
+      .def("get_region_margin", &GlobalRouter::get_region_margin)
+      .def("set_region_margin", &GlobalRouter::set_region_margin)
+      .def("get_incremental", &GlobalRouter::get_incremental)
+      .def("set_incremental", &GlobalRouter::set_incremental)
+      .def("get_stall_iterations", &GlobalRouter::get_stall_iterations)
+      .def("set_stall_iterations", &GlobalRouter::set_stall_iterations)
+      .def("get_timing_driven", &GlobalRouter::get_timing_driven)
+      .def("set_timing_driven", &GlobalRouter::set_timing_driven)
+      .def("get_iteration_stats", &GlobalRouter::get_iteration_stats);
     init_router_class<GlobalRouter>(gr);
 }
 
@@ -296,6 +350,9 @@ void init_io(py::module &m) {
     auto io_m = m.def_submodule("io");
     io_m.def("dump_routing_graph", &dump_routing_graph)
         .def("load_routing_graph", &load_routing_graph)
+        .def("dump_routing_graph_binary", &dump_routing_graph_binary)
+        .def("load_routing_graph_binary", &load_routing_graph_binary)
+        .def("is_routing_graph_binary", &is_routing_graph_binary)
         .def("load_placement", &load_placement)
         .def("load_netlist", &load_netlist)
         .def("dump_routing_result", &dump_routing_result)
@@ -1,3 +1,4 @@
+#include <algorithm>
 #include <limits>
 #include <cmath>
 #include <iostream>
@@ -5,6 +6,9 @@
 #include <iomanip>
 #include <ctime>
 #include <queue>
+#include <thread>
+#include <unordered_map>
+#include <unordered_set>
 #include "global.hh"
 #include "util.hh"
 
@@ -41,9 +45,31 @@ void GlobalRouter::route() {
 
     group_reg_nets();
     auto reordered_netlist = reorder_reg_nets();
+    init_routes();
+
+    average_edge_cost_ = 1;
+    if (!edge_costs_.empty()) {
+        double total_cost = 0;
+        for (auto const cost : edge_costs_)
+            total_cost += cost;
+        average_edge_cost_ = std::max(total_cost / edge_costs_.size(), 1.0);
+    }
+
+    ::vector<RoutingUnit> units;
+    if (num_threads_ > 1)
+        units = create_routing_units(reordered_netlist);
+
+    // in incremental mode only the nets on overused nodes are ripped up
+    // after the first iteration. if the number of overused nodes stops going
+    // down every net is ripped up again
+    bool rip_up_all = true;
+    uint64_t min_overused = std::numeric_limits<uint64_t>::max();
+    uint32_t stalled = 0;
+    iteration_stats_.clear();
 
     for (uint32_t it = 0; it < num_iteration_; it++) {
         auto time_start = std::chrono::system_clock::now();
+        auto const num_expansions = get_num_expansions();
 
         std::cout << "Routing iteration: " << ::setw(3) << it;
 
@@ -53,12 +79,19 @@ void GlobalRouter::route() {
 
         // clear the routing resources, i.e. rip up all the nets
         //clear_connections();
+        ::vector<char> rip_up(netlist_.size(), true);
+        if (!rip_up_all)
+            rip_up = get_congested_nets();
 
-        for (const auto &net_id : reordered_netlist) {
-            // TODO:
-            //     rip up linked reg-net as well
-            rip_up_net(net_id);
-            route_net(net_id, it);
+        if (num_threads_ > 1) {
+            route_units(units, rip_up, it);
+        } else {
+            for (const auto &net_id : reordered_netlist) {
+                if (!rip_up[net_id])
+                    continue;
+                rip_up_net(net_id);
+                route_net(net_id, it);
+            }
         }
 
         // assign history table
@@ -69,17 +102,79 @@ void GlobalRouter::route() {
         auto duration =
                 std::chrono::duration_cast<
                         std::chrono::milliseconds>(time_end - time_start);
-        std::cout << " duration: " << duration.count() << " ms" << std::endl;
-
-        if (!overflow()) {
+        auto stats = compute_iteration_stats();
+        stats.critical_path_delay = analyze_timing();
+        stats.iteration = it;
+        stats.nets_rerouted = std::count(rip_up.begin(), rip_up.end(), true);
+        stats.num_expansions = get_num_expansions() - num_expansions;
+        stats.duration = std::chrono::duration<double>(time_end -
+                                                       time_start).count();
+        iteration_stats_.emplace_back(stats);
+        std::cout << " nets: " << ::setw(5) << stats.nets_rerouted << "/"
+                  << netlist_.size() << " overused: " << ::setw(5)
+                  << stats.overused_nodes << " duration: " << duration.count()
+                  << " ms" << std::endl;
+
+        // the flag is set by any overlap while the nets are routed, even if
+        // it is resolved later in the iteration. the occupancies at the end
+        // of the iteration are what counts
+        overflowed_ = stats.overused_nodes > 0;
+        if (stats.overused_nodes == 0) {
             return;
         }
 
+        if (incremental_) {
+            if (stats.overused_nodes < min_overused) {
+                min_overused = stats.overused_nodes;
+                stalled = 0;
+            } else {
+                stalled++;
+            }
+            rip_up_all = stalled >= stall_iterations_;
+            if (rip_up_all)
+                stalled = 0;
+        }
     }
     if (overflow())
         throw ::runtime_error("unable to route. sorry!");
 }
 
+IterationStats GlobalRouter::compute_iteration_stats() const {
+    IterationStats stats;
+    for (uint32_t node = 0; node < node_connections_.size(); node++) {
+        auto const occupancy = node_connections_[node].size();
+        if (occupancy > 1)
+            stats.overused_nodes++;
+        stats.max_occupancy = std::max<uint64_t>(stats.max_occupancy,
+                                                 occupancy);
+        stats.wirelength += node_net_ids_[node].size();
+    }
+    return stats;
+}
+
+std::vector<char> GlobalRouter::get_congested_nets() const {
+    ::vector<char> result(netlist_.size(), false);
+    for (uint32_t node = 0; node < node_connections_.size(); node++) {
+        if (node_connections_[node].size() <= 1)
+            continue;
+        for (auto const net_id : node_net_ids_[node])
+            result[net_id] = true;
+    }
+    // linked reg nets are ripped up together since routing one changes the
+    // routes of the others
+    for (auto const &iter : reg_net_order_) {
+        auto const &net_ids = iter.second;
+        bool congested = false;
+        for (auto const net_id : net_ids)
+            congested = congested || result[net_id];
+        if (congested) {
+            for (auto const net_id : net_ids)
+                result[net_id] = true;
+        }
+    }
+    return result;
+}
+
 void GlobalRouter::compute_slack_ratio(uint32_t current_iter) {
     // Note
     // this is slightly different from the PathFinder
@@ -98,6 +193,12 @@ void GlobalRouter::compute_slack_ratio(uint32_t current_iter) {
                 slack_ratio_[{net.id, seg_index}] = 1;
             }
         }
+    } else if (timing_driven_) {
+        // computed by the timing analysis at the end of the last iteration.
+        // sharpened so that only the nearly critical pin pairs give up on
+        // congestion for delay
+        for (auto const &[pin, criticality] : criticality_)
+            slack_ratio_[pin] = pow(criticality, criticality_exponent_);
     } else {
         // Note:
         // Keyi:
@@ -122,7 +223,7 @@ void GlobalRouter::compute_slack_ratio(uint32_t current_iter) {
                 auto const &route = segments.at(net[seg_index].id);
                 double delay = 0;
                 for (const auto &node : route) {
-                    delay += node->delay;
+                    delay += nodes_[node]->delay;
                 }
                 slack_ratio_[{net.id, seg_index}] = delay;
                 if (delay > max_delay)
@@ -145,9 +246,181 @@ void GlobalRouter::compute_slack_ratio(uint32_t current_iter) {
     }
 }
 
+std::vector<std::vector<double>> GlobalRouter::compute_sink_delays() const {
+    // delay from the source of a net to each of its sinks, indexed by pin.
+    // a segment starts either at the net source or at a node of another
+    // segment of the same net, so the segments are resolved in rounds
+    ::vector<::vector<double>> result(netlist_.size());
+    for (auto const &net : netlist_) {
+        auto &sink_delays = result[net.id];
+        sink_delays.assign(net.size(), 0);
+        auto const &segments = current_routes.at(net.id);
+        std::unordered_set<uint32_t> reached;
+        for (auto const &iter : segments) {
+            auto const &segment = iter.second;
+            reached.insert(segment.begin() + std::min<uint64_t>(
+                    segment.size(), 1), segment.end());
+        }
+        std::unordered_map<uint32_t, double> node_delays;
+        ::vector<uint32_t> pending;
+        for (uint32_t seg_index = 1; seg_index < net.size(); seg_index++) {
+            auto const iter = segments.find(net[seg_index].id);
+            if (iter != segments.end() && !iter->second.empty())
+                pending.emplace_back(seg_index);
+        }
+        bool progress = true;
+        while (!pending.empty()) {
+            ::vector<uint32_t> next;
+            for (auto const seg_index : pending) {
+                auto const &segment = segments.at(net[seg_index].id);
+                auto const start = node_delays.find(segment.front());
+                double delay = 0;
+                if (start != node_delays.end()) {
+                    delay = start->second;
+                } else if (progress && reached.count(segment.front())) {
+                    // starts on a segment that hasn't been resolved yet
+                    next.emplace_back(seg_index);
+                    continue;
+                }
+                node_delays.insert({segment.front(), delay});
+                for (uint64_t i = 1; i < segment.size(); i++) {
+                    delay += nodes_[segment[i]]->delay;
+                    node_delays.insert({segment[i], delay});
+                }
+                sink_delays[seg_index] = delay;
+            }
+            // if nothing could be resolved the rest starts from scratch
+            progress = next.size() < pending.size();
+            pending.swap(next);
+        }
+    }
+    return result;
+}
+
+double GlobalRouter::analyze_timing() {
+    // static timing analysis of the current routes. pe blocks are
+    // combinational, so paths go through them, while every other block
+    // starts and ends paths. the delay of a pin pair is the delay of its route
+    // nodes after the source, and every block adds the delay of its output
+    criticality_.clear();
+    auto const num_nets = netlist_.size();
+    auto const sink_delays = compute_sink_delays();
+    auto is_comb = [](const std::string &blk_id) {
+        return !blk_id.empty() && blk_id[0] == 'p';
+    };
+    auto src_delay = [](const Net &net) -> double {
+        return net[0].node ? net[0].node->delay : 0;
+    };
+
+    // nets driven by each combinational block and the pins feeding it
+    std::unordered_map<std::string, ::vector<int>> driven_nets;
+    std::unordered_map<std::string, ::vector<pair<int, uint32_t>>> input_pins;
+    for (auto const &net : netlist_) {
+        if (is_comb(net[0].name))
+            driven_nets[net[0].name].emplace_back(net.id);
+        for (uint32_t seg_index = 1; seg_index < net.size(); seg_index++) {
+            if (is_comb(net[seg_index].name))
+                input_pins[net[seg_index].name].emplace_back(net.id,
+                                                             seg_index);
+        }
+    }
+
+    // arrival times at the net sources in topological order. nets on a
+    // combinational loop are taken in id order
+    ::vector<double> arrival(num_nets, 0);
+    ::vector<uint32_t> num_inputs(num_nets, 0);
+    ::vector<char> done(num_nets, false);
+    ::vector<int> order;
+    order.reserve(num_nets);
+    std::queue<int> ready;
+    for (auto const &net : netlist_) {
+        auto const iter = input_pins.find(net[0].name);
+        if (is_comb(net[0].name) && iter != input_pins.end())
+            num_inputs[net.id] = static_cast<uint32_t>(iter->second.size());
+        if (num_inputs[net.id] == 0)
+            ready.push(net.id);
+    }
+    int next_net = 0;
+    while (order.size() < num_nets) {
+        if (ready.empty()) {
+            while (done[next_net])
+                next_net++;
+            ready.push(next_net);
+        }
+        auto const net_id = ready.front();
+        ready.pop();
+        if (done[net_id])
+            continue;
+        done[net_id] = true;
+        order.emplace_back(net_id);
+        auto const &net = netlist_[net_id];
+        double input_arrival = 0;
+        if (is_comb(net[0].name) && input_pins.count(net[0].name)) {
+            for (auto const &[id, seg_index] : input_pins.at(net[0].name))
+                input_arrival = std::max(input_arrival,
+                                         arrival[id] +
+                                         sink_delays[id][seg_index]);
+        }
+        arrival[net_id] = input_arrival + src_delay(net);
+        for (uint32_t seg_index = 1; seg_index < net.size(); seg_index++) {
+            auto const iter = driven_nets.find(net[seg_index].name);
+            if (iter == driven_nets.end())
+                continue;
+            for (auto const id : iter->second) {
+                if (num_inputs[id] > 0 && --num_inputs[id] == 0)
+                    ready.push(id);
+            }
+        }
+    }
+
+    double critical_path_delay = 0;
+    for (auto const &net : netlist_) {
+        for (uint32_t seg_index = 1; seg_index < net.size(); seg_index++)
+            critical_path_delay = std::max(critical_path_delay,
+                                           arrival[net.id] +
+                                           sink_delays[net.id][seg_index]);
+    }
+    if (critical_path_delay == 0)
+        return 0;
+
+    // required times, in reverse topological order. sequential sinks and
+    // combinational blocks without fanout are required at the end of the
+    // critical path
+    std::unordered_map<std::string, double> block_required;
+    auto get_required = [&](const std::string &blk_id) {
+        if (!is_comb(blk_id))
+            return critical_path_delay;
+        auto const iter = block_required.find(blk_id);
+        return iter == block_required.end() ? critical_path_delay
+                                            : iter->second;
+    };
+    for (auto iter = order.rbegin(); iter != order.rend(); iter++) {
+        auto const &net = netlist_[*iter];
+        double required = critical_path_delay;
+        for (uint32_t seg_index = 1; seg_index < net.size(); seg_index++) {
+            auto const sink_required = get_required(net[seg_index].name);
+            auto const sink_delay = sink_delays[net.id][seg_index];
+            required = std::min(required, sink_required - sink_delay);
+            auto const slack = sink_required - arrival[net.id] - sink_delay;
+            auto const criticality = 1 - slack / critical_path_delay;
+            criticality_[{net.id, seg_index}] =
+                    std::max(0.0, std::min(1.0, criticality));
+        }
+        if (is_comb(net[0].name)) {
+            auto const src_required = required - src_delay(net);
+            if (block_required.find(net[0].name) == block_required.end())
+                block_required[net[0].name] = src_required;
+            else
+                block_required[net[0].name] =
+                        std::min(block_required[net[0].name], src_required);
+        }
+    }
+    return critical_path_delay;
+}
+
 void
 GlobalRouter::route_net(int net_id, uint32_t it) {
-    ::vector<::shared_ptr<Node>> current_path;
+    ::vector<uint32_t> current_path;
     auto pin_indices = reorder_pins(netlist_[net_id]);
     for (uint32_t pin_index = 0; pin_index < pin_indices.size(); pin_index++) {
         // we may update the src while routing, i.e. for reg nets, so we pull
@@ -159,25 +432,23 @@ GlobalRouter::route_net(int net_id, uint32_t it) {
 
         auto seg_index = pin_indices[pin_index];
         auto const &sink_node = net[seg_index];
-        auto slack_entry = make_pair(src, sink_node.name);
         auto sink_coord = std::make_pair(sink_node.x, sink_node.y);
         double slack = slack_ratio_.at({net.id, seg_index});
         RoutingStrategy strategy = slack > route_strategy_ratio ?
                                    RoutingStrategy::DelayDriven :
                                    RoutingStrategy::CongestionDriven;
-        ::shared_ptr<Node> src_node = src;
+        uint32_t src_node = get_node_id(src);
         // choose src_node
         if (strategy == RoutingStrategy::CongestionDriven
             && !current_path.empty()) {
             // find the closest point
-            uint32_t min_dist = manhattan_distance(src_node, sink_coord);
+            uint32_t min_dist = manhattan_distance(src, sink_coord);
             for (uint32_t p = 1; p < current_path.size(); p++) {
-                const auto &node = current_path[p];
-                // const auto &pre_node = current_path[p - 1];
-                const auto &conn = node_connections_.at(node);
+                const auto node = current_path[p];
+                const auto &conn = node_connections_[node];
                 // break them into several parts so that it's easier to
                 // read and modify
-                if (node->type != NodeType::SwitchBox) {
+                if (nodes_[node]->type != NodeType::SwitchBox) {
                     // it has to be a switch box
                     continue;
                 }
@@ -188,15 +459,17 @@ GlobalRouter::route_net(int net_id, uint32_t it) {
 
                 // it has at least one free switch box connections
                 bool empty = false;
-                for (auto const &n : *node) {
-                    if (node_connections_.at(n.lock()).empty()) {
+                for (uint32_t e = edge_offsets_[node];
+                     e < edge_offsets_[node + 1]; e++) {
+                    auto const n = edge_targets_[e];
+                    if (node_connections_[n].empty()) {
                         empty = true;
                         break;
                     }
-                    if (node_connections_.at(n.lock()).size() == 1
-                        && *node_connections_.at(n.lock()).begin() == node
-                        && (node_net_ids_.at(n.lock()).empty()
-                            || node_owned_net(net.id, n.lock()))) {
+                    if (node_connections_[n].size() == 1
+                        && node_connections_[n].front() == node
+                        && (node_net_ids_[n].empty()
+                            || node_owned_net(net.id, n))) {
                         empty = true;
                         break;
                     }
@@ -205,11 +478,11 @@ GlobalRouter::route_net(int net_id, uint32_t it) {
                     continue;
 
                 // has to be an in switch box so that we can switch tracks
-                auto sb = std::dynamic_pointer_cast<SwitchBoxNode>(node);
+                auto sb = std::static_pointer_cast<SwitchBoxNode>(nodes_[node]);
                 if (sb->io == SwitchBoxIO::SB_OUT)
                     continue;
 
-                if (manhattan_distance(node, sink_coord) < min_dist) {
+                if (manhattan_distance(nodes_[node], sink_coord) < min_dist) {
                     src_node = node;
                 }
             }
@@ -231,17 +504,14 @@ GlobalRouter::route_net(int net_id, uint32_t it) {
              *        rich register resources.
             */
             auto end_f = get_free_switch(end);
-            auto h_f = manhattan_distance(end);
+            auto h_f = get_estimate(end);
             auto segment = route_a_star(src_node, end_f, cost_f, h_f);
 
-            if (segment.back()->type != NodeType::SwitchBox) {
+            auto const &switch_node = nodes_[segment.back()];
+            if (switch_node->type != NodeType::SwitchBox) {
                 throw ::runtime_error("cannot connect to the reg tile");
             }
 
-            auto switch_node = segment.back();
-            // make sure it's an reg node
-            if (switch_node == nullptr)
-                throw ::runtime_error("unable to route for net id " + net.name);
             if (switch_node->x != sink_node.x || switch_node->y != sink_node.y)
                 throw ::runtime_error("error in assigning switch box for reg " +
                                       sink_node.name);
@@ -263,8 +533,9 @@ GlobalRouter::route_net(int net_id, uint32_t it) {
             if (sink_node.node == nullptr)
                 throw ::runtime_error("unable to find node for block"
                                       " " + sink_node.name);
-            auto segment = route_a_star(src_node, sink_node.node, cost_f);
-            if (segment.back() != sink_node.node) {
+            auto const sink_id = get_node_id(sink_node.node);
+            auto segment = route_a_star(src_node, sink_id, cost_f);
+            if (segment.back() != sink_id) {
                 throw ::runtime_error("unable to route to port " +
                                       sink_node.node->name);
             }
@@ -289,12 +560,12 @@ GlobalRouter::route_net(int net_id, uint32_t it) {
     }
 }
 
-::function<double(const ::shared_ptr<Node> &, const ::shared_ptr<Node> &)>
+Router::CostFunction
 GlobalRouter::create_cost_function(double an,
                                    uint32_t it,
                                    int net_id) {
-    return [&, an, it, net_id](const ::shared_ptr<Node> &node1,
-               const ::shared_ptr<Node> &node2) -> double {
+    return [&, an, it, net_id](uint32_t node1, uint32_t node2,
+                               uint32_t edge_cost) -> double {
         // based of the PathFinder paper
         auto pn = get_presence_cost(node2, node1);
         /* Note:
@@ -306,9 +577,17 @@ GlobalRouter::create_cost_function(double an,
         }
         auto pn_factor = init_pn_ * pow(pn_factor_, it);
         pn *= pn_factor;
-        auto dn = node1->get_edge_cost(node2);
+        auto dn = edge_cost;
         auto hn = get_history_cost(node2) * hn_factor_;
 
+        if (timing_driven_) {
+            // the delay is relative to an average edge and on the scale of
+            // the initial congestion cost, which grows over the iterations.
+            // congestion has a base cost of one so that the history cost
+            // isn't drowned out by large node delays
+            return an * dn / average_edge_cost_ * init_pn_ +
+                   (1 - an) * (1 + hn) * pn;
+        }
         auto result = an * dn + (1 - an) * (dn + hn) * pn;
         return result;
     };
@@ -317,28 +596,228 @@ GlobalRouter::create_cost_function(double an,
 GlobalRouter::GlobalRouter(uint32_t num_iteration, const RoutingGraph &g) :
     Router(g), num_iteration_(num_iteration), slack_ratio_()  {}
 
-std::function<bool(const std::shared_ptr<Node> &)>
+void GlobalRouter::set_num_threads(uint32_t num_threads) {
+    num_threads_ = std::max(num_threads, 1u);
+    set_num_workers(num_threads_);
+}
+
+void GlobalRouter::init_routes() {
+    // create the entries of every net up front so that routing a net doesn't
+    // change the structure of the maps shared by the threads
+    for (auto const &net : netlist_) {
+        current_routes[net.id];
+        for (uint32_t seg_index = 1; seg_index < net.size(); seg_index++) {
+            auto const &pin = net[seg_index];
+            if (pin.name[0] != 'r')
+                continue;
+            auto const iter = reg_net_src_.find(pin.name);
+            if (iter != reg_net_src_.end())
+                reg_net_table_.insert({iter->second, {net.id, pin.id}});
+        }
+    }
+}
+
+std::vector<GlobalRouter::RoutingUnit>
+GlobalRouter::create_routing_units(const ::vector<uint32_t> &reordered_netlist)
+const {
+    uint32_t width = 0;
+    uint32_t height = 0;
+    for (auto const &node : nodes_) {
+        width = std::max(width, node->x + 1);
+        height = std::max(height, node->y + 1);
+    }
+
+    ::map<int, int> reg_groups;
+    for (auto const &[src_id, net_ids] : reg_net_order_) {
+        for (auto const net_id : net_ids)
+            reg_groups.insert({net_id, src_id});
+    }
+
+    // reorder_reg_nets puts the linked reg nets next to each other
+    ::vector<RoutingUnit> units;
+    int current_group = -1;
+    for (auto const net_id : reordered_netlist) {
+        auto const iter = reg_groups.find(net_id);
+        auto const group = iter == reg_groups.end() ? -1 : iter->second;
+        if (units.empty() || group == -1 || group != current_group)
+            units.emplace_back();
+        current_group = group;
+        units.back().net_ids.emplace_back(net_id);
+    }
+
+    // the region is the bounding box of the pins plus some margin
+    for (auto &unit : units) {
+        auto &region = unit.region;
+        region.x_min = width;
+        region.y_min = height;
+        region.x_max = 0;
+        region.y_max = 0;
+        for (auto const net_id : unit.net_ids) {
+            auto const &net = netlist_[net_id];
+            for (uint32_t i = 0; i < net.size(); i++) {
+                auto const &pin = net[i];
+                region.x_min = std::min(region.x_min, pin.x);
+                region.y_min = std::min(region.y_min, pin.y);
+                region.x_max = std::max(region.x_max, pin.x);
+                region.y_max = std::max(region.y_max, pin.y);
+            }
+        }
+        region.x_min = region.x_min > region_margin_ ?
+                       region.x_min - region_margin_ : 0;
+        region.y_min = region.y_min > region_margin_ ?
+                       region.y_min - region_margin_ : 0;
+        region.x_max = std::min(region.x_max + region_margin_, width - 1);
+        region.y_max = std::min(region.y_max + region_margin_, height - 1);
+    }
+    return units;
+}
+
+std::vector<std::vector<uint32_t>>
+GlobalRouter::create_batches(const ::vector<RoutingUnit> &units,
+                             const ::vector<uint32_t> &unit_ids) const {
+    // routing a net also reads the nodes right next to its region, so two
+    // units conflict if their regions overlap after growing them by one
+    // tile. every unit goes into the batch after the last one it conflicts
+    // with, which routes conflicting units in the same order as the serial
+    // router does
+    uint32_t width = 0;
+    uint32_t height = 0;
+    for (auto const &unit : units) {
+        width = std::max(width, unit.region.x_max + 2);
+        height = std::max(height, unit.region.y_max + 2);
+    }
+    // number of batches covering each tile so far
+    ::vector<uint32_t> levels(static_cast<uint64_t>(width) * height, 0);
+    ::vector<::vector<uint32_t>> batches;
+    for (auto const i : unit_ids) {
+        auto const &region = units[i].region;
+        auto const x_min = region.x_min > 0 ? region.x_min - 1 : 0;
+        auto const y_min = region.y_min > 0 ? region.y_min - 1 : 0;
+        uint32_t level = 0;
+        for (auto x = x_min; x <= region.x_max + 1; x++) {
+            for (auto y = y_min; y <= region.y_max + 1; y++)
+                level = std::max(level, levels[x * height + y]);
+        }
+        for (auto x = x_min; x <= region.x_max + 1; x++) {
+            for (auto y = y_min; y <= region.y_max + 1; y++)
+                levels[x * height + y] = level + 1;
+        }
+        if (level == batches.size())
+            batches.emplace_back();
+        batches[level].emplace_back(i);
+    }
+    return batches;
+}
+
+void GlobalRouter::route_units(::vector<RoutingUnit> &units,
+                               const ::vector<char> &rip_up, uint32_t it) {
+    ::vector<uint32_t> unit_ids;
+    for (uint32_t i = 0; i < units.size(); i++) {
+        for (auto const net_id : units[i].net_ids) {
+            if (rip_up[net_id]) {
+                unit_ids.emplace_back(i);
+                break;
+            }
+        }
+    }
+    for (auto const &batch : create_batches(units, unit_ids)) {
+        auto const num_workers = static_cast<uint32_t>(
+                std::min<uint64_t>(num_threads_, batch.size()));
+        ::vector<char> routed(batch.size(), false);
+        ::vector<std::exception_ptr> errors(batch.size());
+        auto work = [&](uint32_t worker) {
+            set_worker(worker);
+            for (uint64_t i = worker; i < batch.size(); i += num_workers) {
+                try {
+                    routed[i] = route_unit(units[batch[i]], it);
+                } catch (...) {
+                    errors[i] = std::current_exception();
+                }
+            }
+            set_search_region(Region());
+            set_worker(0);
+        };
+        ::vector<std::thread> threads;
+        for (uint32_t worker = 1; worker < num_workers; worker++)
+            threads.emplace_back(work, worker);
+        work(0);
+        for (auto &t : threads)
+            t.join();
+
+        for (uint64_t i = 0; i < batch.size(); i++) {
+            if (errors[i])
+                std::rethrow_exception(errors[i]);
+        }
+        // units that can't be routed inside their region are routed again
+        // without one after the batch. the region grows to cover the new
+        // routes so that they can be ripped up in the next iteration
+        for (uint64_t i = 0; i < batch.size(); i++) {
+            if (routed[i])
+                continue;
+            auto &unit = units[batch[i]];
+            for (auto const net_id : unit.net_ids)
+                rip_up_net(net_id);
+            for (auto const net_id : unit.net_ids)
+                route_net(net_id, it);
+            grow_region(unit);
+        }
+    }
+}
+
+bool GlobalRouter::route_unit(const RoutingUnit &unit, uint32_t it) {
+    set_search_region(unit.region);
+    try {
+        for (auto const net_id : unit.net_ids) {
+            rip_up_net(net_id);
+            route_net(net_id, it);
+        }
+    } catch (const UnableRouteException &) {
+        return false;
+    }
+    return true;
+}
+
+void GlobalRouter::grow_region(RoutingUnit &unit) const {
+    auto &region = unit.region;
+    for (auto const net_id : unit.net_ids) {
+        for (auto const &iter : current_routes.at(net_id)) {
+            for (auto const node : iter.second) {
+                auto const &n = nodes_[node];
+                region.x_min = std::min(region.x_min, n->x);
+                region.y_min = std::min(region.y_min, n->y);
+                region.x_max = std::max(region.x_max, n->x);
+                region.y_max = std::max(region.y_max, n->y);
+            }
+        }
+    }
+}
+
+Router::EndFunction
 GlobalRouter::get_free_switch(const std::pair<uint32_t, uint32_t> &p) {
-    return [&, p](const std::shared_ptr<Node> &node) -> bool {
-        if (node == nullptr || node->type != NodeType::SwitchBox
-            || node->x != p.first || node->y != p.second) {
+    return [&, p](uint32_t node) -> bool {
+        auto const &n = nodes_[node];
+        if (n->type != NodeType::SwitchBox || n->x != p.first ||
+            n->y != p.second) {
             return false;
         }
         else {
             // see it's been used or not
-            if (!node_connections_.at(node).empty())
+            if (!node_connections_[node].empty())
                 return false;
 
             // two hope check to see if there is any register nodes
-            ::set<std::shared_ptr<Node>> first_hop;
-            for (auto const &n : *node) {
-                if (n.lock()->type == NodeType::Register)
+            ::set<uint32_t> first_hop;
+            for (uint32_t e = edge_offsets_[node]; e < edge_offsets_[node + 1];
+                 e++) {
+                auto const next = edge_targets_[e];
+                if (nodes_[next]->type == NodeType::Register)
                     return true;
-                first_hop.insert(n.lock());
+                first_hop.insert(next);
             }
-            for (auto const &n : first_hop) {
-                for (auto const &nn : *n) {
-                    if (nn.lock()->type == NodeType::Register)
+            for (auto const next : first_hop) {
+                for (uint32_t e = edge_offsets_[next];
+                     e < edge_offsets_[next + 1]; e++) {
+                    if (nodes_[edge_targets_[e]]->type == NodeType::Register)
                         return true;
                 }
             }
@@ -379,40 +858,37 @@ std::vector<uint32_t> GlobalRouter::reorder_pins(const Net &net) {
 void GlobalRouter::fix_register_net(int net_id, Pin &pin) {
     auto segment = current_routes[net_id][pin.id];
     auto src_node = segment[0];
-    if (src_node->type != NodeType::SwitchBox)
+    if (nodes_[src_node]->type != NodeType::SwitchBox)
         throw ::runtime_error("the beginning of a reg fix has to be a sb");
 
-    // found all nodes width that tile
-    ::set<::shared_ptr<Node>> tile_nodes;
-    for (auto const &node : segment) {
-        //if (node->x == pin.x && node->y == pin.y)
-            tile_nodes.insert(node);
-    }
-
     /* Note:
      * search to see if there any registers connected to them.
      * it is safe to assume that the registers are pipeline registers
      * that points to the same node
      */
-    ::shared_ptr<Node> reg_node = nullptr;
-    ::shared_ptr<Node> pre_node = nullptr;
-    for (const auto &node : segment) {
-        for (const auto &next : *node) {
-            if (next.lock()->type == NodeType::Register) {
-                if (!node_connections_.at(next.lock()).empty()) {
+    bool found = false;
+    uint32_t reg_node = 0;
+    uint32_t pre_node = 0;
+    for (const auto node : segment) {
+        for (uint32_t e = edge_offsets_[node]; e < edge_offsets_[node + 1];
+             e++) {
+            auto const next = edge_targets_[e];
+            if (nodes_[next]->type == NodeType::Register) {
+                if (!node_connections_[next].empty()) {
                     continue;
                 } else {
                     pre_node = node;
-                    reg_node = next.lock();
+                    reg_node = next;
+                    found = true;
                     break;
                 }
             }
         }
-        if (reg_node)
+        if (found)
             break;
     }
 
-    if (!reg_node) {
+    if (!found) {
         throw ::runtime_error("unable to find free register node in the give "
                               "tile specified by the placer");
     }
@@ -421,9 +897,10 @@ void GlobalRouter::fix_register_net(int net_id, Pin &pin) {
     // it has to be a pipeline register! so find where it connected to in the
     // path
     auto index = segment.size();
-    for (auto const &next_node : *reg_node) {
+    for (uint32_t e = edge_offsets_[reg_node]; e < edge_offsets_[reg_node + 1];
+         e++) {
         for (index = 0; index < segment.size(); index++) {
-            if (segment[index] == next_node.lock()) {
+            if (segment[index] == edge_targets_[e]) {
                 break;
             }
         }
@@ -437,13 +914,13 @@ void GlobalRouter::fix_register_net(int net_id, Pin &pin) {
         throw ::runtime_error("unable to find the connected register in given "
                               "path");
     // do a surgery to fix the path
-    ::vector<::shared_ptr<Node>> new_segment = {reg_node};
+    ::vector<uint32_t> new_segment = {reg_node};
     for (auto i = index; i < segment.size(); i++) {
         // append to the new segment
         new_segment.emplace_back(segment[i]);
     }
 
-    netlist_[net_id][0].node = reg_node;
+    netlist_[net_id][0].node = nodes_[reg_node];
     // update the current_routes
     current_routes[net_id][pin.id] = new_segment;
 
@@ -470,7 +947,7 @@ void GlobalRouter::fix_register_net(int net_id, Pin &pin) {
     // then assign the new pin node
     auto &reg_sink_pin = netlist_.at(static_cast<uint32_t>
                                      (key_entry.first))[key_entry.second];
-    reg_sink_pin.node = reg_node;
+    reg_sink_pin.node = nodes_[reg_node];
     if (reg_sink_pin.name[0] != 'r')
         throw ::runtime_error("assigning registers to a wrong pin");
-}
\ No newline at end of file
+}
@@ -3,6 +3,23 @@
 
 #include "route.hh"
 
+// convergence of a single routing iteration
+struct IterationStats {
+    uint32_t iteration = 0;
+    // nodes driven by more than one node
+    uint64_t overused_nodes = 0;
+    // number of drivers of the most used node
+    uint64_t max_occupancy = 0;
+    // routing nodes used, summed over the nets
+    uint64_t wirelength = 0;
+    uint64_t nets_rerouted = 0;
+    uint64_t num_expansions = 0;
+    // in seconds
+    double duration = 0;
+    // longest path between sequential blocks, in the unit of the node delays
+    double critical_path_delay = 0;
+};
+
 class GlobalRouter : public Router {
 public:
     GlobalRouter(uint32_t num_iteration, const RoutingGraph &g);
@@ -11,17 +28,47 @@ public:
 
     double route_strategy_ratio = 1;
 
+    // route the nets of every iteration on several threads. nets whose
+    // regions don't overlap are batched and routed concurrently, so the
+    // result only depends on the batches and is the same for any number of
+    // threads above one
+    uint32_t get_num_threads() const { return num_threads_; }
+    void set_num_threads(uint32_t num_threads);
+    // how far the route of a net may go outside the bounding box of its pins
+    // when routing in parallel
+    uint32_t get_region_margin() const { return region_margin_; }
+    void set_region_margin(uint32_t margin) { region_margin_ = margin; }
+
+    // after the first iteration only rip up the nets on overused nodes,
+    // together with their linked reg nets. every net is ripped up again if
+    // the number of overused nodes hasn't gone down for stall_iterations
+    bool get_incremental() const { return incremental_; }
+    void set_incremental(bool incremental) { incremental_ = incremental; }
+    uint32_t get_stall_iterations() const { return stall_iterations_; }
+    void set_stall_iterations(uint32_t iterations)
+    { stall_iterations_ = iterations; }
+
+    // use the criticality of every pin pair from a static timing analysis of
+    // the previous iteration instead of its relative route delay, and weigh
+    // the node delays on the same scale as congestion
+    bool get_timing_driven() const { return timing_driven_; }
+    void set_timing_driven(bool timing_driven)
+    { timing_driven_ = timing_driven; }
+
+    // one entry per iteration of the last route() call, also when it failed
+    const std::vector<IterationStats> &get_iteration_stats() const
+    { return iteration_stats_; }
+
 protected:
     virtual void
     route_net(int net_id, uint32_t it);
 
     virtual void compute_slack_ratio(uint32_t current_iter);
-    virtual std::function<double(const std::shared_ptr<Node> &,
-                                 const std::shared_ptr<Node> &)>
-    create_cost_function(double an, uint32_t it, int net_id);
+    virtual CostFunction create_cost_function(double an, uint32_t it,
+                                              int net_id);
 
-    virtual std::function<bool(const std::shared_ptr<Node> &)>
-    get_free_switch(const std::pair<uint32_t, uint32_t> &p);
+    virtual EndFunction get_free_switch(const std::pair<uint32_t,
+                                                        uint32_t> &p);
 
 private:
     uint32_t num_iteration_ = 40;
@@ -30,10 +77,42 @@ private:
              double> slack_ratio_;
     double hn_factor_ = 0.1;
     double slack_factor_ = 0.9;
+    double criticality_exponent_ = 8;
     std::map<int, std::pair<int, uint32_t>> reg_net_table_;
+    uint32_t num_threads_ = 1;
+    uint32_t region_margin_ = 3;
+    bool incremental_ = false;
+    uint32_t stall_iterations_ = 2;
+    std::vector<IterationStats> iteration_stats_;
+    bool timing_driven_ = false;
+    double average_edge_cost_ = 1;
+    // criticality of every pin pair in the current routes, between 0 and 1
+    std::map<std::pair<int, uint32_t>, double> criticality_;
+
+    // linked reg nets are routed in order by the same thread, so they form a
+    // single unit
+    struct RoutingUnit {
+        std::vector<int> net_ids;
+        Region region;
+    };
 
     std::vector<uint32_t> reorder_pins(const Net &net);
     void fix_register_net(int net_id, Pin &pin);
+
+    void init_routes();
+    IterationStats compute_iteration_stats() const;
+    double analyze_timing();
+    std::vector<std::vector<double>> compute_sink_delays() const;
+    std::vector<char> get_congested_nets() const;
+    std::vector<RoutingUnit>
+    create_routing_units(const std::vector<uint32_t> &reordered_netlist) const;
+    std::vector<std::vector<uint32_t>>
+    create_batches(const std::vector<RoutingUnit> &units,
+                   const std::vector<uint32_t> &unit_ids) const;
+    void route_units(std::vector<RoutingUnit> &units,
+                     const std::vector<char> &rip_up, uint32_t it);
+    bool route_unit(const RoutingUnit &unit, uint32_t it);
+    void grow_region(RoutingUnit &unit) const;
 };
 
 
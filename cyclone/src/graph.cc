@@ -58,6 +58,19 @@ uint32_t Node::get_edge_cost(const std::shared_ptr<Node> &node) {
         return edge_cost_[node];
 }
 
+void Node::set_delay(uint32_t delay) {
+    for (auto const &n : conn_in_) {
+        auto const node = n.lock();
+        if (!node)
+            continue;
+        auto iter = node->edge_cost_.find(weak_from_this());
+        // edge cost is the node delay plus the wire delay
+        if (iter != node->edge_cost_.end())
+            iter->second = iter->second - this->delay + delay;
+    }
+    this->delay = delay;
+}
+
 void Node::remove_edge(const std::shared_ptr<Node> &node) {
     if (neighbors_.find(node) != neighbors_.end()) {
         neighbors_.erase(node);
@@ -249,7 +262,12 @@ void RoutingGraph::add_edge(const Node &node1, const Node &node2,
         throw ::runtime_error("cannot find node1");
     if (n2 == nullptr)
         throw ::runtime_error("cannot find node2");
+    add_edge(n1, n2, wire_delay);
+}
 
+void RoutingGraph::add_edge(const std::shared_ptr<Node> &n1,
+                            const std::shared_ptr<Node> &n2,
+                            uint32_t wire_delay) {
     // notice that this is directional, that is, add n2 to n1's neighbor
     if (n1->width != n2->width)
         throw ::runtime_error("node2 width does not equal to node1 "
@@ -258,11 +276,124 @@ void RoutingGraph::add_edge(const Node &node1, const Node &node2,
     n1->add_edge(n2, wire_delay);
 }
 
+void RoutingGraph::add_edges(const uint32_t *src, const uint32_t *dst,
+                             uint64_t num_edges,
+                             const std::vector<std::string> &names) {
+    for (uint64_t i = 0; i < num_edges; i++) {
+        auto n1 = search_create_node(src + i * NODE_FIELDS, names);
+        auto n2 = search_create_node(dst + i * NODE_FIELDS, names);
+        add_edge(n1, n2, Node::DEFAULT_WIRE_DELAY);
+    }
+}
+
+void RoutingGraph::set_delay(const Node &node, uint32_t delay) {
+    auto n = search_create_node(node);
+    if (n == nullptr)
+        throw ::runtime_error("cannot find node " + node.to_string());
+    n->set_delay(delay);
+}
+
+void RoutingGraph::set_delays(NodeType type, uint32_t delay) {
+    for (auto &iter : grid_) {
+        auto &tile = iter.second;
+        switch (type) {
+            case NodeType::SwitchBox:
+                for (uint32_t side = 0; side < Switch::SIDES; side++) {
+                    for (auto const &sb :
+                         tile.switchbox.get_sbs_by_side(gsi(side)))
+                        sb->set_delay(delay);
+                }
+                break;
+            case NodeType::Port:
+                for (auto const &port_iter : tile.ports)
+                    port_iter.second->set_delay(delay);
+                break;
+            case NodeType::Register:
+                for (auto const &reg_iter : tile.registers)
+                    reg_iter.second->set_delay(delay);
+                break;
+            case NodeType::Generic:
+                for (auto const &rmux_iter : tile.rmux_nodes)
+                    rmux_iter.second->set_delay(delay);
+                break;
+            default:
+                throw ::runtime_error("unknown node type");
+        }
+    }
+}
+
+void RoutingGraph::set_sb_delays(SwitchBoxIO io, uint32_t delay) {
+    for (auto &iter : grid_) {
+        for (uint32_t side = 0; side < Switch::SIDES; side++) {
+            for (auto const &sb :
+                 iter.second.switchbox.get_sbs_by_side(gsi(side))) {
+                if (sb->io == io)
+                    sb->set_delay(delay);
+            }
+        }
+    }
+}
+
+void RoutingGraph::add_csr_edges(const uint32_t *nodes, const uint32_t *delays,
+                                 uint64_t num_nodes, const uint32_t *offsets,
+                                 const uint32_t *targets, const uint32_t *costs,
+                                 const std::vector<std::string> &names) {
+    // every node is only looked up once
+    ::vector<::shared_ptr<Node>> graph_nodes(num_nodes);
+    for (uint64_t i = 0; i < num_nodes; i++) {
+        graph_nodes[i] = search_create_node(nodes + i * NODE_FIELDS, names);
+        graph_nodes[i]->delay = delays[i];
+    }
+    for (uint64_t i = 0; i < num_nodes; i++) {
+        if (offsets[i] > offsets[i + 1])
+            throw ::runtime_error("invalid edge offsets");
+        for (uint32_t j = offsets[i]; j < offsets[i + 1]; j++) {
+            if (targets[j] >= num_nodes)
+                throw ::runtime_error("edge target out of range");
+            auto const &n2 = graph_nodes[targets[j]];
+            // edge cost is the node delay plus the wire delay
+            if (costs[j] < n2->delay)
+                throw ::runtime_error("edge cost less than the node delay");
+            add_edge(graph_nodes[i], n2, costs[j] - n2->delay);
+        }
+    }
+}
+
+std::shared_ptr<Node>
+RoutingGraph::search_create_node(const uint32_t *node,
+                                 const std::vector<std::string> &names) {
+    static const ::string EMPTY_NAME;
+    auto const type = static_cast<NodeType>(node[0]);
+    if (type != NodeType::SwitchBox && node[7] >= names.size())
+        throw ::runtime_error("node name index out of range");
+    auto const &name = type == NodeType::SwitchBox ? EMPTY_NAME
+                                                   : names[node[7]];
+    return search_create_node(type, name, node[1], node[2], node[3], node[4],
+                              static_cast<SwitchBoxSide>(node[5]),
+                              static_cast<SwitchBoxIO>(node[6]));
+}
+
 std::shared_ptr<Node> RoutingGraph::search_create_node(const Node &node) {
-    uint32_t x = node.x;
-    uint32_t y = node.y;
+    auto side = SwitchBoxSide::Right;
+    auto io = SwitchBoxIO::SB_IN;
+    if (node.type == NodeType::SwitchBox) {
+        auto const &sb_node = dynamic_cast<const SwitchBoxNode &>(node);
+        side = sb_node.side;
+        io = sb_node.io;
+    }
+    return search_create_node(node.type, node.name, node.x, node.y,
+                              node.width, node.track, side, io);
+}
 
-    if (grid_.find({x, y}) == grid_.end()) {
+std::shared_ptr<Node> RoutingGraph::search_create_node(NodeType type,
+                                                       const std::string &name,
+                                                       uint32_t x, uint32_t y,
+                                                       uint32_t width,
+                                                       uint32_t track,
+                                                       SwitchBoxSide side,
+                                                       SwitchBoxIO io) {
+    auto tile_iter = grid_.find({x, y});
+    if (tile_iter == grid_.end()) {
         // a new tile. creating on the fly not supported any more
         ostringstream stream;
         stream << "unable to find tile at (" << x << ", " << y << ")";
@@ -270,28 +401,20 @@ std::shared_ptr<Node> RoutingGraph::search_create_node(const Node &node) {
     } else {
         // depends on which type the nodes is. we need to
         // treat differently
-        auto &tile = grid_.at({x, y});
-        switch (node.type) {
+        auto &tile = tile_iter->second;
+        switch (type) {
             case NodeType::Register:
-                if (tile.registers.find(node.name) == tile.registers.end())
-                    tile.registers[node.name] =
-                            ::make_shared<RegisterNode>(node.name,
-                                                        node.x,
-                                                        node.y,
-                                                        node.width,
-                                                        node.track);
-                return tile.registers.at(node.name);
+                if (tile.registers.find(name) == tile.registers.end())
+                    tile.registers[name] =
+                            ::make_shared<RegisterNode>(name, x, y, width,
+                                                        track);
+                return tile.registers.at(name);
             case NodeType::Port:
-                if (tile.ports.find(node.name) == tile.ports.end())
-                    tile.ports[node.name] =
-                            ::make_shared<PortNode>(node.name, node.x,
-                                                    node.y, node.width);
-                return tile.ports.at(node.name);
+                if (tile.ports.find(name) == tile.ports.end())
+                    tile.ports[name] =
+                            ::make_shared<PortNode>(name, x, y, width);
+                return tile.ports.at(name);
             case NodeType::SwitchBox: {
-                auto const &sb_node = dynamic_cast<const SwitchBoxNode &>(node);
-                auto const &track = sb_node.track;
-                auto const &side = sb_node.side;
-                auto const &io = sb_node.io;
                 if (track > tile.switchbox.num_track)
                     throw ::runtime_error("node is on a track that doesn't "
                                           "exist in the switch box");
@@ -300,15 +423,11 @@ std::shared_ptr<Node> RoutingGraph::search_create_node(const Node &node) {
             }
             case NodeType::Generic:
                 // genetic node
-                if (tile.rmux_nodes.find(node.name)
-                    == tile.rmux_nodes.end())
-                    tile.rmux_nodes[node.name] =
-                            ::make_shared<RegisterMuxNode>(node.name,
-                                                       node.x,
-                                                       node.y,
-                                                       node.width,
-                                                       node.track);
-                return tile.rmux_nodes.at(node.name);
+                if (tile.rmux_nodes.find(name) == tile.rmux_nodes.end())
+                    tile.rmux_nodes[name] =
+                            ::make_shared<RegisterMuxNode>(name, x, y, width,
+                                                           track);
+                return tile.rmux_nodes.at(name);
         }
     }
     return nullptr;
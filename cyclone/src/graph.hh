@@ -60,6 +60,9 @@ public:
     virtual void remove_edge(const std::shared_ptr<Node> &node);
 
     uint32_t get_edge_cost(const std::shared_ptr<Node> &node);
+    // the node delay is part of the cost of every edge going into the node,
+    // so these are updated as well
+    void set_delay(uint32_t delay);
 
     // helper function to allow iteration
     std::set<std::weak_ptr<Node>>::iterator begin() const
@@ -249,6 +252,28 @@ public:
     void add_edge(const Node &node1, const Node &node2)
     { add_edge(node1, node2, Node::DEFAULT_WIRE_DELAY); }
     void add_edge(const Node &node1, const Node &node2, uint32_t wire_delay);
+    // batch version of add_edge. each node is encoded as NODE_FIELDS
+    // integers: type, x, y, width, track, side, io and an index into names,
+    // which is only used by non switch box nodes
+    static constexpr uint32_t NODE_FIELDS = 8;
+    void add_edges(const uint32_t *src, const uint32_t *dst,
+                   uint64_t num_edges, const std::vector<std::string> &names);
+    // adds a whole graph in compressed sparse row format, as stored in the
+    // binary graph file. nodes are encoded the same way as add_edges, and the
+    // out edges of node i are targets[offsets[i]:offsets[i + 1]] with the
+    // given edge costs
+    void add_csr_edges(const uint32_t *nodes, const uint32_t *delays,
+                       uint64_t num_nodes, const uint32_t *offsets,
+                       const uint32_t *targets, const uint32_t *costs,
+                       const std::vector<std::string> &names);
+
+    // delay annotations used by timing-driven routing. can be set before or
+    // after the edges are added
+    void set_delay(const Node &node, uint32_t delay);
+    // sets the delay of every node of the given type
+    void set_delays(NodeType type, uint32_t delay);
+    // sets the delay of every switch box node on the given io
+    void set_sb_delays(SwitchBoxIO io, uint32_t delay);
 
     // TODO
     // add remove edge functions
@@ -283,6 +308,17 @@ private:
     std::map<std::pair<uint32_t, uint32_t>, Tile> grid_;
 
     std::shared_ptr<Node> search_create_node(const Node &node);
+    std::shared_ptr<Node> search_create_node(const uint32_t *node,
+                                             const std::vector<std::string>
+                                             &names);
+    std::shared_ptr<Node> search_create_node(NodeType type,
+                                             const std::string &name,
+                                             uint32_t x, uint32_t y,
+                                             uint32_t width, uint32_t track,
+                                             SwitchBoxSide side,
+                                             SwitchBoxIO io);
+    void add_edge(const std::shared_ptr<Node> &n1,
+                  const std::shared_ptr<Node> &n2, uint32_t wire_delay);
 };
 
 #endif //CYCLONE_GRAPH_H
@@ -3,9 +3,16 @@
 #include <iostream>
 #include <fstream>
 #include <algorithm>
+#include <cstring>
 #include <functional>
+#include <iterator>
 #include <sstream>
+#include <unordered_map>
 #include <unordered_set>
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
 
 using std::ifstream;
 using std::map;
@@ -21,9 +28,11 @@ using std::to_string;
 constexpr auto gsi = get_side_int;
 constexpr auto gsv = get_side_value;
 constexpr auto gii = get_io_int;
+constexpr auto giv = get_io_value;
 
 constexpr char BEGIN[] = "BEGIN";
 constexpr char END[] = "END";
+constexpr char DELAY[] = "DELAY";
 
 #define DELIMITER ": \t,()"
 
@@ -70,11 +79,291 @@ inline bool exists(const std::string &filename) {
     return tokens;
 }
 
+// binary containers made of named sections of uint32 arrays, see
+// arch/packed_binary.py for the layout. the packed netlist and the routing
+// graph share the same container with different magic numbers
+constexpr char PACKED_MAGIC[] = "CGRAPKD";
+constexpr uint32_t PACKED_VERSION = 1;
+constexpr char GRAPH_MAGIC[] = "CGRAGRF";
+constexpr uint32_t GRAPH_VERSION = 1;
+constexpr uint64_t SECTION_ALIGNMENT = 8;
+
+bool has_magic(const ::string &filename, const char *expected) {
+    ::ifstream in(filename, std::ios::binary);
+    char magic[8] = {};
+    in.read(magic, sizeof(magic));
+    return in.gcount() == sizeof(magic) &&
+           std::equal(magic, magic + sizeof(magic), expected);
+}
+
+bool is_packed_binary(const ::string &filename) {
+    return has_magic(filename, PACKED_MAGIC);
+}
+
+bool is_routing_graph_binary(const ::string &filename) {
+    return has_magic(filename, GRAPH_MAGIC);
+}
+
+// zero-copy view of an array inside a mapped file
+struct ArrayView {
+    const uint32_t *data = nullptr;
+    uint64_t size = 0;
+
+    const uint32_t *begin() const { return data; }
+    const uint32_t *end() const { return data + size; }
+    uint32_t at(uint64_t index) const {
+        if (index >= size)
+            throw ::runtime_error("array index out of range");
+        return data[index];
+    }
+    uint32_t back() const { return at(size - 1); }
+    bool empty() const { return size == 0; }
+};
+
+class SectionFile {
+public:
+    SectionFile(const ::string &filename, const char *magic,
+                uint32_t version) {
+        int fd = open(filename.c_str(), O_RDONLY);
+        if (fd < 0)
+            throw ::runtime_error("unable to open " + filename);
+        struct stat st = {};
+        fstat(fd, &st);
+        size_ = static_cast<uint64_t>(st.st_size);
+        if (size_ > 0) {
+            void *addr = mmap(nullptr, size_, PROT_READ, MAP_PRIVATE, fd, 0);
+            if (addr != MAP_FAILED)
+                data_ = static_cast<const char *>(addr);
+        }
+        close(fd);
+        if (data_ == nullptr)
+            throw ::runtime_error("unable to map " + filename);
+
+        check(8);
+        if (!std::equal(data_, data_ + 8, magic))
+            throw ::runtime_error(filename + " has an unexpected format");
+        if (read_u32(8) > version)
+            throw ::runtime_error("unsupported file version in " + filename);
+        uint32_t num_sections = read_u32(12);
+        uint64_t pos = 16;
+        for (uint32_t i = 0; i < num_sections; i++) {
+            check(pos + 24);
+            ::string name(data_ + pos, strnlen(data_ + pos, 8));
+            uint64_t offset = read_u64(pos + 8);
+            if (offset % SECTION_ALIGNMENT)
+                throw ::runtime_error("misaligned section " + name);
+            sections_.insert({name, {offset, read_u64(pos + 16)}});
+            pos += 24;
+        }
+
+        uint64_t blob_pos;
+        auto offsets = views("strings", blob_pos)[0];
+        if (offsets.empty())
+            throw ::runtime_error("invalid string table in " + filename);
+        check(blob_pos + offsets.back());
+        strings_.reserve(offsets.size - 1);
+        for (uint64_t i = 0; i + 1 < offsets.size; i++) {
+            strings_.emplace_back(data_ + blob_pos + offsets.data[i],
+                                  offsets.data[i + 1] - offsets.data[i]);
+        }
+    }
+
+    SectionFile(const SectionFile &) = delete;
+    SectionFile &operator=(const SectionFile &) = delete;
+
+    ~SectionFile() {
+        munmap(const_cast<char *>(data_), size_);
+    }
+
+    bool has_section(const ::string &name) const {
+        return sections_.find(name) != sections_.end();
+    }
+
+    // the views are only valid as long as the file is alive
+    ::vector<ArrayView> views(const ::string &name) const {
+        uint64_t end;
+        return views(name, end);
+    }
+
+    ::vector<::vector<uint32_t>> arrays(const ::string &name) const {
+        ::vector<::vector<uint32_t>> result;
+        for (auto const &view : views(name))
+            result.emplace_back(view.begin(), view.end());
+        return result;
+    }
+
+    const ::string &str(uint32_t index) const { return strings_.at(index); }
+    const ::vector<::string> &strings() const { return strings_; }
+
+private:
+    const char *data_ = nullptr;
+    uint64_t size_ = 0;
+    ::map<::string, ::pair<uint64_t, uint64_t>> sections_;
+    ::vector<::string> strings_;
+
+    void check(uint64_t end) const {
+        if (end > size_)
+            throw ::runtime_error("truncated binary file");
+    }
+
+    uint32_t read_u32(uint64_t pos) const {
+        check(pos + 4);
+        uint32_t value;
+        std::memcpy(&value, data_ + pos, sizeof(value));
+        return value;
+    }
+
+    uint64_t read_u64(uint64_t pos) const {
+        check(pos + 8);
+        uint64_t value;
+        std::memcpy(&value, data_ + pos, sizeof(value));
+        return value;
+    }
+
+    ::vector<ArrayView> views(const ::string &name, uint64_t &end) const {
+        auto const iter = sections_.find(name);
+        if (iter == sections_.end())
+            throw ::runtime_error("missing section " + name);
+        uint64_t pos = iter->second.first;
+        uint32_t num_arrays = read_u32(pos);
+        ::vector<ArrayView> result(num_arrays);
+        end = pos + 4 * (1 + static_cast<uint64_t>(num_arrays));
+        for (uint32_t i = 0; i < num_arrays; i++) {
+            uint32_t length = read_u32(pos + 4 * (1 + i));
+            check(end + 4 * static_cast<uint64_t>(length));
+            // sections are 8-byte aligned and arrays are packed back to back,
+            // so every array is properly aligned for uint32
+            result[i].data = reinterpret_cast<const uint32_t *>(data_ + end);
+            result[i].size = length;
+            end += 4 * static_cast<uint64_t>(length);
+        }
+        return result;
+    }
+};
+
+class SectionWriter {
+public:
+    uint32_t intern(const ::string &value) {
+        auto const iter = string_index_.find(value);
+        if (iter != string_index_.end())
+            return iter->second;
+        auto index = static_cast<uint32_t>(strings_.size());
+        string_index_.insert({value, index});
+        strings_.emplace_back(value);
+        return index;
+    }
+
+    void add_section(const ::string &name,
+                     const ::vector<::vector<uint32_t>> &arrays,
+                     const ::string &raw = "") {
+        if (name.size() > 8)
+            throw ::runtime_error("section name too long: " + name);
+        ::string data;
+        append_u32(data, static_cast<uint32_t>(arrays.size()));
+        for (auto const &array : arrays)
+            append_u32(data, static_cast<uint32_t>(array.size()));
+        for (auto const &array : arrays)
+            data.append(reinterpret_cast<const char *>(array.data()),
+                        4 * array.size());
+        data += raw;
+        sections_.emplace_back(name, data);
+    }
+
+    void write(const ::string &filename, const char *magic,
+               uint32_t version) {
+        // string table goes first so that readers can resolve every section
+        ::vector<uint32_t> offsets = {0};
+        ::string blob;
+        for (auto const &s : strings_) {
+            blob += s;
+            offsets.emplace_back(static_cast<uint32_t>(blob.size()));
+        }
+        add_section("strings", {offsets}, blob);
+        std::rotate(sections_.rbegin(), sections_.rbegin() + 1,
+                    sections_.rend());
+
+        std::ofstream out(filename, std::ios::binary | std::ios::trunc);
+        if (!out)
+            throw ::runtime_error("unable to open " + filename);
+        ::string header(magic, 8);
+        append_u32(header, version);
+        append_u32(header, static_cast<uint32_t>(sections_.size()));
+        uint64_t offset = align(16 + 24 * sections_.size());
+        ::vector<uint64_t> offsets64;
+        for (auto const &[name, data] : sections_) {
+            ::string entry = name;
+            entry.resize(8, '\0');
+            header += entry;
+            append_u64(header, offset);
+            append_u64(header, data.size());
+            offsets64.emplace_back(offset);
+            offset = align(offset + data.size());
+        }
+        out << header;
+        uint64_t pos = header.size();
+        for (uint32_t i = 0; i < sections_.size(); i++) {
+            out << ::string(offsets64[i] - pos, '\0');
+            out << sections_[i].second;
+            pos = offsets64[i] + sections_[i].second.size();
+        }
+    }
+
+private:
+    ::map<::string, uint32_t> string_index_;
+    ::vector<::string> strings_;
+    ::vector<::pair<::string, ::string>> sections_;
+
+    static uint64_t align(uint64_t pos) {
+        return (pos + SECTION_ALIGNMENT - 1) / SECTION_ALIGNMENT *
+               SECTION_ALIGNMENT;
+    }
+
+    static void append_u32(::string &data, uint32_t value) {
+        data.append(reinterpret_cast<const char *>(&value), sizeof(value));
+    }
+
+    static void append_u64(::string &data, uint64_t value) {
+        data.append(reinterpret_cast<const char *>(&value), sizeof(value));
+    }
+};
+
+::pair<::map<::string, ::vector<::pair<::string, ::string>>>,
+       ::map<::string, uint32_t>>
+load_netlist_binary(const ::string &filename) {
+    SectionFile packed(filename, PACKED_MAGIC, PACKED_VERSION);
+    ::map<::string, ::vector<::pair<::string, ::string>>> netlist;
+    ::map<::string, uint32_t> track_mode;
+
+    auto const nets = packed.arrays("netlists");
+    if (nets.size() != 4)
+        throw ::runtime_error("invalid netlists section in " + filename);
+    auto const &net_names = nets[0];
+    auto const &net_offsets = nets[1];
+    for (uint32_t i = 0; i < net_names.size(); i++) {
+        ::vector<::pair<::string, ::string>> net;
+        for (uint32_t j = net_offsets.at(i); j < net_offsets.at(i + 1); j++) {
+            net.emplace_back(make_pair(packed.str(nets[2].at(j)),
+                                       packed.str(nets[3].at(j))));
+        }
+        netlist.insert({packed.str(net_names[i]), net});
+    }
+
+    if (packed.has_section("trackmd")) {
+        auto const modes = packed.arrays("trackmd");
+        for (uint32_t i = 0; i < modes.at(0).size(); i++)
+            track_mode.insert({packed.str(modes[0][i]), modes.at(1).at(i)});
+    }
+
+    return {netlist, track_mode};
+}
+
 ::pair<::map<::string, ::vector<::pair<::string, ::string>>>,
        ::map<::string, uint32_t>>
 load_netlist(const std::string &filename) {
     if (!::exists(filename))
         throw ::runtime_error(filename + " does not exist");
+    if (::is_packed_binary(filename))
+        return ::load_netlist_binary(filename);
     ::ifstream in;
     in.open(filename);
 
@@ -262,10 +551,55 @@ void print_sb(std::ofstream &out, const std::string &pad, const Switch &sb) {
     out << END << endl;
 }
 
+// node delays are written after the tiles, so that older graph files
+// without them still load. the most common delay of each node type is
+// written as "DELAY <type> <delay>", followed by the nodes that differ from
+// it as "DELAY <node> <delay>"
+void print_delays(std::ofstream &out, RoutingGraph &graph) {
+    static const ::vector<::string> type_tokens = {
+        SwitchBoxNode::TOKEN, PortNode::TOKEN, RegisterNode::TOKEN,
+        RegisterMuxNode::TOKEN};
+    // nodes are created with the default delay
+    const uint32_t default_delay = Node().delay;
+    ::vector<::vector<std::shared_ptr<Node>>> nodes(type_tokens.size());
+    for (const auto &iter : graph) {
+        auto const &tile = iter.second;
+        for (uint32_t side = 0; side < Switch::SIDES; side++) {
+            for (auto const &sb : tile.switchbox.get_sbs_by_side(gsi(side)))
+                nodes[NodeType::SwitchBox].emplace_back(sb);
+        }
+        for (auto const &port_iter : tile.ports)
+            nodes[NodeType::Port].emplace_back(port_iter.second);
+        for (auto const &reg_iter : tile.registers)
+            nodes[NodeType::Register].emplace_back(reg_iter.second);
+        for (auto const &rmux_iter : tile.rmux_nodes)
+            nodes[NodeType::Generic].emplace_back(rmux_iter.second);
+    }
+    for (uint32_t type = 0; type < type_tokens.size(); type++) {
+        ::map<uint32_t, uint64_t> counts;
+        for (auto const &node : nodes[type])
+            counts[node->delay]++;
+        uint32_t type_delay = default_delay;
+        uint64_t max_count = 0;
+        for (auto const &[delay, count] : counts) {
+            if (count > max_count) {
+                type_delay = delay;
+                max_count = count;
+            }
+        }
+        if (type_delay != default_delay)
+            out << DELAY << " " << type_tokens[type] << " " << type_delay
+                << endl;
+        for (auto const &node : nodes[type]) {
+            if (node->delay != type_delay)
+                out << DELAY << " " << node->to_string() << " " << node->delay
+                    << endl;
+        }
+    }
+}
+
 void dump_routing_graph(RoutingGraph &graph,
                         const std::string &filename) {
-    // TODO:
-    // add delay info into the graph
     std::ofstream out;
     out.open(filename);
     static const ::string PAD = "  ";
@@ -321,6 +655,103 @@ void dump_routing_graph(RoutingGraph &graph,
             out << PAD << END << endl;
         }
     }
+
+    print_delays(out, graph);
+}
+
+// the binary graph has a node table with every node in the graph, including
+// the switch box inputs the text format leaves out, and the out edges in
+// compressed sparse row format. see arch/routing_graph_binary.py for the
+// sections
+void dump_routing_graph_binary(RoutingGraph &graph,
+                               const std::string &filename) {
+    SectionWriter writer;
+    ::map<uint32_t, Switch> switch_boxes;
+    for (const auto &iter : graph) {
+        auto const &switch_box = iter.second.switchbox;
+        if (switch_boxes.find(switch_box.id) == switch_boxes.end())
+            switch_boxes.insert({switch_box.id, switch_box});
+    }
+    ::vector<uint32_t> switch_ids, switch_widths, num_tracks;
+    ::vector<uint32_t> wire_offsets = {0}, wires;
+    for (const auto &iter : switch_boxes) {
+        auto const &switch_box = iter.second;
+        switch_ids.emplace_back(switch_box.id);
+        switch_widths.emplace_back(switch_box.width);
+        num_tracks.emplace_back(switch_box.num_track);
+        for (auto const &wire : switch_box.internal_wires()) {
+            auto [track_from, side_from, track_to, side_to] = wire;
+            wires.insert(wires.end(), {track_from, gsv(side_from), track_to,
+                                       gsv(side_to)});
+        }
+        wire_offsets.emplace_back(static_cast<uint32_t>(wires.size() / 4));
+    }
+    writer.add_section("switches", {switch_ids, switch_widths, num_tracks,
+                                    wire_offsets, wires});
+
+    ::vector<uint32_t> tile_xs, tile_ys, heights, tile_switches;
+    ::vector<std::shared_ptr<Node>> nodes;
+    for (const auto &iter : graph) {
+        auto const &tile = iter.second;
+        tile_xs.emplace_back(tile.x);
+        tile_ys.emplace_back(tile.y);
+        heights.emplace_back(tile.height);
+        tile_switches.emplace_back(tile.switchbox.id);
+        for (uint32_t side = 0; side < Switch::SIDES; side++) {
+            for (auto const &sb : tile.switchbox.get_sbs_by_side(gsi(side)))
+                nodes.emplace_back(sb);
+        }
+        for (auto const &port_iter : tile.ports)
+            nodes.emplace_back(port_iter.second);
+        for (auto const &reg_iter : tile.registers)
+            nodes.emplace_back(reg_iter.second);
+        for (auto const &rmux_iter : tile.rmux_nodes)
+            nodes.emplace_back(rmux_iter.second);
+    }
+    writer.add_section("tiles", {tile_xs, tile_ys, heights, tile_switches});
+
+    std::unordered_map<const Node *, uint32_t> node_ids;
+    for (uint32_t i = 0; i < nodes.size(); i++)
+        node_ids.insert({nodes[i].get(), i});
+
+    ::vector<uint32_t> fields, delays, offsets = {0}, targets, costs;
+    fields.reserve(nodes.size() * RoutingGraph::NODE_FIELDS);
+    delays.reserve(nodes.size());
+    for (auto const &node : nodes) {
+        uint32_t side = 0, io = 0, name = 0;
+        if (node->type == NodeType::SwitchBox) {
+            auto const sb = std::static_pointer_cast<SwitchBoxNode>(node);
+            side = gsv(sb->side);
+            io = giv(sb->io);
+        } else {
+            name = writer.intern(node->name);
+        }
+        fields.insert(fields.end(), {static_cast<uint32_t>(node->type),
+                                     node->x, node->y, node->width,
+                                     node->track, side, io, name});
+        delays.emplace_back(node->delay);
+
+        // neighbors are ordered by address in memory, sort them by id
+        // so that the dump is deterministic
+        ::vector<uint32_t> node_targets;
+        for (auto const &n : *node) {
+            auto const iter = node_ids.find(n.lock().get());
+            if (iter == node_ids.end())
+                throw ::runtime_error("unable to find " + node->to_string() +
+                                      "'s neighbor in the graph tiles");
+            node_targets.emplace_back(iter->second);
+        }
+        std::sort(node_targets.begin(), node_targets.end());
+        for (auto const target : node_targets) {
+            targets.emplace_back(target);
+            costs.emplace_back(node->get_edge_cost(nodes[target]));
+        }
+        offsets.emplace_back(static_cast<uint32_t>(targets.size()));
+    }
+    writer.add_section("nodes", {fields, delays});
+    writer.add_section("edges", {offsets, targets, costs});
+
+    writer.write(filename, GRAPH_MAGIC, GRAPH_VERSION);
 }
 
 inline uint32_t stou(const std::string &str) {
@@ -417,9 +848,93 @@ void connect_nodes(Node &from, std::ifstream &in, RoutingGraph &g) {
     }
 }
 
+void set_delay_from_tokens(const ::vector<::string> &tokens,
+                           RoutingGraph &g) {
+    if (tokens.size() < 3)
+        throw ::runtime_error("expect at least 3 entries for delay");
+    uint32_t delay = stou(tokens.back());
+    auto const &type = tokens[1];
+    if (tokens.size() == 3) {
+        // delay of every node of the type
+        if (type == SwitchBoxNode::TOKEN)
+            g.set_delays(NodeType::SwitchBox, delay);
+        else if (type == PortNode::TOKEN)
+            g.set_delays(NodeType::Port, delay);
+        else if (type == RegisterNode::TOKEN)
+            g.set_delays(NodeType::Register, delay);
+        else if (type == RegisterMuxNode::TOKEN)
+            g.set_delays(NodeType::Generic, delay);
+        else
+            throw ::runtime_error("unknown node type " + type);
+        return;
+    }
+    const ::vector<::string> node_tokens(tokens.begin() + 1, tokens.end() - 1);
+    if (type == SwitchBoxNode::TOKEN)
+        g.set_delay(create_sb_from_tokens(node_tokens), delay);
+    else if (type == PortNode::TOKEN)
+        g.set_delay(create_port_from_tokens(node_tokens), delay);
+    else if (type == RegisterNode::TOKEN)
+        g.set_delay(create_reg_from_tokens(node_tokens), delay);
+    else if (type == RegisterMuxNode::TOKEN)
+        g.set_delay(create_rmux_from_tokens(node_tokens), delay);
+    else
+        throw ::runtime_error("unknown node type " + type);
+}
+
+RoutingGraph load_routing_graph_binary(const std::string &filename) {
+    SectionFile file(filename, GRAPH_MAGIC, GRAPH_VERSION);
+    RoutingGraph g;
+
+    auto const switches = file.views("switches");
+    if (switches.size() != 5)
+        throw ::runtime_error("invalid switches section in " + filename);
+    auto const &wire_offsets = switches[3];
+    auto const &wires = switches[4];
+    ::map<uint32_t, Switch> switch_map;
+    for (uint64_t i = 0; i < switches[0].size; i++) {
+        std::set<std::tuple<uint32_t, SwitchBoxSide, uint32_t,
+                            SwitchBoxSide>> internal_wires;
+        for (uint32_t j = wire_offsets.at(i); j < wire_offsets.at(i + 1);
+             j++) {
+            internal_wires.insert({wires.at(j * 4), gsi(wires.at(j * 4 + 1)),
+                                   wires.at(j * 4 + 2),
+                                   gsi(wires.at(j * 4 + 3))});
+        }
+        Switch switchbox(0, 0, switches[2].at(i), switches[1].at(i),
+                         switches[0].at(i), internal_wires);
+        switch_map.insert({switchbox.id, switchbox});
+    }
+
+    auto const tiles = file.views("tiles");
+    if (tiles.size() != 4)
+        throw ::runtime_error("invalid tiles section in " + filename);
+    for (uint64_t i = 0; i < tiles[0].size; i++) {
+        Tile tile(tiles[0].at(i), tiles[1].at(i), tiles[2].at(i),
+                  switch_map.at(tiles[3].at(i)));
+        g.add_tile(tile);
+    }
+
+    // the node and edge arrays are handed over to the graph straight from
+    // the mapped file
+    auto const nodes = file.views("nodes");
+    auto const edges = file.views("edges");
+    if (nodes.size() != 2 ||
+        nodes[0].size != nodes[1].size * RoutingGraph::NODE_FIELDS)
+        throw ::runtime_error("invalid nodes section in " + filename);
+    auto const num_nodes = nodes[1].size;
+    if (edges.size() != 3 || edges[0].size != num_nodes + 1 ||
+        edges[1].size != edges[2].size || edges[0].back() != edges[1].size)
+        throw ::runtime_error("invalid edges section in " + filename);
+    g.add_csr_edges(nodes[0].data, nodes[1].data, num_nodes, edges[0].data,
+                    edges[1].data, edges[2].data, file.strings());
+    return g;
+}
+
 RoutingGraph load_routing_graph(const std::string &filename) {
     if (!::exists(filename))
         throw ::runtime_error(filename + " does not exist");
+    if (::is_routing_graph_binary(filename))
+        return ::load_routing_graph_binary(filename);
 
     std::ifstream in;
     in.open(filename);
@@ -500,6 +1015,8 @@ RoutingGraph load_routing_graph(const std::string &filename) {
         } else if (line_tokens[0] == RegisterMuxNode::TOKEN) {
             auto generic = create_rmux_from_tokens(line_tokens);
             connect_nodes(generic, in, g);
+        } else if (line_tokens[0] == DELAY) {
+            set_delay_from_tokens(line_tokens, g);
         }
     }
     in.close();
@@ -19,6 +19,14 @@ void dump_routing_graph(RoutingGraph &graph, const std::string &filename);
 
 RoutingGraph load_routing_graph(const std::string &filename);
 
+// binary graph format. load_routing_graph detects it as well
+void dump_routing_graph_binary(RoutingGraph &graph,
+                               const std::string &filename);
+
+RoutingGraph load_routing_graph_binary(const std::string &filename);
+
+bool is_routing_graph_binary(const std::string &filename);
+
 void dump_routing_result(const Router &r, const std::string &filename);
 
 void setup_router_input(Router &r, const std::string &packed_filename,
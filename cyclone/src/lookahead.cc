@@ -0,0 +1,349 @@
+#include "lookahead.hh"
+#include <algorithm>
+#include <cstdio>
+#include <cstring>
+#include <fstream>
+#include <functional>
+#include <limits>
+#include <numeric>
+#include <queue>
+#include "util.hh"
+
+using std::map;
+using std::pair;
+using std::runtime_error;
+using std::shared_ptr;
+using std::string;
+using std::vector;
+
+constexpr char RouterLookahead::TILE_SINK[];
+constexpr char RouterLookahead::MAGIC[];
+
+namespace {
+
+// FNV-1a, which is stable across platforms unlike std::hash
+class Fingerprint {
+public:
+    void add(const void *data, uint64_t size) {
+        auto bytes = static_cast<const unsigned char *>(data);
+        for (uint64_t i = 0; i < size; i++) {
+            value_ ^= bytes[i];
+            value_ *= 1099511628211ull;
+        }
+    }
+    void add(uint32_t value) { add(&value, sizeof(value)); }
+    uint64_t value() const { return value_; }
+
+private:
+    uint64_t value_ = 14695981039346656037ull;
+};
+
+// splitmix64 finalizer
+uint64_t mix(uint64_t value) {
+    value += 0x9e3779b97f4a7c15ull;
+    value = (value ^ (value >> 30u)) * 0xbf58476d1ce4e5b9ull;
+    value = (value ^ (value >> 27u)) * 0x94d049bb133111ebull;
+    return value ^ (value >> 31u);
+}
+
+template<typename T>
+void write_value(std::ofstream &out, const T &value) {
+    out.write(reinterpret_cast<const char *>(&value), sizeof(value));
+}
+
+template<typename T>
+bool read_value(std::ifstream &in, T &value) {
+    in.read(reinterpret_cast<char *>(&value), sizeof(value));
+    return in.good();
+}
+
+}
+
+uint64_t RouterLookahead::compute_fingerprint(
+        const ::vector<::shared_ptr<Node>> &nodes,
+        const ::vector<uint32_t> &edge_offsets,
+        const ::vector<uint32_t> &edge_targets,
+        const ::vector<uint32_t> &edge_costs) {
+    // node ids depend on the order the graph is traversed in, which is not
+    // stable across runs. nodes and edges are hashed by what they are
+    // instead and summed up, so the fingerprint doesn't depend on the order
+    ::vector<uint64_t> node_hashes(nodes.size());
+    uint64_t result = mix(nodes.size()) + mix(edge_targets.size());
+    for (uint64_t i = 0; i < nodes.size(); i++) {
+        auto const &node = nodes[i];
+        Fingerprint fingerprint;
+        fingerprint.add(node_class(*node));
+        fingerprint.add(node->x);
+        fingerprint.add(node->y);
+        fingerprint.add(node->width);
+        fingerprint.add(node->track);
+        fingerprint.add(node->name.data(), node->name.size() + 1);
+        node_hashes[i] = fingerprint.value();
+        result += mix(node_hashes[i]);
+    }
+    for (uint64_t i = 0; i < nodes.size(); i++) {
+        for (uint32_t e = edge_offsets[i]; e < edge_offsets[i + 1]; e++) {
+            result += mix(node_hashes[i] ^
+                          mix(node_hashes[edge_targets[e]] + edge_costs[e]));
+        }
+    }
+    return result;
+}
+
+uint32_t RouterLookahead::node_class(const Node &node) {
+    switch (node.type) {
+        case NodeType::SwitchBox: {
+            auto const &sb = static_cast<const SwitchBoxNode &>(node);
+            return get_side_value(sb.side) * Switch::IOS +
+                   get_io_value(sb.io);
+        }
+        case NodeType::Port:
+            return Switch::SIDES * Switch::IOS;
+        case NodeType::Register:
+            return Switch::SIDES * Switch::IOS + 1;
+        default:
+            return Switch::SIDES * Switch::IOS + 2;
+    }
+}
+
+uint32_t RouterLookahead::sink_class(const Node &node) const {
+    if (node.type == NodeType::SwitchBox)
+        return tile_sink_class();
+    if (node.type != NodeType::Port)
+        return UNKNOWN;
+    auto const iter = sink_classes_.find(node.name);
+    return iter == sink_classes_.end() ? UNKNOWN : iter->second;
+}
+
+uint32_t RouterLookahead::tile_sink_class() const {
+    auto const iter = sink_classes_.find(TILE_SINK);
+    return iter == sink_classes_.end() ? UNKNOWN : iter->second;
+}
+
+uint64_t RouterLookahead::index(uint32_t sink_class, uint32_t node_class,
+                                int64_t dx, int64_t dy) const {
+    uint64_t span_x = 2 * width_ - 1;
+    uint64_t span_y = 2 * height_ - 1;
+    return ((static_cast<uint64_t>(sink_class) * NUM_NODE_CLASSES +
+             node_class) * span_x + (dx + width_ - 1)) * span_y +
+           (dy + height_ - 1);
+}
+
+uint32_t RouterLookahead::get(uint32_t sink_class, uint32_t node_class,
+                              uint32_t x, uint32_t y, uint32_t sink_x,
+                              uint32_t sink_y) const {
+    if (sink_class >= sink_names_.size() || x >= width_ || y >= height_ ||
+        sink_x >= width_ || sink_y >= height_)
+        return UNKNOWN;
+    auto dx = static_cast<int64_t>(x) - sink_x;
+    auto dy = static_cast<int64_t>(y) - sink_y;
+    return table_[index(sink_class, node_class, dx, dy)];
+}
+
+void RouterLookahead::build(const ::vector<::shared_ptr<Node>> &nodes,
+                            const ::vector<uint32_t> &edge_offsets,
+                            const ::vector<uint32_t> &edge_targets,
+                            const ::vector<uint32_t> &edge_costs) {
+    fingerprint_ = compute_fingerprint(nodes, edge_offsets, edge_targets,
+                                       edge_costs);
+    auto const num_nodes = static_cast<uint32_t>(nodes.size());
+    width_ = height_ = 0;
+    for (auto const &node : nodes) {
+        width_ = std::max(width_, node->x + 1);
+        height_ = std::max(height_, node->y + 1);
+    }
+
+    // reverse the edges
+    ::vector<uint32_t> in_offsets(num_nodes + 1, 0);
+    for (auto const target : edge_targets)
+        in_offsets[target + 1]++;
+    std::partial_sum(in_offsets.begin(), in_offsets.end(),
+                     in_offsets.begin());
+    ::vector<uint32_t> in_sources(edge_targets.size());
+    ::vector<uint32_t> in_costs(edge_targets.size());
+    ::vector<uint32_t> in_pos(in_offsets.begin(), in_offsets.end() - 1);
+    for (uint32_t i = 0; i < num_nodes; i++) {
+        for (uint32_t e = edge_offsets[i]; e < edge_offsets[i + 1]; e++) {
+            auto const pos = in_pos[edge_targets[e]]++;
+            in_sources[pos] = i;
+            in_costs[pos] = edge_costs[e];
+        }
+    }
+
+    // any port that can be routed to is a sink. switch boxes are grouped
+    // by tile
+    ::map<::string, ::vector<uint32_t>> port_sinks;
+    ::map<::pair<uint32_t, uint32_t>, ::vector<uint32_t>> tile_sbs;
+    for (uint32_t i = 0; i < num_nodes; i++) {
+        auto const &node = nodes[i];
+        if (node->type == NodeType::Port && in_offsets[i + 1] > in_offsets[i])
+            port_sinks[node->name].emplace_back(i);
+        else if (node->type == NodeType::SwitchBox)
+            tile_sbs[{node->x, node->y}].emplace_back(i);
+    }
+    sink_names_ = {TILE_SINK};
+    for (auto const &iter : port_sinks)
+        sink_names_.emplace_back(iter.first);
+    sink_classes_.clear();
+    for (uint32_t i = 0; i < sink_names_.size(); i++)
+        sink_classes_.insert({sink_names_[i], i});
+    table_.assign(index(static_cast<uint32_t>(sink_names_.size()), 0,
+                        -static_cast<int64_t>(width_) + 1,
+                        -static_cast<int64_t>(height_) + 1), UNKNOWN);
+
+    ::vector<uint64_t> dist;
+    auto reverse_dijkstra = [&](const ::vector<uint32_t> &sinks,
+                                uint32_t sink_class) {
+        constexpr auto INF = std::numeric_limits<uint64_t>::max();
+        dist.assign(num_nodes, INF);
+        using Entry = ::pair<uint64_t, uint32_t>;
+        std::priority_queue<Entry, ::vector<Entry>,
+                            std::greater<Entry>> queue;
+        for (auto const sink : sinks) {
+            dist[sink] = 0;
+            queue.push({0, sink});
+        }
+        while (!queue.empty()) {
+            auto const [d, node] = queue.top();
+            queue.pop();
+            if (d > dist[node])
+                continue;
+            for (uint32_t e = in_offsets[node]; e < in_offsets[node + 1];
+                 e++) {
+                auto const next = in_sources[e];
+                if (d + in_costs[e] < dist[next]) {
+                    dist[next] = d + in_costs[e];
+                    queue.push({dist[next], next});
+                }
+            }
+        }
+        auto const &sink = nodes[sinks.front()];
+        for (uint32_t i = 0; i < num_nodes; i++) {
+            if (dist[i] == INF)
+                continue;
+            auto const &node = nodes[i];
+            auto &entry = table_[index(sink_class, node_class(*node),
+                                       static_cast<int64_t>(node->x) - sink->x,
+                                       static_cast<int64_t>(node->y) -
+                                       sink->y)];
+            entry = static_cast<uint32_t>(
+                    std::min<uint64_t>({entry, dist[i], UNKNOWN - 1}));
+        }
+    };
+
+    // representative sinks are the ones closest to the center and to the
+    // corners, so that every offset is covered by at least one of them
+    const ::vector<::pair<uint32_t, uint32_t>> anchors =
+            {{width_ / 2, height_ / 2}, {0, 0}, {width_ - 1, 0},
+             {0, height_ - 1}, {width_ - 1, height_ - 1}};
+    auto closest = [&](const ::vector<::pair<uint32_t, uint32_t>> &positions,
+                       const ::pair<uint32_t, uint32_t> &anchor) {
+        uint64_t result = 0;
+        // ties are broken by position since the order of the nodes is not
+        // stable
+        for (uint64_t i = 1; i < positions.size(); i++) {
+            auto const dist = manhattan_distance(positions[i], anchor);
+            auto const best = manhattan_distance(positions[result], anchor);
+            if (dist < best ||
+                (dist == best && positions[i] < positions[result]))
+                result = i;
+        }
+        return result;
+    };
+
+    ::vector<::pair<uint32_t, uint32_t>> tiles;
+    for (auto const &iter : tile_sbs)
+        tiles.emplace_back(iter.first);
+    ::vector<uint64_t> picked;
+    for (auto const &anchor : anchors)
+        picked.emplace_back(closest(tiles, anchor));
+    std::sort(picked.begin(), picked.end());
+    picked.erase(std::unique(picked.begin(), picked.end()), picked.end());
+    for (auto const i : picked)
+        reverse_dijkstra(tile_sbs.at(tiles[i]), tile_sink_class());
+
+    for (auto const &[name, sinks] : port_sinks) {
+        ::vector<::pair<uint32_t, uint32_t>> positions;
+        for (auto const sink : sinks)
+            positions.emplace_back(nodes[sink]->x, nodes[sink]->y);
+        picked.clear();
+        for (auto const &anchor : anchors)
+            picked.emplace_back(closest(positions, anchor));
+        std::sort(picked.begin(), picked.end());
+        picked.erase(std::unique(picked.begin(), picked.end()), picked.end());
+        for (auto const i : picked)
+            reverse_dijkstra({sinks[i]}, sink_classes_.at(name));
+    }
+}
+
+void RouterLookahead::save(const ::string &filename) const {
+    // write to a temporary file first so that a concurrent reader never
+    // sees a partial table
+    auto const tmp_filename = filename + ".tmp";
+    {
+        std::ofstream out(tmp_filename, std::ios::binary | std::ios::trunc);
+        if (!out)
+            throw ::runtime_error("unable to open " + tmp_filename);
+        out.write(MAGIC, sizeof(MAGIC));
+        write_value(out, VERSION);
+        write_value(out, fingerprint_);
+        write_value(out, width_);
+        write_value(out, height_);
+        write_value(out, static_cast<uint32_t>(sink_names_.size()));
+        for (auto const &name : sink_names_) {
+            write_value(out, static_cast<uint32_t>(name.size()));
+            out.write(name.data(), name.size());
+        }
+        write_value(out, static_cast<uint64_t>(table_.size()));
+        out.write(reinterpret_cast<const char *>(table_.data()),
+                  table_.size() * sizeof(uint32_t));
+    }
+    if (std::rename(tmp_filename.c_str(), filename.c_str()))
+        throw ::runtime_error("unable to write " + filename);
+}
+
+bool RouterLookahead::load(const ::string &filename, uint64_t fingerprint) {
+    std::ifstream in(filename, std::ios::binary);
+    if (!in)
+        return false;
+    char magic[sizeof(MAGIC)] = {};
+    in.read(magic, sizeof(magic));
+    uint32_t version, width, height, num_sinks;
+    uint64_t file_fingerprint;
+    if (!in.good() || std::memcmp(magic, MAGIC, sizeof(MAGIC)) != 0 ||
+        !read_value(in, version) || version > VERSION ||
+        !read_value(in, file_fingerprint) || file_fingerprint != fingerprint ||
+        !read_value(in, width) || !read_value(in, height) ||
+        !read_value(in, num_sinks))
+        return false;
+
+    ::vector<::string> sink_names(num_sinks);
+    for (auto &name : sink_names) {
+        uint32_t size;
+        if (!read_value(in, size))
+            return false;
+        name.resize(size);
+        in.read(&name[0], size);
+    }
+    uint64_t table_size;
+    if (!read_value(in, table_size))
+        return false;
+    ::vector<uint32_t> table(table_size);
+    in.read(reinterpret_cast<char *>(table.data()),
+            table_size * sizeof(uint32_t));
+    if (!in.good())
+        return false;
+
+    width_ = width;
+    height_ = height;
+    fingerprint_ = file_fingerprint;
+    sink_names_ = sink_names;
+    sink_classes_.clear();
+    for (uint32_t i = 0; i < sink_names_.size(); i++)
+        sink_classes_.insert({sink_names_[i], i});
+    table_ = table;
+    if (table_.size() != index(num_sinks, 0, -static_cast<int64_t>(width) + 1,
+                               -static_cast<int64_t>(height) + 1))
+        throw ::runtime_error("corrupted lookahead file " + filename);
+    return true;
+}
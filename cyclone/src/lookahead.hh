@@ -0,0 +1,69 @@
+#ifndef CYCLONE_LOOKAHEAD_HH
+#define CYCLONE_LOOKAHEAD_HH
+
+#include <map>
+#include <memory>
+#include <string>
+#include <vector>
+#include "graph.hh"
+
+// precomputed A* estimate for the router. in a regular array the minimum
+// cost to reach a sink only depends on the kind of the node and its offset
+// to the sink, so it is measured once with a reverse Dijkstra from a few
+// representative sinks and stored per (sink class, node class, dx, dy)
+class RouterLookahead {
+public:
+    RouterLookahead() = default;
+
+    // nodes and edges are in the compressed sparse row format used by the
+    // router
+    void build(const std::vector<std::shared_ptr<Node>> &nodes,
+               const std::vector<uint32_t> &edge_offsets,
+               const std::vector<uint32_t> &edge_targets,
+               const std::vector<uint32_t> &edge_costs);
+
+    // returns false if the file doesn't exist or has been built for a
+    // different graph
+    bool load(const std::string &filename, uint64_t fingerprint);
+    void save(const std::string &filename) const;
+
+    static uint64_t
+    compute_fingerprint(const std::vector<std::shared_ptr<Node>> &nodes,
+                        const std::vector<uint32_t> &edge_offsets,
+                        const std::vector<uint32_t> &edge_targets,
+                        const std::vector<uint32_t> &edge_costs);
+
+    // switch boxes are classified by side and io
+    static uint32_t node_class(const Node &node);
+    // sinks are classified by their port name. routing to any switch box in
+    // a tile, which is how register sinks are routed, has its own class
+    uint32_t sink_class(const Node &node) const;
+    uint32_t tile_sink_class() const;
+
+    // minimum cost from a node to a sink, or UNKNOWN if the offset is not
+    // covered by the table
+    uint32_t get(uint32_t sink_class, uint32_t node_class,
+                 uint32_t x, uint32_t y, uint32_t sink_x,
+                 uint32_t sink_y) const;
+
+    uint64_t fingerprint() const { return fingerprint_; }
+
+    static constexpr uint32_t UNKNOWN = 0xFFFFFFFF;
+    static constexpr uint32_t NUM_NODE_CLASSES = 11;
+    static constexpr char TILE_SINK[] = "SB";
+    static constexpr char MAGIC[] = "CGRALKA";
+    static constexpr uint32_t VERSION = 1;
+
+private:
+    uint32_t width_ = 0;
+    uint32_t height_ = 0;
+    uint64_t fingerprint_ = 0;
+    std::vector<std::string> sink_names_;
+    std::map<std::string, uint32_t> sink_classes_;
+    std::vector<uint32_t> table_;
+
+    uint64_t index(uint32_t sink_class, uint32_t node_class, int64_t dx,
+                   int64_t dy) const;
+};
+
+#endif //CYCLONE_LOOKAHEAD_HH
@@ -21,33 +21,45 @@ using std::unordered_set;
 
 
 Router::Router(const RoutingGraph &g) : graph_(g) {
-    // create the look up table for cost analysis
+    // number the nodes and create the look up table for cost analysis
     for (const auto &tile_iter : graph_) {
         const auto &tile = tile_iter.second;
         for (uint32_t side = 0; side < Switch::SIDES; side++) {
             auto &side_sbs = tile.switchbox.get_sbs_by_side(get_side_int(side));
-            for (const auto &sb : side_sbs) {
-                node_connections_.insert({sb, {}});
-                node_history_.insert({sb, {}});
-                node_net_ids_.insert({sb, {}});
-            }
-        }
-        for (auto const &port : tile.ports) {
-            node_connections_.insert({port.second, {}});
-            node_history_.insert({port.second, {}});
-            node_net_ids_.insert({port.second, {}});
-        }
-        for (auto const &reg : tile.registers) {
-            node_connections_.insert({reg.second, {}});
-            node_history_.insert({reg.second, {}});
-            node_net_ids_.insert({reg.second, {}});
+            for (const auto &sb : side_sbs)
+                nodes_.emplace_back(sb);
         }
-        for (auto const &reg_mux: tile.rmux_nodes) {
-            node_connections_.insert({reg_mux.second, {}});
-            node_history_.insert({reg_mux.second, {}});
-            node_net_ids_.insert({reg_mux.second, {}});
+        for (auto const &port : tile.ports)
+            nodes_.emplace_back(port.second);
+        for (auto const &reg : tile.registers)
+            nodes_.emplace_back(reg.second);
+        for (auto const &reg_mux: tile.rmux_nodes)
+            nodes_.emplace_back(reg_mux.second);
+    }
+    node_ids_.reserve(nodes_.size());
+    for (uint32_t i = 0; i < nodes_.size(); i++)
+        node_ids_.insert({nodes_[i].get(), i});
+
+    // neighbors are ordered by address in memory, which differs from run to
+    // run. the routing result depends on the order, so sort them by id
+    edge_offsets_.reserve(nodes_.size() + 1);
+    edge_offsets_.emplace_back(0);
+    ::vector<uint32_t> node_targets;
+    for (auto const &node : nodes_) {
+        node_targets.clear();
+        for (auto const &n : *node)
+            node_targets.emplace_back(get_node_id(n.lock()));
+        std::sort(node_targets.begin(), node_targets.end());
+        for (auto const target : node_targets) {
+            edge_targets_.emplace_back(target);
+            edge_costs_.emplace_back(node->get_edge_cost(nodes_[target]));
         }
+        edge_offsets_.emplace_back(static_cast<uint32_t>(edge_targets_.size()));
     }
+
+    node_connections_.resize(nodes_.size());
+    node_net_ids_.resize(nodes_.size());
+    node_history_.resize(nodes_.size(), 0);
 }
 
 void
@@ -94,77 +106,168 @@ void Router::add_placement(const uint32_t &x, const uint32_t &y,
     placement_.insert({blk_id, {x, y}});
 }
 
-std::vector<std::shared_ptr<Node>>
-Router::route_a_star(const std::shared_ptr<Node> &start,
-                     const std::shared_ptr<Node> &end) {
-    return route_a_star(start, end, zero_cost);
+uint32_t Router::get_node_id(const std::shared_ptr<Node> &node) const {
+    auto const iter = node_ids_.find(node.get());
+    if (iter == node_ids_.end())
+        throw ::runtime_error("node is not in the routing graph");
+    return iter->second;
+}
+
+Router::EstimateFunction Router::manhattan_estimate(uint32_t end) const {
+    auto const &end_node = nodes_[end];
+    return manhattan_estimate({end_node->x, end_node->y});
+}
+
+Router::EstimateFunction
+Router::manhattan_estimate(const std::pair<uint32_t, uint32_t> &end) const {
+    return [this, end](uint32_t node) -> double {
+        return manhattan_distance(nodes_[node], end);
+    };
+}
+
+Router::EstimateFunction Router::get_estimate(uint32_t end) const {
+    auto const &end_node = nodes_[end];
+    if (lookahead_) {
+        auto const sink_class = lookahead_->sink_class(*end_node);
+        if (sink_class != RouterLookahead::UNKNOWN)
+            return lookahead_estimate(sink_class, {end_node->x, end_node->y});
+    }
+    return manhattan_estimate(end);
+}
+
+Router::EstimateFunction
+Router::get_estimate(const std::pair<uint32_t, uint32_t> &end) const {
+    if (lookahead_) {
+        auto const sink_class = lookahead_->tile_sink_class();
+        if (sink_class != RouterLookahead::UNKNOWN)
+            return lookahead_estimate(sink_class, end);
+    }
+    return manhattan_estimate(end);
 }
 
-std::vector<std::shared_ptr<Node>>
-Router::route_a_star(const std::shared_ptr<Node> &start,
-                     const std::shared_ptr<Node> &end,
-                     ::function<double(const ::shared_ptr<Node> &,
-                                         const ::shared_ptr<Node> &)> cost_f) {
-    auto end_f = [&](const ::shared_ptr<Node> &node) -> bool {
-        return node == end;
+Router::EstimateFunction
+Router::lookahead_estimate(uint32_t sink_class,
+                           const std::pair<uint32_t, uint32_t> &end) const {
+    return [this, sink_class, end](uint32_t node) -> double {
+        auto const &n = nodes_[node];
+        auto const cost = lookahead_->get(sink_class, node_classes_[node],
+                                          n->x, n->y, end.first, end.second);
+        // offsets not seen from any representative sink
+        if (cost == RouterLookahead::UNKNOWN)
+            return manhattan_distance(n, end);
+        return cost;
     };
-    return route_a_star(start, end_f, ::move(cost_f), manhattan_distance(end));
 }
 
-std::vector<std::shared_ptr<Node>>
-Router::route_a_star(const std::shared_ptr<Node> &start,
-                     const std::pair<uint32_t, uint32_t> &end,
-                     ::function<double(const ::shared_ptr<Node> &,
-                                         const ::shared_ptr<Node> &)> cost_f) {
-    return route_a_star(start, end, ::move(cost_f), manhattan_distance(end));
+void Router::set_lookahead(const std::string &filename) {
+    auto lookahead = std::make_shared<RouterLookahead>();
+    auto const fingerprint =
+            RouterLookahead::compute_fingerprint(nodes_, edge_offsets_,
+                                                 edge_targets_, edge_costs_);
+    if (filename.empty() || !lookahead->load(filename, fingerprint)) {
+        lookahead->build(nodes_, edge_offsets_, edge_targets_, edge_costs_);
+        if (!filename.empty())
+            lookahead->save(filename);
+    }
+    node_classes_.resize(nodes_.size());
+    for (uint32_t i = 0; i < nodes_.size(); i++)
+        node_classes_[i] = RouterLookahead::node_class(*nodes_[i]);
+    lookahead_ = lookahead;
 }
 
-std::vector<std::shared_ptr<Node>>
-Router::route_a_star(const std::shared_ptr<Node> &start,
-                     const std::pair<uint32_t, uint32_t> &end,
-                     ::function<double(const ::shared_ptr<Node> &,
-                                         const ::shared_ptr<Node> &)> cost_f,
-                     ::function<double(const ::shared_ptr<Node> &)> h_f) {
-    return route_a_star(start, same_loc(end), ::move(cost_f), ::move(h_f));
+void Router::clear_lookahead() {
+    lookahead_ = nullptr;
+    node_classes_.clear();
 }
 
-std::vector<std::shared_ptr<Node>>
-Router::route_a_star(const std::shared_ptr<Node> &start,
-                     const std::shared_ptr<Node> &end,
-                     ::function<double(const ::shared_ptr<Node> &,
-                                         const ::shared_ptr<Node> &)> cost_f,
-                     ::function<double(const ::shared_ptr<Node>&)> h_f) {
-    return route_a_star(start, same_node(end), ::move(cost_f), ::move(h_f));
+std::vector<uint32_t> Router::route_a_star(uint32_t start, uint32_t end) {
+    return route_a_star(start, end,
+                        [](uint32_t, uint32_t, uint32_t) { return 0.0; });
 }
 
+std::vector<uint32_t> Router::route_a_star(uint32_t start, uint32_t end,
+                                           CostFunction cost_f) {
+    return route_a_star(start, end, ::move(cost_f), get_estimate(end));
+}
 
-std::vector<std::shared_ptr<Node>> Router::route_a_star(
-        const std::shared_ptr<Node> &start,
-        std::function<bool(const std::shared_ptr<Node> &)> end_f,
-        std::function<double(const std::shared_ptr<Node> &,
-                               const std::shared_ptr<Node> &)> cost_f,
-        std::function<double(const ::shared_ptr<Node> &)> h_f) {
-    ::unordered_set<::shared_ptr<Node>> visited;
-    ::unordered_map<::shared_ptr<Node>, double> g_score = {{start, 0}};
+std::vector<uint32_t>
+Router::route_a_star(uint32_t start, const std::pair<uint32_t, uint32_t> &end,
+                     CostFunction cost_f) {
+    return route_a_star(start, end, ::move(cost_f), get_estimate(end));
+}
 
-    ::unordered_map<::shared_ptr<Node>, double> f_score = {{start,
-                                                            h_f(start)}};
-    // use cost as a comparator
-    auto cost_comp = [&](const ::shared_ptr<Node> &a,
-                         const ::shared_ptr<Node> &b) -> bool {
-        return f_score.at(a) > f_score.at(b);
+std::vector<uint32_t>
+Router::route_a_star(uint32_t start, const std::pair<uint32_t, uint32_t> &end,
+                     CostFunction cost_f, EstimateFunction h_f) {
+    auto end_f = [this, end](uint32_t node) -> bool {
+        return nodes_[node]->x == end.first && nodes_[node]->y == end.second;
     };
+    return route_a_star(start, end_f, ::move(cost_f), ::move(h_f));
+}
 
-    ::priority_queue<::shared_ptr<Node>,
-            ::vector<::shared_ptr<Node>>,
-            decltype(cost_comp)> working_set(cost_comp);
-    working_set.push(start);
-    ::unordered_set<::shared_ptr<Node>> open_set;
-    open_set.insert(start);
+std::vector<uint32_t> Router::route_a_star(uint32_t start, uint32_t end,
+                                           CostFunction cost_f,
+                                           EstimateFunction h_f) {
+    auto end_f = [end](uint32_t node) -> bool { return node == end; };
+    return route_a_star(start, end_f, ::move(cost_f), ::move(h_f));
+}
+
+thread_local uint32_t Router::current_worker_ = 0;
+
+bool Router::Region::bounded() const {
+    return x_min != 0 || y_min != 0 ||
+           x_max != std::numeric_limits<uint32_t>::max() ||
+           y_max != std::numeric_limits<uint32_t>::max();
+}
+
+void Router::set_num_workers(uint32_t num_workers) {
+    if (num_workers == 0)
+        throw ::runtime_error("at least one worker is required");
+    search_spaces_.resize(num_workers);
+}
 
-    ::map<::shared_ptr<Node>, ::shared_ptr<Node>> trace;
+void Router::set_search_region(const Region &region) {
+    search_spaces_.at(current_worker_).region = region;
+}
+
+void Router::SearchSpace::new_search(uint64_t num_nodes) {
+    if (seen.size() != num_nodes) {
+        g_score.resize(num_nodes);
+        f_score.resize(num_nodes);
+        trace.resize(num_nodes);
+        seen.assign(num_nodes, 0);
+        closed.assign(num_nodes, 0);
+        id = 0;
+    }
+    if (++id == 0) {
+        // the stamps wrapped around
+        std::fill(seen.begin(), seen.end(), 0);
+        std::fill(closed.begin(), closed.end(), 0);
+        id = 1;
+    }
+}
 
-    ::shared_ptr<Node> head = nullptr;
+std::vector<uint32_t> Router::route_a_star(uint32_t start, EndFunction end_f,
+                                           CostFunction cost_f,
+                                           EstimateFunction h_f) {
+    auto &s = search_spaces_.at(current_worker_);
+    s.new_search(nodes_.size());
+    auto const search_id = s.id;
+    auto const bounded = s.region.bounded();
+    uint64_t num_expansions = 0;
+    s.g_score[start] = 0;
+    s.f_score[start] = h_f(start);
+    s.seen[start] = search_id;
+
+    // use cost as a comparator
+    auto cost_comp = [&](uint32_t a, uint32_t b) -> bool {
+        return s.f_score[a] > s.f_score[b];
+    };
+    ::priority_queue<uint32_t, ::vector<uint32_t>, decltype(cost_comp)>
+    working_set(cost_comp);
+    working_set.push(start);
+
+    uint32_t head = start;
 
     while (!working_set.empty()) {
 
@@ -174,52 +277,53 @@ std::vector<std::shared_ptr<Node>> Router::route_a_star(
             break;
 
         working_set.pop();
-        open_set.erase(head);
 
-        if (visited.find(head) != visited.end())
+        if (s.closed[head] == search_id)
             continue;
 
-        visited.insert(head);
+        s.closed[head] = search_id;
+        num_expansions++;
 
-        for (auto const &node : *head) {
-            if (visited.find(node.lock()) != visited.end())
+        for (uint32_t e = edge_offsets_[head]; e < edge_offsets_[head + 1];
+             e++) {
+            auto const node = edge_targets_[e];
+            if (s.closed[node] == search_id)
+                continue;
+            if (bounded && !s.region.contains(nodes_[node]->x, nodes_[node]->y))
                 continue;
 
-            double tentative_score = g_score.at(head)
-                                     + head->get_edge_cost(node.lock())
-                                     + cost_f(head, node.lock());
-            if (open_set.find(node.lock()) == open_set.end()) {
-                g_score[node.lock()] = tentative_score;
-                f_score[node.lock()] = g_score.at(node.lock())
-                                       + h_f(node.lock());
-                working_set.push(node.lock());
-                open_set.insert(node.lock());
-            } else if (g_score.find(node.lock()) != g_score.end() &&
-                       tentative_score >= g_score.at(node.lock())) {
+            double tentative_score = s.g_score[head] + edge_costs_[e]
+                                     + cost_f(head, node, edge_costs_[e]);
+            if (s.seen[node] != search_id) {
+                s.seen[node] = search_id;
+                s.g_score[node] = tentative_score;
+                s.f_score[node] = tentative_score + h_f(node);
+                working_set.push(node);
+                // the trace is only set when the node is discovered
+                s.trace[node] = head;
+            } else if (tentative_score >= s.g_score[node]) {
                 continue;
             } else {
-                g_score[node.lock()] = tentative_score;
-                f_score[node.lock()] = g_score.at(node.lock())
-                                       + h_f(node.lock());
+                s.g_score[node] = tentative_score;
+                s.f_score[node] = tentative_score + h_f(node);
                 // a duplicated copy
-                working_set.push(node.lock());
+                working_set.push(node);
             }
-
-            trace.insert({node.lock(), head});
         }
 
     }
+    num_expansions_ += num_expansions;
 
     if (!end_f(head))
         throw UnableRouteException("unable to route from "
-                                   + start->to_string());
+                                   + nodes_[start]->to_string());
 
-    ::vector<::shared_ptr<Node>> routed_path;
+    ::vector<uint32_t> routed_path;
     // back trace the route
     // head is the end
     while (head != start) {
         routed_path.emplace_back(head);
-        head = trace.at(head);
+        head = s.trace[head];
     }
     routed_path.emplace_back(head);
 
@@ -343,26 +447,24 @@ bool Router::overflow() {
     return overflowed_;
 }
 
-void Router::assign_net_segment(const ::vector<::shared_ptr<Node>> &segment,
+void Router::assign_net_segment(const ::vector<uint32_t> &segment,
                                 int net_id) {
     for (uint32_t i = 1; i < segment.size(); i++) {
-        auto &node = segment[i];
-        assign_connection(node, segment[i - 1]);
+        assign_connection(segment[i], segment[i - 1]);
     }
     for (const auto &node : segment) {
-        node_net_ids_[node].insert(net_id);
+        auto &net_ids = node_net_ids_[node];
+        if (std::find(net_ids.begin(), net_ids.end(), net_id) == net_ids.end())
+            net_ids.emplace_back(net_id);
     }
 }
 
 void Router::assign_history() {
     for (const auto &net : netlist_) {
-        auto segments = current_routes[net.id];
-        for (auto &seg_it : segments) {
-            auto &segment = seg_it.second;
-            for (uint32_t i = 0; i < segment.size(); i++) {
-                auto &node = segment[i];
+        auto const &segments = current_routes[net.id];
+        for (auto const &seg_it : segments) {
+            for (auto const node : seg_it.second)
                 assign_history(node);
-            }
         }
     }
 }
@@ -378,7 +480,11 @@ Router::realize() const {
         // realize them in the pin order
         for (uint32_t seg_index = 1; seg_index< net.size(); seg_index++) {
             auto const &seg = route.at(net[seg_index].id);
-            segments.emplace_back(seg);
+            ::vector<shared_ptr<Node>> segment;
+            segment.reserve(seg.size());
+            for (auto const node : seg)
+                segment.emplace_back(nodes_[node]);
+            segments.emplace_back(segment);
         }
         result.insert({name, segments});
     }
@@ -390,57 +496,58 @@ void Router::rip_up_net(int net_id) {
         return;
     auto const &route = current_routes.at(net_id);
     for (const auto &segment : route) {
-        auto nodes = segment.second;
+        auto const &nodes = segment.second;
         // remove it from the presence cost
         for (uint32_t i = 1; i < nodes.size(); i++) {
-            auto const &node = nodes[i];
-            auto const &pre_node = nodes[i - 1];
-            node_connections_.at(node).erase(pre_node);
+            auto &conn = node_connections_[nodes[i]];
+            auto const iter = std::find(conn.begin(), conn.end(),
+                                        nodes[i - 1]);
+            if (iter != conn.end())
+                conn.erase(iter);
         }
         // also remove it from node_net_ids;
         for (const auto &node : nodes) {
-            auto &lst = node_net_ids_.at(node);
-            if (lst.find(net_id) != lst.end())
-                lst.erase(net_id);
+            auto &lst = node_net_ids_[node];
+            auto const iter = std::find(lst.begin(), lst.end(), net_id);
+            if (iter != lst.end())
+                lst.erase(iter);
         }
     }
-    // remove it from current_routes
-    current_routes.erase(net_id);
+    // clear it in current_routes. the entry itself is kept so that nets can
+    // be ripped up concurrently
+    current_routes[net_id].clear();
 }
 
 
-bool Router::node_owned_net(int net_id, std::shared_ptr<Node> node) {
-    if (node_net_ids_.at(node).empty()) {
+bool Router::node_owned_net(int net_id, uint32_t node) const {
+    auto const &net_ids = node_net_ids_[node];
+    if (net_ids.empty()) {
         return true;
     }
-    if (node_net_ids_.at(node).size() == 1) {
-        return net_id == *node_net_ids_.at(node).begin();
+    if (net_ids.size() == 1) {
+        return net_id == net_ids.front();
     }
     return false;
 }
 
-void Router::assign_connection(const std::shared_ptr<Node> &node,
-                               const std::shared_ptr<Node> &pre_node) {
-    node_connections_.at(node).insert(pre_node);
-    if (!overflowed_ && node_connections_[node].size() > 1)
+void Router::assign_connection(uint32_t node, uint32_t pre_node) {
+    auto &conn = node_connections_[node];
+    if (std::find(conn.begin(), conn.end(), pre_node) == conn.end())
+        conn.emplace_back(pre_node);
+    if (!overflowed_ && conn.size() > 1)
         overflowed_ = true;
 
 }
 
-void Router::assign_history(std::shared_ptr<Node> &end) {
-    node_history_.at(end)++;
+void Router::assign_history(uint32_t node) {
+    node_history_[node]++;
 }
 
-uint32_t Router::get_history_cost(const std::shared_ptr<Node> &node) {
-    uint32_t result = node_history_.at(node);
-    return result;
-}
-
-double Router::get_presence_cost(const std::shared_ptr<Node> &node,
-                                 const std::shared_ptr<Node> &pre_node) {
-    auto const &start_connection = node_connections_.at(node);
-    if (start_connection.find(pre_node) == start_connection.end())
+double Router::get_presence_cost(uint32_t node, uint32_t pre_node) const {
+    auto const &start_connection = node_connections_[node];
+    if (std::find(start_connection.begin(), start_connection.end(),
+                  pre_node) == start_connection.end())
         return start_connection.size();
     else
         return (start_connection.size() - 1);
-}
\ No newline at end of file
+}
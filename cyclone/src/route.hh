@@ -1,10 +1,13 @@
 #ifndef CYCLONE_ROUTE_HH
 #define CYCLONE_ROUTE_HH
 
+#include <atomic>
 #include <functional>
+#include <limits>
 #include <map>
 #include <unordered_map>
 #include "graph.hh"
+#include "lookahead.hh"
 #include "net.hh"
 
 // base class for global and detailed routers
@@ -24,8 +27,7 @@ public:
     // routing related function
     virtual void route() { };
     // assign nets
-    void assign_net_segment(const std::vector<std::shared_ptr<Node>> &segment,
-                            int net_id);
+    void assign_net_segment(const std::vector<uint32_t> &segment, int net_id);
     void assign_history();
     std::map<std::string, std::vector<std::vector<std::shared_ptr<Node>>>>
     realize() const;
@@ -36,6 +38,17 @@ public:
     double get_pn_factor() const  { return pn_factor_; }
     void set_pn_factor(double pn_factor) { pn_factor_ = pn_factor; }
     const std::vector<Net>& get_netlist() const { return netlist_; }
+    uint64_t num_nodes() const { return nodes_.size(); }
+
+    // use a precomputed lookahead as the A* estimate instead of the
+    // manhattan distance. the table is loaded from filename if it has been
+    // built for the same graph, otherwise it is built and saved there. an
+    // empty filename builds it without caching
+    void set_lookahead(const std::string &filename);
+    void clear_lookahead();
+    bool has_lookahead() const { return lookahead_ != nullptr; }
+    // number of nodes expanded by A* so far
+    uint64_t get_num_expansions() const { return num_expansions_; }
 
 
 protected:
@@ -44,19 +57,28 @@ protected:
     std::map<std::string, std::pair<uint32_t, uint32_t>> placement_;
     std::map<int, std::vector<int>> reg_net_order_;
     std::map<std::string, int> reg_net_src_;
-    // a list of routing segments indexed by net id
-    std::map<int,
-            std::map<uint32_t,
-                    std::vector<std::shared_ptr<Node>>>> current_routes;
-
-    // graph independent look tables for computing routing cost
-    std::map<std::shared_ptr<Node>, std::set<std::shared_ptr<Node>>>
-    node_connections_;
-    std::unordered_map<std::shared_ptr<Node>, std::set<int>> node_net_ids_;
-
-    std::map<std::shared_ptr<Node>, uint32_t> node_history_;
-
-    bool overflowed_ = false;
+    // a list of routing segments indexed by net id. segments are stored as
+    // node ids
+    std::map<int, std::map<uint32_t, std::vector<uint32_t>>> current_routes;
+
+    // every routing node gets a contiguous id when the router is created.
+    // the edges are stored in compressed sparse row format, i.e. the
+    // neighbors of node i are edge_targets_[edge_offsets_[i]:
+    // edge_offsets_[i + 1]], and the look up tables for computing routing
+    // cost are flat vectors indexed by node id
+    std::vector<std::shared_ptr<Node>> nodes_;
+    std::unordered_map<const Node *, uint32_t> node_ids_;
+    std::vector<uint32_t> edge_offsets_;
+    std::vector<uint32_t> edge_targets_;
+    std::vector<uint32_t> edge_costs_;
+
+    // the nodes each node is driven by in the current routes
+    std::vector<std::vector<uint32_t>> node_connections_;
+    std::vector<std::vector<int>> node_net_ids_;
+    std::vector<uint32_t> node_history_;
+
+    // routes may be assigned from several threads, see set_num_workers
+    std::atomic<bool> overflowed_ = false;
 
     const static uint32_t IN = 0;
     const static uint32_t OUT = 1;
@@ -66,44 +88,66 @@ protected:
     double init_pn_ = 10000;
     double pn_factor_ = 1.5;
 
-    std::vector<std::shared_ptr<Node>>
-    route_a_star(const std::shared_ptr<Node> &start,
-                 const std::shared_ptr<Node> &end);
-
-    std::vector<std::shared_ptr<Node>>
-    route_a_star(const std::shared_ptr<Node> &start,
-                 const std::shared_ptr<Node> &end,
-                 std::function<double(const std::shared_ptr<Node> &,
-                                      const std::shared_ptr<Node> &)> cost_f);
-
-    std::vector<std::shared_ptr<Node>>
-    route_a_star(const std::shared_ptr<Node> &start,
-                 const std::pair<uint32_t, uint32_t> &end,
-                 std::function<double(const std::shared_ptr<Node> &,
-                                      const std::shared_ptr<Node> &)> cost_f);
-
-    std::vector<std::shared_ptr<Node>>
-    route_a_star(const std::shared_ptr<Node> &start,
-                 const std::pair<uint32_t, uint32_t> &end,
-                 std::function<double(const std::shared_ptr<Node> &,
-                                      const std::shared_ptr<Node> &)> cost_f,
-                 std::function<double(const std::shared_ptr<Node> &)> h_f);
-
-    std::vector<std::shared_ptr<Node>>
-    route_a_star(const std::shared_ptr<Node> &start,
-                 const std::shared_ptr<Node> &end,
-                 std::function<double(const std::shared_ptr<Node> &,
-                                      const std::shared_ptr<Node> &)> cost_f,
-                 std::function<double(const std::shared_ptr<Node> &)> h_f);
+    // cost of going from the first node to the second one, given the edge
+    // cost between them
+    using CostFunction = std::function<double(uint32_t, uint32_t, uint32_t)>;
+    using EndFunction = std::function<bool(uint32_t)>;
+    using EstimateFunction = std::function<double(uint32_t)>;
+
+    uint32_t get_node_id(const std::shared_ptr<Node> &node) const;
+    const std::shared_ptr<Node> &get_node(uint32_t id) const
+    { return nodes_[id]; }
+
+    EstimateFunction manhattan_estimate(uint32_t end) const;
+    EstimateFunction
+    manhattan_estimate(const std::pair<uint32_t, uint32_t> &end) const;
+    // lookahead estimate if there is one, manhattan distance otherwise
+    EstimateFunction get_estimate(uint32_t end) const;
+    EstimateFunction
+    get_estimate(const std::pair<uint32_t, uint32_t> &end) const;
+
+    std::vector<uint32_t> route_a_star(uint32_t start, uint32_t end);
+
+    std::vector<uint32_t> route_a_star(uint32_t start, uint32_t end,
+                                       CostFunction cost_f);
+
+    std::vector<uint32_t>
+    route_a_star(uint32_t start, const std::pair<uint32_t, uint32_t> &end,
+                 CostFunction cost_f);
+
+    std::vector<uint32_t>
+    route_a_star(uint32_t start, const std::pair<uint32_t, uint32_t> &end,
+                 CostFunction cost_f, EstimateFunction h_f);
+
+    std::vector<uint32_t> route_a_star(uint32_t start, uint32_t end,
+                                       CostFunction cost_f,
+                                       EstimateFunction h_f);
 
     // this is the actual routing engine shared by Dijkstra and A*
     // it's designed to be flexible
-    std::vector<std::shared_ptr<Node>>
-    route_a_star(const std::shared_ptr<Node> &start,
-                 std::function<bool(const std::shared_ptr<Node> &)> end_f,
-                 std::function<double(const std::shared_ptr<Node> &,
-                                      const std::shared_ptr<Node> &)> cost_f,
-                 std::function<double(const std::shared_ptr<Node> &)> h_f);
+    std::vector<uint32_t> route_a_star(uint32_t start, EndFunction end_f,
+                                       CostFunction cost_f,
+                                       EstimateFunction h_f);
+
+    // tiles a search is allowed to visit. nothing outside of it is read or
+    // written while routing a net in the region
+    struct Region {
+        uint32_t x_min = 0;
+        uint32_t y_min = 0;
+        uint32_t x_max = std::numeric_limits<uint32_t>::max();
+        uint32_t y_max = std::numeric_limits<uint32_t>::max();
+
+        bool contains(uint32_t x, uint32_t y) const
+        { return x >= x_min && x <= x_max && y >= y_min && y <= y_max; }
+        bool bounded() const;
+    };
+
+    // nets in disjoint regions can be routed concurrently. every worker
+    // thread has its own A* scratch space and search region, and has to call
+    // set_worker before routing
+    void set_num_workers(uint32_t num_workers);
+    void set_worker(uint32_t worker) const { current_worker_ = worker; }
+    void set_search_region(const Region &region);
 
     std::shared_ptr<Node> get_port(const uint32_t &x,
                                    const uint32_t &y,
@@ -115,20 +159,45 @@ protected:
     std::vector<uint32_t> reorder_reg_nets();
 
 
-    void assign_connection(const std::shared_ptr<Node> &node,
-                           const std::shared_ptr<Node> &pre_node);
-    void assign_history(std::shared_ptr<Node> &node);
+    void assign_connection(uint32_t node, uint32_t pre_node);
+    void assign_history(uint32_t node);
 
-    uint32_t get_history_cost(const std::shared_ptr<Node> &node);
+    uint32_t get_history_cost(uint32_t node) const
+    { return node_history_[node]; }
 
-    double get_presence_cost(const std::shared_ptr<Node> &node,
-                             const std::shared_ptr<Node> &pre_node);
+    double get_presence_cost(uint32_t node, uint32_t pre_node) const;
 
     void rip_up_net(int net_id);
-    bool node_owned_net(int net_id, std::shared_ptr<Node> node);
+    bool node_owned_net(int net_id, uint32_t node) const;
 
 private:
     std::vector<int> squash_net(int src_id);
+
+    // scratch space of route_a_star. entries only belong to the search that
+    // stamped them, so nothing has to be cleared between searches
+    struct SearchSpace {
+        std::vector<double> g_score;
+        std::vector<double> f_score;
+        std::vector<uint32_t> trace;
+        std::vector<uint32_t> seen;
+        std::vector<uint32_t> closed;
+        uint32_t id = 0;
+        Region region;
+
+        void new_search(uint64_t num_nodes);
+    };
+    // one per worker
+    std::vector<SearchSpace> search_spaces_ = std::vector<SearchSpace>(1);
+    static thread_local uint32_t current_worker_;
+    std::atomic<uint64_t> num_expansions_ = 0;
+
+    std::shared_ptr<const RouterLookahead> lookahead_;
+    // lookahead node class indexed by node id
+    std::vector<uint32_t> node_classes_;
+
+    EstimateFunction lookahead_estimate(uint32_t sink_class,
+                                        const std::pair<uint32_t,
+                                                        uint32_t> &end) const;
 };
 
 class UnableRouteException : public std::runtime_error {
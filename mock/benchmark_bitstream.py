@@ -0,0 +1,69 @@
+"""
+Benchmark for generate_bitstream with different numbers of routing processes,
+e.g.
+    $python benchmark_bitstream.py cgra_info.txt harris.json -j 1 2 4
+The packed, placement and routing files are expected next to each netlist,
+the same way the PnR flow leaves them. Every number of processes has to write
+the same bitstream.
+"""
+from __future__ import print_function
+import filecmp
+import os
+import shutil
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from arch import load_packed_file, ArchModel  # noqa
+from arch.cgra import generate_bitstream  # noqa
+
+
+def main():
+    parser = ArgumentParser("bitstream generation benchmark")
+    parser.add_argument("cgra_filename", help="CGRA architecture file")
+    parser.add_argument("netlist_filenames", help="Mapped netlist files",
+                        nargs="+")
+    parser.add_argument("-j", "--jobs", help="Numbers of processes to " +
+                        "compare", default=[1, 2, 4], type=int, nargs="+",
+                        action="store", dest="jobs")
+    args = parser.parse_args()
+
+    print("{0:>16}{1:>8}{2:>8}{3:>12}{4:>10}".format(
+        "design", "nets", "jobs", "time (s)", "speedup"))
+    # so that parsing the architecture isn't timed
+    ArchModel(args.cgra_filename).tile_mapping
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        for netlist_filename in args.netlist_filenames:
+            design = os.path.splitext(netlist_filename)[0]
+            packed_filename = design + ".packed"
+            num_nets = len(load_packed_file(packed_filename)[0])
+            baseline = None
+            baseline_filename = None
+            for jobs in args.jobs:
+                output_filename = os.path.join(tmp_dir,
+                                               "{0}.bsb".format(jobs))
+                start = time.time()
+                generate_bitstream(args.cgra_filename, netlist_filename,
+                                   packed_filename, design + ".place",
+                                   design + ".route", output_filename,
+                                   output_filename + ".json", jobs)
+                duration = time.time() - start
+                if baseline is None:
+                    baseline = duration
+                    baseline_filename = output_filename
+                elif not filecmp.cmp(baseline_filename, output_filename,
+                                     shallow=False):
+                    raise Exception("Bitstreams differ with " + str(jobs) +
+                                    " jobs")
+                print("{0:>16}{1:>8}{2:>8}{3:>12.3f}{4:>9.1f}x".format(
+                    os.path.basename(design), num_nets, jobs, duration,
+                    baseline / max(duration, 1e-6)))
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
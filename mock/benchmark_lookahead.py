@@ -0,0 +1,81 @@
+"""
+Benchmark for the router A* lookahead. Every bus width is routed with the
+manhattan distance estimate and with the lookahead, e.g.
+    $python benchmark_lookahead.py harris.packed harris.place cgra_info_graph
+The lookahead is built from scratch first and then loaded from the cache next
+to the routing graph.
+"""
+from __future__ import print_function
+import os
+import sys
+import time
+from argparse import ArgumentParser
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pycyclone import GlobalRouter  # noqa
+from pycyclone.io import load_routing_graph, setup_router_input  # noqa
+from process_graph import get_graph_filename, get_lookahead_filename  # noqa
+
+
+def route(packed_filename, placement_filename, graph_filename, bus_width,
+          lookahead_filename):
+    """returns the lookahead setup time, routing time, number of A*
+    expansions and the total route length"""
+    g = load_routing_graph(graph_filename)
+    r = GlobalRouter(40, g)
+    setup_router_input(r, packed_filename, placement_filename, bus_width)
+    r.set_init_pn(10000)
+
+    start = time.time()
+    if lookahead_filename is not None:
+        r.set_lookahead(lookahead_filename)
+    setup_time = time.time() - start
+
+    start = time.time()
+    r.route()
+    route_time = time.time() - start
+
+    length = 0
+    for segments in r.realize().values():
+        for segment in segments:
+            length += len(segment)
+    return setup_time, route_time, r.get_num_expansions(), length
+
+
+def main():
+    parser = ArgumentParser("router lookahead benchmark")
+    parser.add_argument("packed_filename", help="Packed netlist file")
+    parser.add_argument("placement_filename", help="Placement file")
+    parser.add_argument("graph_dirname", help="Routing graph folder")
+    parser.add_argument("-w", "--width", help="Bus widths to route",
+                        default=[1, 16], type=int, nargs="+", action="store",
+                        dest="bus_widths")
+    args = parser.parse_args()
+
+    print("{0:>6}{1:>12}{2:>12}{3:>12}{4:>14}{5:>10}".format(
+        "width", "estimate", "setup (s)", "route (s)", "expansions",
+        "length"))
+    for bus_width in args.bus_widths:
+        graph_filename = os.path.join(args.graph_dirname,
+                                      get_graph_filename(bus_width))
+        lookahead_filename = get_lookahead_filename(graph_filename)
+        if os.path.isfile(lookahead_filename):
+            os.remove(lookahead_filename)
+        runs = [("manhattan", None), ("build", lookahead_filename),
+                ("cached", lookahead_filename)]
+        baseline = None
+        for name, filename in runs:
+            setup_time, route_time, expansions, length = \
+                route(args.packed_filename, args.placement_filename,
+                      graph_filename, bus_width, filename)
+            print("{0:>6}{1:>12}{2:>12.3f}{3:>12.3f}{4:>14}{5:>10}".format(
+                bus_width, name, setup_time, route_time, expansions, length))
+            if baseline is None:
+                baseline = route_time, expansions
+        print("{0:>6}{1:>12}{2:>12}{3:>11.1f}x{4:>13.1f}x".format(
+            bus_width, "speedup", "", baseline[0] / max(route_time, 1e-6),
+            baseline[1] / float(max(expansions, 1))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark for routing the nets of a bus width on several threads, e.g.
+    $python benchmark_parallel_route.py harris.packed harris.place \
+        cgra_info_graph -t 1 2 4 8
+Nets are routed in batches whose regions don't overlap, so every thread count
+above one has to produce the same routes, which is checked as well.
+"""
+from __future__ import print_function
+import os
+import sys
+import time
+from argparse import ArgumentParser
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pycyclone import GlobalRouter  # noqa
+from pycyclone.io import load_routing_graph, setup_router_input  # noqa
+from process_graph import get_graph_filename, get_lookahead_filename  # noqa
+
+
+def route(packed_filename, placement_filename, g, graph_filename, bus_width,
+          num_threads, lookahead):
+    """returns the routing time, number of A* expansions and the routes"""
+    r = GlobalRouter(40, g)
+    setup_router_input(r, packed_filename, placement_filename, bus_width)
+    r.set_init_pn(10000)
+    r.set_num_threads(num_threads)
+    if lookahead:
+        r.set_lookahead(get_lookahead_filename(graph_filename))
+
+    start = time.time()
+    r.route()
+    route_time = time.time() - start
+
+    routes = {}
+    for name, segments in r.realize().items():
+        routes[name] = [[str(node) for node in segment]
+                        for segment in segments]
+    return route_time, r.get_num_expansions(), routes
+
+
+def main():
+    parser = ArgumentParser("parallel routing benchmark")
+    parser.add_argument("packed_filename", help="Packed netlist file")
+    parser.add_argument("placement_filename", help="Placement file")
+    parser.add_argument("graph_dirname", help="Routing graph folder")
+    parser.add_argument("-w", "--width", help="Bus widths to route",
+                        default=[1, 16], type=int, nargs="+", action="store",
+                        dest="bus_widths")
+    parser.add_argument("-t", "--threads", help="Thread counts to compare",
+                        default=[1, 2, 4], type=int, nargs="+",
+                        action="store", dest="thread_counts")
+    parser.add_argument("-l", "--lookahead", help="Use the router lookahead",
+                        action="store_true", default=False, dest="lookahead")
+    args = parser.parse_args()
+
+    print("{0:>6}{1:>10}{2:>12}{3:>14}{4:>10}".format(
+        "width", "threads", "route (s)", "expansions", "speedup"))
+    for bus_width in args.bus_widths:
+        graph_filename = os.path.join(args.graph_dirname,
+                                      get_graph_filename(bus_width))
+        # the neighbor order of a freshly loaded graph, and with it the
+        # routes, can differ between loads. every router shares this one
+        g = load_routing_graph(graph_filename)
+        baseline = None
+        parallel_routes = None
+        for num_threads in args.thread_counts:
+            route_time, expansions, routes = \
+                route(args.packed_filename, args.placement_filename, g,
+                      graph_filename, bus_width, num_threads, args.lookahead)
+            if baseline is None:
+                baseline = route_time
+            if num_threads > 1:
+                if parallel_routes is None:
+                    parallel_routes = routes
+                elif parallel_routes != routes:
+                    raise Exception("Routes differ with " + str(num_threads) +
+                                    " threads")
+            print("{0:>6}{1:>10}{2:>12.3f}{3:>14}{4:>9.1f}x".format(
+                bus_width, num_threads, route_time, expansions,
+                baseline / max(route_time, 1e-6)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Micro-benchmark for group_reg_nets on mock packed netlists with deep register
+chains, i.e. what the packer produces with --no-reg-fold on pipelined designs.
+Results are checked against the original scan-based implementation.
+"""
+from __future__ import print_function
+import os
+import sys
+import time
+from argparse import ArgumentParser
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), "arch"))
+from netlist import group_reg_nets  # noqa
+
+
+def create_reg_chains(num_chains, depth, tap_rate=4):
+    """each chain is driven by a PE and has depth unfolded registers. every
+    tap_rate registers the chain is tapped by a PE as well"""
+    netlists = {}
+    blk_count = [0]
+
+    def new_blk(blk_type):
+        blk_id = blk_type + str(blk_count[0])
+        blk_count[0] += 1
+        return blk_id
+
+    for _ in range(num_chains):
+        src = new_blk("p")
+        regs = [new_blk("r") for _ in range(depth)]
+        net = [(src, "out"), (regs[0], "in"), (new_blk("p"), "data0")]
+        netlists["e" + str(len(netlists))] = net
+        for i, reg in enumerate(regs):
+            net = [(reg, "out")]
+            if i + 1 < depth:
+                net.append((regs[i + 1], "in"))
+            if i % tap_rate == 0 or i + 1 == depth:
+                net.append((new_blk("p"), "data1"))
+            netlists["e" + str(len(netlists))] = net
+    return netlists
+
+
+def reference_group_reg_nets(netlists):
+    """the original implementation, which rescans the netlists"""
+    net_id_to_remove = set()
+    linked_nets = {}
+
+    reg_srcs = {}
+    reg_srcs_nets = set()
+    for net_id in netlists:
+        net = netlists[net_id]
+        if net[0][0][0] == "r":
+            reg_id = net[0][0]
+            reg_srcs[reg_id] = net_id
+            reg_srcs_nets.add(net_id)
+            net_id_to_remove.add(net_id)
+
+    def squash_net(nets, src_id):
+        result = [src_id]
+        for b_id, _ in nets[src_id][1:]:
+            if b_id[0] == "r":
+                next_id = reg_srcs[b_id]
+                result += squash_net(nets, next_id)
+        return result
+
+    resolved_net = set()
+    for reg_id in reg_srcs:
+        r_net_id = reg_srcs[reg_id]
+        if r_net_id in resolved_net:
+            continue
+        reg = netlists[r_net_id][0][0]
+        for net_id in netlists:
+            if net_id in reg_srcs_nets:
+                continue
+            net = netlists[net_id]
+            for blk_id, _ in net:
+                if blk_id == reg:
+                    merged_nets = squash_net(netlists, r_net_id)
+                    for m_id in merged_nets:
+                        resolved_net.add(m_id)
+                    if net_id in linked_nets:
+                        linked_nets[net_id] += merged_nets
+                    else:
+                        linked_nets[net_id] = merged_nets
+
+    assert(len(resolved_net) == len(net_id_to_remove))
+
+    reg_net_order = {}
+    for net_id in linked_nets:
+        reg_nets = linked_nets[net_id]
+        reg_net_index = {}
+        index = 0
+        working_set = [net_id]
+        while len(working_set) > 0:
+            n_id = working_set.pop(0)
+            for blk, _ in netlists[n_id][1:]:
+                if blk[0] == "r":
+                    for reg_net_id in reg_nets:
+                        if netlists[reg_net_id][0][0] == blk:
+                            working_set.append(reg_net_id)
+                            reg_net_index[reg_net_id] = index
+                            index += 1
+                            reg_net_order[reg_net_id] = n_id
+        reg_nets.sort(key=lambda x: reg_net_index[x])
+
+    return linked_nets, net_id_to_remove, reg_net_order
+
+
+def time_it(func, netlists):
+    start = time.time()
+    result = func(netlists)
+    return result, time.time() - start
+
+
+def main():
+    parser = ArgumentParser("group_reg_nets micro-benchmark")
+    parser.add_argument("--chains", help="Number of register chains",
+                        default=[10, 50, 200], type=int, nargs="+",
+                        action="store", dest="chains")
+    parser.add_argument("--depth", help="Number of registers per chain",
+                        default=[8, 32, 128], type=int, nargs="+",
+                        action="store", dest="depth")
+    parser.add_argument("--no-reference", help="Skip the original " +
+                        "implementation", action="store_true",
+                        dest="no_reference", default=False)
+    args = parser.parse_args()
+
+    print("{0:>8}{1:>8}{2:>10}{3:>14}{4:>14}".format("chains", "depth",
+                                                     "nets", "indexed (s)",
+                                                     "original (s)"))
+    for num_chains in args.chains:
+        for depth in args.depth:
+            netlists = create_reg_chains(num_chains, depth)
+            result, duration = time_it(group_reg_nets, netlists)
+            if args.no_reference or depth >= sys.getrecursionlimit() // 2:
+                ref_duration = "-"
+            else:
+                ref_result, ref_duration = time_it(reference_group_reg_nets,
+                                                   netlists)
+                assert result == ref_result
+                ref_duration = "{0:.4f}".format(ref_duration)
+            print("{0:>8}{1:>8}{2:>10}{3:>14.4f}{4:>14}".format(
+                num_chains, depth, len(netlists), duration, ref_duration))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark for reading routing results, e.g.
+    $python benchmark_route_parser.py harris.route
+It times the original parser, the streaming parser, building the binary
+route index and loading it back, and checks that all of them give the same
+routes.
+"""
+from __future__ import print_function
+import os
+import shutil
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from arch.parser import parse_routing  # noqa
+from arch.route_index import RouteIndex  # noqa
+
+
+def original_parse_routing(filename):
+    """the original implementation, which reads the whole file first"""
+    with open(filename) as f:
+        lines = f.readlines()
+
+    routes = {}
+    line_index = 0
+    while line_index < len(lines):
+        line = lines[line_index].strip()
+        line_index += 1
+        if line[:3] == "Net":
+            tokens = line.split(" ")
+            net_id = tokens[2]
+            routes[net_id] = []
+            num_seg = int(tokens[-1])
+            for seg_index in range(num_seg):
+                segment = []
+                line = lines[line_index].strip()
+                line_index += 1
+                assert line[:len("Segment")] == "Segment"
+                tokens = line.split()
+                seg_size = int(tokens[-1])
+                for i in range(seg_size):
+                    line = lines[line_index].strip()
+                    line_index += 1
+                    line = "".join([x for x in line if x not in ",()"])
+                    tokens = line.split()
+                    tokens = [int(x) if x.isdigit() else x for x in tokens]
+                    segment.append(tokens)
+                routes[net_id].append(segment)
+    return routes
+
+
+def timed(func, *args):
+    start = time.time()
+    result = func(*args)
+    return result, time.time() - start
+
+
+def main():
+    parser = ArgumentParser("route parser benchmark")
+    parser.add_argument("route_filenames", help="Routing results", nargs="+")
+    args = parser.parse_args()
+
+    print("{0:>24}{1:>8}{2:>16}{3:>12}".format("route", "nets", "reader",
+                                               "time (s)"))
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        for route_filename in args.route_filenames:
+            # keep the index out of the way of the route file
+            filename = os.path.join(tmp_dir, os.path.basename(route_filename))
+            shutil.copy(route_filename, filename)
+            routes, original_time = timed(original_parse_routing, filename)
+            stream_routes, stream_time = timed(parse_routing, filename)
+            index, build_time = timed(RouteIndex.open, filename)
+            index, load_time = timed(RouteIndex.open, filename)
+            index_routes, lists_time = timed(dict, index.items())
+            if stream_routes != routes or index_routes != routes:
+                raise Exception("Routes differ for " + route_filename)
+            for name, duration in (("original", original_time),
+                                   ("stream", stream_time),
+                                   ("index build", build_time),
+                                   ("index load", load_time),
+                                   ("index to lists", lists_time)):
+                print("{0:>24}{1:>8}{2:>16}{3:>12.3f}".format(
+                    os.path.basename(route_filename), len(routes), name,
+                    duration))
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+Benchmark for process_graph.build_routing_graph on mock CGRAs, e.g.
+    $python generate_hardware.py -s 32 -o cgra32.xml
+    $python benchmark_routing_graph.py cgra32.xml
+The dumped graphs are checked against the original implementation, which adds
+the edges one at a time.
+"""
+from __future__ import print_function
+import filecmp
+import os
+import shutil
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pycyclone  # noqa
+from pycyclone import RoutingGraph, SwitchBoxNode, PortNode, SwitchBoxSide  # noqa
+from pycyclone import Tile, RegisterNode, Switch, SwitchBoxIO  # noqa
+from pycyclone.util import get_side_int as gsi, get_disjoint_sb_wires, gsv  # noqa
+from pycyclone.util import get_opposite_side as gos  # noqa
+from arch import parse_cgra, RoutingResource  # noqa
+from arch.cgra_route import parse_routing_resource  # noqa
+from arch.cgra_route import build_routing_resource  # noqa
+from process_graph import build_routing_graph, get_new_coord  # noqa
+from process_graph import is_fu_tile, annotate_delays  # noqa
+
+
+def reference_build_routing_graph(routing_resource, layout):
+    """the original implementation, which adds one edge at a time"""
+    # FIXME:
+    # read the number of track width from the graph
+    g_1 = RoutingGraph()
+    g_16 = RoutingGraph()
+
+    # just made some assumptions here. since this will
+    # go away once fully integrate into garnet
+    NUM_TRACK = 5
+    SWITCH_ID = 0
+    layout_width = layout.width()
+    layout_height = layout.height()
+    clb_type = layout.get_clb_type()
+    margin = layout.get_layout_margin()[0]
+
+    sb_16 = Switch(0, 0, NUM_TRACK, 16, SWITCH_ID,
+                   get_disjoint_sb_wires(NUM_TRACK))
+    sb_1 = Switch(0, 0, NUM_TRACK, 1, SWITCH_ID,
+                  get_disjoint_sb_wires(NUM_TRACK))
+    tiles = list(routing_resource.keys())
+    for i in range(2):
+        tiles.sort(key=lambda x: x[i])
+    for x, y in tiles:
+        if not is_fu_tile(layout, x, y):
+            continue
+        # if "out" not in routing_resource[(x, y)]["port"]:
+        #    continue
+        t1 = Tile(x, y, sb_1)
+        t16 = Tile(x, y, sb_16)
+        g_1.add_tile(t1)
+        g_16.add_tile(t16)
+
+    for y in range(layout_height - 1):
+        for x in range(margin, layout_width - margin):
+            if (not is_fu_tile(layout, x, y)) or \
+                    (not is_fu_tile(layout, x, y + 1)):
+                continue
+            if not g_16.has_tile(x, y) or not g_16.has_tile(x, y + 1):
+                continue
+            for width in [1, 16]:
+                if width == 1:
+                    g = g_1
+                else:
+                    g = g_16
+                for track in range(NUM_TRACK):
+                    sb_top = SwitchBoxNode(x, y, width, track,
+                                           SwitchBoxSide.Bottom,
+                                           SwitchBoxIO.SB_OUT)
+                    sb_bottom = SwitchBoxNode(x, y + 1, width, track,
+                                              SwitchBoxSide.Top,
+                                              SwitchBoxIO.SB_IN)
+                    g.add_edge(sb_top, sb_bottom)
+                    # also add reg as well
+                    if width == 16 and layout.get_blk_type(x, y) == clb_type:
+                        reg1 = RegisterNode("reg_" + str(track) + "_"
+                                            + str(gsv(SwitchBoxSide.Bottom)),
+                                            x, y,
+                                            16,
+                                            track)
+                        g.add_edge(sb_top, reg1)
+                        g.add_edge(reg1, sb_bottom)
+
+                    sb_bottom.io = SwitchBoxIO.SB_OUT
+                    sb_top.io = SwitchBoxIO.SB_IN
+                    g.add_edge(sb_bottom, sb_top)
+                    if width == 16 and\
+                       layout.get_blk_type(x, y + 1) == clb_type:
+                        reg2 = RegisterNode("reg_" + str(track) + "_"
+                                            + str(gsv(SwitchBoxSide.Top)),
+                                            x, y + 1,
+                                            16,
+                                            track)
+                        g.add_edge(sb_bottom, reg2)
+                        g.add_edge(reg2, sb_top)
+
+    for y in range(margin, layout_height - margin):
+        # connect from left to right and right to left
+        for x in range(layout_width - 1):
+            if (not is_fu_tile(layout, x, y)) or \
+                    (not is_fu_tile(layout, x + 1, y)):
+                continue
+            if not g_16.has_tile(x, y) or not g_16.has_tile(x + 1, y):
+                continue
+            for width in [1, 16]:
+                if width == 1:
+                    g = g_1
+                else:
+                    g = g_16
+                for track in range(NUM_TRACK):
+                    sb_left = SwitchBoxNode(x, y, width, track,
+                                            SwitchBoxSide.Right,
+                                            SwitchBoxIO.SB_OUT)
+                    sb_right = SwitchBoxNode(x + 1, y, width, track,
+                                             SwitchBoxSide.Left,
+                                             SwitchBoxIO.SB_IN)
+                    g.add_edge(sb_left, sb_right)
+                    # also add reg as well
+                    if width == 16  and layout.get_blk_type(x, y) == clb_type:
+                        reg1 = RegisterNode("reg_" + str(track) + "_"
+                                            + str(gsv(SwitchBoxSide.Right)),
+                                            x, y,
+                                            16,
+                                            track)
+                        g.add_edge(sb_left, reg1)
+                        g.add_edge(reg1, sb_right)
+
+                    sb_right.io = SwitchBoxIO.SB_OUT
+                    sb_left.io = SwitchBoxIO.SB_IN
+                    g.add_edge(sb_right, sb_left)
+                    # also add reg as well
+                    if width == 16 and \
+                            layout.get_blk_type(x + 1, y) == clb_type:
+                        reg2 = RegisterNode("reg_" + str(track) + "_"
+                                            + str(gsv(SwitchBoxSide.Left)),
+                                            x + 1, y,
+                                            16,
+                                            track)
+                        g.add_edge(sb_right, reg2)
+                        g.add_edge(reg2, sb_left)
+    for x, y in tiles:
+        ports = routing_resource[(x, y)]["port"]
+        port_io = routing_resource[(x, y)]["port_io"]
+
+        if not is_fu_tile(layout, x, y):
+            for port in ports:
+                assert len(ports[port]) == 0
+            continue
+        if not g_16.has_tile(x, y):
+            continue
+
+        # handling ports
+        # sort them
+        port_names = list(ports.keys())
+        port_names.sort()
+        for port_name in port_names:
+            port = PortNode(port_name, x, y, 0)
+            sb = SwitchBoxNode(0, 0, 0, 0, SwitchBoxSide.Bottom,
+                               SwitchBoxIO.SB_OUT)
+            port_entries = list(ports[port_name])
+            # in-place sort
+            for i in range(4):
+                port_entries.sort(key=lambda x: x[i])
+            for width, io, side, track in port_entries:
+                if width == 16:
+                    g = g_16
+                else:
+                    g = g_1
+                if port.width == 0:
+                    port.width = width
+                else:
+                    assert port.width == width
+                sb.width = width
+                sb.track = track
+                # a lot of complications
+                io_dir = port_io[port_name]
+                if io_dir == 0:
+                    sb.io = SwitchBoxIO.SB_OUT
+                    if io == 0:
+                        # this is coming in, so we need to recalculate the
+                        # coordinates to see where the connection comes from
+                        sb.x, sb.y = get_new_coord(x, y, side)
+                        if not g.has_tile(sb.x, sb.y):
+                            continue
+                        new_side = gos(side)
+                        sb.side = new_side
+                        g.add_edge(sb, port)
+
+                        # we also need to connect the registers
+                        if width == 16:
+                            reg = RegisterNode("reg_" + str(track) + "_"
+                                               + str(gsv(new_side)),
+                                               sb.x, sb.y,
+                                               16,
+                                               track)
+                            g.add_edge(reg, port)
+
+                    else:
+                        sb.x, sb.y = x, y
+                        sb.side = gsi(side)
+                        g.add_edge(sb, port)
+                else:
+                    sb.x, sb.y = x, y
+                    sb.side = gsi(side)
+                    sb.io = SwitchBoxIO.SB_OUT
+                    g.add_edge(port, sb)
+
+    clb = {}
+    for x in range(layout_width):
+        for y in range(layout_height):
+            clb[x, y] = layout.get_blk_type(x, y) == clb_type
+    annotate_delays(g_1, clb)
+    annotate_delays(g_16, clb)
+
+    return g_1, g_16
+
+
+def time_it(func, *args):
+    start = time.time()
+    result = func(*args)
+    return result, time.time() - start
+
+
+def same_graphs(graphs1, graphs2, tmp_dir):
+    for i, (g1, g2) in enumerate(zip(graphs1, graphs2)):
+        filename1 = os.path.join(tmp_dir, "{0}a.graph".format(i))
+        filename2 = os.path.join(tmp_dir, "{0}b.graph".format(i))
+        pycyclone.io.dump_routing_graph(g1, filename1)
+        pycyclone.io.dump_routing_graph(g2, filename2)
+        if not filecmp.cmp(filename1, filename2, shallow=False):
+            return False
+    return True
+
+
+def main():
+    parser = ArgumentParser("build_routing_graph benchmark")
+    parser.add_argument("cgra_filenames", help="Mock CGRA files", nargs="+")
+    parser.add_argument("--no-reference", help="Skip the original " +
+                        "implementation", action="store_true",
+                        dest="no_reference", default=False)
+    args = parser.parse_args()
+
+    print("{0:>16}{1:>16}{2:>16}{3:>10}".format("cgra", "vectorized (s)",
+                                               "original (s)", "speedup"))
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        for cgra_filename in args.cgra_filenames:
+            layout = parse_cgra(cgra_filename)["CGRA"]
+            routing_resource = build_routing_resource(
+                parse_routing_resource(cgra_filename))
+            graphs, duration = time_it(
+                build_routing_graph,
+                RoutingResource.from_dict(routing_resource), layout)
+            if args.no_reference:
+                ref_duration, speedup = "-", "-"
+            else:
+                ref_graphs, ref_duration = time_it(
+                    reference_build_routing_graph, routing_resource, layout)
+                assert same_graphs(graphs, ref_graphs, tmp_dir)
+                speedup = "{0:.1f}x".format(ref_duration / duration)
+                ref_duration = "{0:.4f}".format(ref_duration)
+            print("{0:>16}{1:>16.4f}{2:>16}{3:>10}".format(
+                os.path.basename(cgra_filename), duration, ref_duration,
+                speedup))
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
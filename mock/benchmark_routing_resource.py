@@ -0,0 +1,81 @@
+"""
+Benchmark for parsing the routing resource of mock CGRAs, e.g.
+    $python generate_hardware.py -s 64 -o cgra64.xml
+    $python benchmark_routing_resource.py cgra64.xml
+Each parser runs in its own process to measure its peak memory. The streaming
+parser has to build the same routing resource as parsing the whole tree.
+"""
+from __future__ import print_function
+import hashlib
+import os
+import resource
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lxml import etree  # noqa
+from arch.cgra_route import read_routing_resource, build_routing_resource  # noqa
+from arch.cgra_route import load_routing_resource  # noqa
+
+
+def tree_routing_resource(cgra_filename):
+    """the original implementation, which parses the whole tree first"""
+    root = etree.parse(cgra_filename)
+    return build_routing_resource(read_routing_resource(root.iter("tile")))
+
+
+PARSERS = {"tree": tree_routing_resource, "stream": load_routing_resource}
+
+
+def get_digest(routing_resource):
+    h = hashlib.sha256()
+    for pos in sorted(routing_resource):
+        entry = routing_resource[pos]
+        ports = sorted([(port, sorted(wires)) for port, wires in
+                        entry["port"].items()])
+        h.update(repr((pos, sorted(entry["route_resource"]), ports,
+                       sorted(entry["port_io"].items()))).encode("utf-8"))
+    return h.hexdigest()
+
+
+def run_parser(parser_name, cgra_filename):
+    start = time.time()
+    routing_resource = PARSERS[parser_name](cgra_filename)
+    duration = time.time() - start
+    # KB on linux
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(duration, max_rss, get_digest(routing_resource))
+
+
+def main():
+    parser = ArgumentParser("routing resource parser benchmark")
+    parser.add_argument("cgra_filenames", help="Mock CGRA files", nargs="+")
+    parser.add_argument("--run", help="Run a single parser",
+                        choices=sorted(PARSERS.keys()), action="store",
+                        dest="run", default=None)
+    args = parser.parse_args()
+    if args.run is not None:
+        run_parser(args.run, args.cgra_filenames[0])
+        return
+
+    print("{0:>16}{1:>10}{2:>12}{3:>14}".format("cgra", "parser", "time (s)",
+                                                "max rss (MB)"))
+    for cgra_filename in args.cgra_filenames:
+        digests = set()
+        for parser_name in ("tree", "stream"):
+            output = subprocess.check_output(
+                [sys.executable, os.path.abspath(__file__), "--run",
+                 parser_name, cgra_filename]).decode("utf-8")
+            duration, max_rss, digest = output.split()
+            digests.add(digest)
+            print("{0:>16}{1:>10}{2:>12.3f}{3:>14.1f}".format(
+                os.path.basename(cgra_filename), parser_name, float(duration),
+                int(max_rss) / 1024.0))
+        if len(digests) != 1:
+            raise Exception("Routing resources differ for " + cgra_filename)
+
+
+if __name__ == "__main__":
+    main()
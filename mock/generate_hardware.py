@@ -150,9 +150,9 @@ def write_pe(root, x, y, num_chan, tile_addr, bit0_dir, bit1_dir, bit2_dir,
              "bit2": (1, bit2_dir), "data0": (16, data0_dir),
              "data1": (16, data1_dir)}
     write_cb(element, num_chan, sinks)
-    sources = {"pe_out_res_p": pe_out_dir}
-    write_sb(element, 16, sources, num_chan)
-    write_sb(element, 1, sources, num_chan)
+    # 16-bit tracks are driven by the PE output, 1-bit by the predicate
+    write_sb(element, 16, {"pe_out_res": pe_out_dir}, num_chan)
+    write_sb(element, 1, {"pe_out_res_p": pe_out_dir}, num_chan)
 
 
 def determine_io_pos(num_io, pe_margin, size):
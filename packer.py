@@ -1,5 +1,6 @@
 from __future__ import print_function
 from arch.cgra_packer import save_packing_result
+from arch.coreir_stream import peak_memory_usage
 from argparse import ArgumentParser
 
 if __name__ == "__main__":
@@ -13,8 +14,21 @@ if __name__ == "__main__":
     parser.add_argument("--no-reg-fold", help="If set, the packer will turn " +
                         "registers into PE tiles", action="store_true",
                         required=False, dest="no_reg_fold", default=False)
+    parser.add_argument("-b", "--binary", help="Also write the packed " +
+                        "netlist in the binary format, e.g. harris.packed.bin",
+                        required=False, action="store", dest="binary",
+                        default=None)
+    parser.add_argument("--stream", help="Scan the netlist json " +
+                        "incrementally instead of loading the whole " +
+                        "document",
+                        action="store_true", required=False, dest="stream",
+                        default=False)
     args = parser.parse_args()
     filename = args.input
     packed = args.output
     fold_reg = not args.no_reg_fold
-    save_packing_result(filename, packed, fold_reg=fold_reg)
+    save_packing_result(filename, packed, fold_reg=fold_reg,
+                        binary_filename=args.binary, stream=args.stream)
+    peak_memory = peak_memory_usage()
+    if peak_memory is not None:
+        print("Peak memory: {0:.1f} MB".format(peak_memory))
@@ -1,16 +1,21 @@
 from __future__ import print_function, division
 
-from util import reduce_cluster_graph, compute_centroids
+from util import reduce_cluster_graphs, compute_centroids
 from util import SetEncoder, choose_resource
 import os
 import pythunder
 import json
 import threading
+import time
 
 
 def detailed_placement_thunder(args, context=None):
-    blks = list(args["clusters"])
-    cells = args["cells"]
+    # clusters and cells are sets, whose order changes when they are sent to
+    # another process
+    blks = sorted(args["clusters"])
+    cells = {}
+    for blk_type in args["cells"]:
+        cells[blk_type] = sorted(args["cells"][blk_type])
     netlist = args["new_netlist"]
     blk_pos = args["blk_pos"]
     fold_reg = args["fold_reg"]
@@ -42,7 +47,7 @@ def detailed_placement_thunder(args, context=None):
 
 
 def estimate_placement_time(args):
-    blks = list(args["clusters"])
+    blks = sorted(args["clusters"])
     cells = args["cells"]
     netlist = args["new_netlist"]
     blk_pos = args["blk_pos"]
@@ -53,11 +58,11 @@ def estimate_placement_time(args):
         fixed_pos[blk_id] = list(blk_pos[blk_id])
     new_cells = {}
     for blk_type in cells:
-        new_cells[blk_type] = list(cells[blk_type])
+        new_cells[blk_type] = sorted(cells[blk_type])
     placer = pythunder.DetailedPlacer(blks, netlist, new_cells,
                                       fixed_pos, clb_type,
                                       fold_reg)
-    t = placer.estimate(10000)
+    t = placer.estimate()
     return t
 
 
@@ -112,15 +117,170 @@ def make_board(layout):
     return board
 
 
+def load_design(packed_filename, cgra_arch="", fpga_arch="", cgra_layout="",
+                mock_size=0, fold_reg=True):
+    from arch import ArchModel, parse_fpga
+    from arch.cgra import place_special_blocks, prune_netlist
+    from arch.cgra_packer import load_packed_file
+    from arch.fpga import load_packed_fpga_netlist
+    from arch import mock_board_meta
+
+    fpga_place = len(fpga_arch) > 0
+    # FPGA params override
+    if mock_size > 0:
+        fold_reg = False
+        board_meta = mock_board_meta(mock_size)
+    elif fpga_place:
+        fold_reg = False
+        board_meta = parse_fpga(fpga_arch)
+    else:
+        if len(cgra_arch) > 0:
+            board_meta = {"CGRA": ArchModel(cgra_arch).get_layout()}
+        else:
+            board_meta = {"cgra": pythunder.io.load_layout(cgra_layout)}
+    # Common routine
+    board_name, layout = board_meta.popitem()
+    print("INFO: Placing for", board_name)
+    board = make_board(layout)
+
+    fixed_blk_pos = {}
+    special_blocks = set()
+
+    # FPGA
+    if fpga_place:
+        netlists, fixed_blk_pos, _ = load_packed_fpga_netlist(packed_filename)
+        id_to_name = {}
+        # place fixed IO locations
+        for blk_id in fixed_blk_pos:
+            pos = fixed_blk_pos[blk_id]
+            place_on_board(board, blk_id, pos)
+
+        folded_blocks = {}
+        changed_pe = {}
+
+    else:
+        # CGRA
+        raw_netlist, folded_blocks, id_to_name, changed_pe = \
+            load_packed_file(packed_filename)
+        netlists = prune_netlist(raw_netlist)
+        for blk in id_to_name:
+            if blk[0] == "i" or blk[0] == "I":
+                special_blocks.add(blk)
+
+        # place the spacial blocks first
+        place_special_blocks(board, special_blocks, fixed_blk_pos, raw_netlist,
+                             place_on_board,
+                             layout)
+
+    return {"layout": layout, "board": board, "netlists": netlists,
+            "fixed_blk_pos": fixed_blk_pos, "id_to_name": id_to_name,
+            "folded_blocks": folded_blocks, "changed_pe": changed_pe,
+            "fold_reg": fold_reg}
+
+
+# design loaded in each portfolio worker, since layouts can't be pickled
+_portfolio_design = None
+
+
+def init_portfolio_worker(design_args):
+    global _portfolio_design
+    _portfolio_design = load_design(**design_args)
+
+
+def portfolio_global_placement(seed):
+    from arch import compute_hpwl
+    design = _portfolio_design
+    start = time.time()
+    global_result = perform_global_placement(design["fixed_blk_pos"],
+                                             design["netlists"],
+                                             design["layout"], seed=seed,
+                                             vis=False)
+    # score it with every block sitting on its cluster centroid
+    centroids, _, clusters = global_result
+    blk_pos = design["fixed_blk_pos"].copy()
+    for c_id in clusters:
+        for blk_id in clusters[c_id]:
+            blk_pos[blk_id] = centroids[c_id]
+    hpwl = compute_hpwl(blk_pos, design["netlists"])
+    return global_result, hpwl, time.time() - start
+
+
+def portfolio_detailed_placement(seed, global_result):
+    design = _portfolio_design
+    start = time.time()
+    centroids, cluster_cells, clusters = global_result
+    board_pos = perform_detailed_placement(centroids, cluster_cells, clusters,
+                                           design["fixed_blk_pos"],
+                                           design["netlists"],
+                                           design["fold_reg"], seed,
+                                           design["layout"])
+    board_pos = refine_global_thunder(design["layout"], board_pos,
+                                      design["netlists"],
+                                      design["fixed_blk_pos"],
+                                      design["fold_reg"])
+    return board_pos, time.time() - start
+
+
+def place_portfolio(design_args, netlists, seeds, jobs=0, cancel_margin=0.1,
+                    routability=False, track_capacity=5):
+    """places the design with every seed in parallel processes and returns
+    the best placement. seeds whose global placement is clearly behind are
+    cancelled before detailed placement"""
+    from arch import compute_hpwl, compute_routing_overflow
+    import multiprocessing
+    if not jobs:
+        jobs = multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(min(jobs, len(seeds)), init_portfolio_worker,
+                                (design_args,))
+    try:
+        global_futures = [pool.apply_async(portfolio_global_placement,
+                                           (seed,))
+                          for seed in seeds]
+        global_results = [future.get() for future in global_futures]
+        best_global = min([hpwl for _, hpwl, _ in global_results])
+        detailed_futures = {}
+        for seed, (global_result, hpwl, _) in zip(seeds, global_results):
+            if hpwl > best_global * (1 + cancel_margin):
+                continue
+            detailed_futures[seed] = pool.apply_async(
+                portfolio_detailed_placement, (seed, global_result))
+        detailed_results = {}
+        for seed in detailed_futures:
+            detailed_results[seed] = detailed_futures[seed].get()
+    finally:
+        pool.terminate()
+        pool.join()
+
+    metrics = {}
+    for seed in detailed_results:
+        board_pos, _ = detailed_results[seed]
+        hpwl = compute_hpwl(board_pos, netlists)
+        overflow = compute_routing_overflow(board_pos, netlists,
+                                            track_capacity)
+        metrics[seed] = (overflow, hpwl) if routability else (hpwl, overflow)
+    best_seed = min(metrics, key=lambda x: (metrics[x], x))
+
+    print("{0:>6}{1:>12}{2:>12}{3:>12}{4:>12}{5:>12}".format(
+        "seed", "global", "hpwl", "overflow", "time (s)", "status"))
+    for seed, (_, global_hpwl, global_time) in zip(seeds, global_results):
+        if seed in detailed_results:
+            score = metrics[seed]
+            hpwl, overflow = (score[1], score[0]) if routability else score
+            total_time = global_time + detailed_results[seed][1]
+            status = "best" if seed == best_seed else "done"
+            print("{0:>6}{1:>12}{2:>12}{3:>12.2f}{4:>12.2f}{5:>12}".format(
+                seed, global_hpwl, hpwl, overflow, total_time, status))
+        else:
+            print("{0:>6}{1:>12}{2:>12}{3:>12}{4:>12.2f}{5:>12}".format(
+                seed, global_hpwl, "-", "-", global_time, "cancelled"))
+    return detailed_results[best_seed][0]
+
+
 def main():
     # only the main thread needs it
     # this is to avoid loading unnecessary crop while calling from aws lambda
     from argparse import ArgumentParser
-    from arch import parse_cgra, parse_fpga
-    from arch.cgra import place_special_blocks, save_placement, prune_netlist
-    from arch.cgra_packer import load_packed_file
-    from arch.fpga import load_packed_fpga_netlist
-    from arch import mock_board_meta
+    from arch.cgra import save_placement
     from visualize import visualize_placement_cgra
 
     parser = ArgumentParser("CGRA Placer")
@@ -151,6 +311,33 @@ def main():
                         "that arn",
                         dest="aws_config", type=str, required=False,
                         action="store", default="")
+    parser.add_argument("-e", "--executor", help="Run detailed placement " +
+                        "locally with threads, processes or a local http " +
+                        "server (see place_executor.py). By default it " +
+                        "uses the thread pool inside thunder",
+                        dest="executor", required=False, action="store",
+                        default="", choices=["thread", "process", "http"])
+    parser.add_argument("-j", "--jobs", help="Number of workers for the " +
+                        "executor, or number of seeds placed in parallel " +
+                        "with --seeds. default is the number of cores",
+                        dest="jobs", type=int, required=False,
+                        action="store", default=0)
+    parser.add_argument("--url", help="Server url for the http executor",
+                        dest="url", required=False, action="store",
+                        default="http://localhost:8080")
+    parser.add_argument("--seeds", help="Place with N seeds, starting " +
+                        "from --seed, and keep the one with the best HPWL",
+                        dest="num_seeds", type=int, required=False,
+                        action="store", default=1)
+    parser.add_argument("--cancel-margin", help="With --seeds, drop the " +
+                        "seeds whose global placement HPWL is this much " +
+                        "worse than the best one. default is 0.1",
+                        dest="cancel_margin", type=float, required=False,
+                        action="store", default=0.1)
+    parser.add_argument("--routability", help="With --seeds, rank the " +
+                        "results by estimated routing overflow first",
+                        dest="routability", action="store_true",
+                        required=False, default=False)
     parser.add_argument("-f", "--fpga", action="store", dest="fpga_arch",
                         default="", help="ISPD FPGA architecture file")
     parser.add_argument("-l", "--layout", action="store", dest="cgra_layout",
@@ -174,87 +361,69 @@ def main():
     packed_filename = args.packed_filename
     placement_filename = args.placement_filename
     aws_config = args.aws_config
-    fpga_place = len(fpga_arch) > 0
+    if args.num_seeds > 1 and (args.executor or aws_config):
+        # every seed is placed in its own process
+        parser.error("--seeds can't be used with --executor or --aws")
+    executor = None
+    if args.executor:
+        from place_executor import create_executor
+        executor = create_executor(args.executor, args.jobs, args.url)
 
     seed = args.seed
-    print("Using seed", seed, "for placement")
-
+    num_seeds = args.num_seeds
     vis_opt = not args.no_vis
     fold_reg = not args.no_reg_fold
-    # FPGA params override
-    if mock_size > 0:
-        fold_reg = False
-        board_meta = mock_board_meta(mock_size)
-    elif fpga_place:
-        fold_reg = False
-        board_meta = parse_fpga(fpga_arch)
-    else:
-        if len(cgra_arch) > 0:
-            board_meta = parse_cgra(cgra_arch)
-        else:
-            board_meta = {"cgra": pythunder.io.load_layout(cgra_layout)}
-    # Common routine
-    board_name, layout = board_meta.popitem()
-    print("INFO: Placing for", board_name)
-    board = make_board(layout)
+    design_args = {"packed_filename": packed_filename,
+                   "cgra_arch": cgra_arch, "fpga_arch": fpga_arch,
+                   "cgra_layout": cgra_layout, "mock_size": mock_size,
+                   "fold_reg": fold_reg}
+    design = load_design(**design_args)
+    layout = design["layout"]
+    board = design["board"]
+    fixed_blk_pos = design["fixed_blk_pos"]
+    netlists = design["netlists"]
+    fold_reg = design["fold_reg"]
 
     pythunder.io.dump_layout(layout, "cgra.layout")
 
-    fixed_blk_pos = {}
-    special_blocks = set()
-
-    # FPGA
-    if fpga_place:
-        netlists, fixed_blk_pos, _ = load_packed_fpga_netlist(packed_filename)
-        id_to_name = {}
-        # place fixed IO locations
-        for blk_id in fixed_blk_pos:
-            pos = fixed_blk_pos[blk_id]
-            place_on_board(board, blk_id, pos)
-
-        folded_blocks = {}
-        changed_pe = {}
-
+    if num_seeds > 1:
+        seeds = list(range(seed, seed + num_seeds))
+        print("Using seeds", seeds, "for placement")
+        board_pos = place_portfolio(design_args, netlists, seeds, args.jobs,
+                                    args.cancel_margin, args.routability)
     else:
-        # CGRA
-        raw_netlist, folded_blocks, id_to_name, changed_pe = \
-            load_packed_file(packed_filename)
-        netlists = prune_netlist(raw_netlist)
-        for blk in id_to_name:
-            if blk[0] == "i" or blk[0] == "I":
-                special_blocks.add(blk)
-
-        # place the spacial blocks first
-        place_special_blocks(board, special_blocks, fixed_blk_pos, raw_netlist,
-                             place_on_board,
-                             layout)
-
-    # common routine
-    # produce layout structure
-    centroids, cluster_cells, clusters = perform_global_placement(
-        fixed_blk_pos, netlists, layout, seed=seed, vis=vis_opt)
-
-    # placer with each cluster
-    board_pos = perform_detailed_placement(centroids,
-                                           cluster_cells, clusters,
-                                           fixed_blk_pos, netlists,
-                                           fold_reg, seed,
-                                           layout,
-                                           aws_config)
-    # refinement
-    board_pos = refine_global_thunder(layout, board_pos, netlists,
-                                      fixed_blk_pos, fold_reg)
+        print("Using seed", seed, "for placement")
+        # common routine
+        # produce layout structure
+        centroids, cluster_cells, clusters = perform_global_placement(
+            fixed_blk_pos, netlists, layout, seed=seed, vis=vis_opt)
+
+        # placer with each cluster
+        board_pos = perform_detailed_placement(centroids,
+                                               cluster_cells, clusters,
+                                               fixed_blk_pos, netlists,
+                                               fold_reg, seed,
+                                               layout,
+                                               aws_config,
+                                               executor)
+        if executor is not None:
+            executor.shutdown()
+        # refinement
+        board_pos = refine_global_thunder(layout, board_pos, netlists,
+                                          fixed_blk_pos, fold_reg)
 
     for blk_id in board_pos:
         pos = board_pos[blk_id]
         place_on_board(board, blk_id, pos)
 
     # save the placement file
-    save_placement(board_pos, id_to_name, folded_blocks, placement_filename)
+    save_placement(board_pos, design["id_to_name"], design["folded_blocks"],
+                   placement_filename)
     basename_file = os.path.basename(placement_filename)
     design_name, _ = os.path.splitext(basename_file)
     if vis_opt:
-        visualize_placement_cgra(layout, board_pos, design_name, changed_pe)
+        visualize_placement_cgra(layout, board_pos, design_name,
+                                 design["changed_pe"])
 
 
 def perform_global_placement(fixed_blk_pos, netlists,
@@ -332,21 +501,15 @@ def detailed_placement_thunder_wrapper(args):
                                         seed)
 
 
-def perform_detailed_placement(centroids, cluster_cells, clusters,
-                               fixed_blk_pos, netlists,
-                               fold_reg, seed, layout,
-                               aws_config=""):
-    from six.moves import queue
-    import boto3
-    board_pos = fixed_blk_pos.copy()
+def build_detailed_placement_args(centroids, cluster_cells, clusters,
+                                  fixed_blk_pos, netlists, fold_reg, seed,
+                                  clb_type):
+    """per-cluster payloads for detailed_placement_thunder"""
     map_args = []
-
-    clb_type = layout.get_clb_type()
-
+    new_netlists = reduce_cluster_graphs(netlists, clusters, fixed_blk_pos,
+                                         list(cluster_cells.keys()))
     for c_id in cluster_cells:
         cells = cluster_cells[c_id]
-        new_netlist = reduce_cluster_graph(netlists, clusters,
-                                           fixed_blk_pos, c_id)
         blk_pos = fixed_blk_pos.copy()
         for i in centroids:
             if i == c_id:
@@ -355,16 +518,33 @@ def perform_detailed_placement(centroids, cluster_cells, clusters,
             pos = centroids[i]
             blk_pos[node_id] = pos
         args = {"clusters": clusters[c_id], "cells": cells,
-                "new_netlist": new_netlist,
+                "new_netlist": new_netlists[c_id],
                 "blk_pos": blk_pos, "fold_reg": fold_reg,
                 "seed": seed, "clb_type": clb_type}
         map_args.append(args)
-    if not aws_config:
+    return map_args
+
+
+def perform_detailed_placement(centroids, cluster_cells, clusters,
+                               fixed_blk_pos, netlists,
+                               fold_reg, seed, layout,
+                               aws_config="", executor=None):
+    from six.moves import queue
+    board_pos = fixed_blk_pos.copy()
+    map_args = build_detailed_placement_args(centroids, cluster_cells,
+                                             clusters, fixed_blk_pos,
+                                             netlists, fold_reg, seed,
+                                             layout.get_clb_type())
+    if executor is not None:
+        from place_executor import run_detailed_placement
+        board_pos.update(run_detailed_placement(map_args, executor))
+        return board_pos
+    elif not aws_config:
         return detailed_placement_thunder_wrapper(map_args)
     else:
+        import boto3
         # user need to specify a region in the environment
         client = boto3.client("lambda")
-        import time
         threads = []
         lambda_arns = get_lambda_arn(map_args, aws_config)
         que = queue.Queue()
@@ -0,0 +1,168 @@
+"""
+Local execution backends for per-cluster detailed placement. They take the
+same payload as the AWS Lambda handler detailed_placement_thunder and run the
+clusters in threads, in a process pool, or on a local HTTP server that stands
+in for Lambda:
+    python place_executor.py --port 8080 -j 32
+Clusters are scheduled longest first based on estimate_placement_time.
+"""
+from __future__ import print_function, division
+import json
+import multiprocessing
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures import as_completed
+from argparse import ArgumentParser
+
+from place import detailed_placement_thunder, estimate_placement_time
+from util import SetEncoder
+
+EXECUTORS = ("thread", "process", "http")
+DEFAULT_URL = "http://localhost:8080"
+
+
+def timed_detailed_placement(args):
+    start = time.time()
+    placement = detailed_placement_thunder(args)
+    return placement, time.time() - start
+
+
+class DetailedPlacementExecutor(object):
+    def __init__(self, jobs=None):
+        if not jobs:
+            jobs = multiprocessing.cpu_count()
+        self.jobs = jobs
+        self._pool = None
+
+    def submit(self, args):
+        """returns a future of (placement, wall time)"""
+        return self._pool.submit(timed_detailed_placement, args)
+
+    def estimate(self, map_args):
+        return list(self._pool.map(estimate_placement_time, map_args))
+
+    def shutdown(self):
+        self._pool.shutdown()
+
+
+class ThreadExecutor(DetailedPlacementExecutor):
+    def __init__(self, jobs=None):
+        DetailedPlacementExecutor.__init__(self, jobs)
+        self._pool = ThreadPoolExecutor(self.jobs)
+
+
+class ProcessExecutor(DetailedPlacementExecutor):
+    def __init__(self, jobs=None):
+        DetailedPlacementExecutor.__init__(self, jobs)
+        self._pool = ProcessPoolExecutor(self.jobs)
+
+
+class HttpExecutor(DetailedPlacementExecutor):
+    """talks to a server that speaks the Lambda request/response payload"""
+    def __init__(self, url=DEFAULT_URL, jobs=None):
+        DetailedPlacementExecutor.__init__(self, jobs)
+        self.url = url
+        # requests are IO bound
+        self._pool = ThreadPoolExecutor(self.jobs)
+
+    def __invoke(self, args):
+        from six.moves.urllib.request import Request, urlopen
+        start = time.time()
+        payload = json.dumps(args, cls=SetEncoder).encode("utf-8")
+        request = Request(self.url, data=payload,
+                          headers={"Content-Type": "application/json"})
+        res = json.loads(urlopen(request).read().decode("utf-8"))
+        if res["statusCode"] != 200:
+            raise Exception("Detailed placement failed: " + str(res["body"]))
+        placement = {}
+        for blk_id, pos in res["body"].items():
+            placement[blk_id] = tuple(pos)
+        return placement, time.time() - start
+
+    def submit(self, args):
+        return self._pool.submit(self.__invoke, args)
+
+
+def create_executor(name, jobs=None, url=DEFAULT_URL):
+    if name == "thread":
+        return ThreadExecutor(jobs)
+    elif name == "process":
+        return ProcessExecutor(jobs)
+    elif name == "http":
+        return HttpExecutor(url, jobs)
+    raise Exception("Unknown executor " + name)
+
+
+def run_detailed_placement(map_args, executor):
+    """places every cluster with the executor, longest estimate first"""
+    estimates = executor.estimate(map_args)
+    index_list = list(range(len(map_args)))
+    index_list.sort(key=lambda x: estimates[x], reverse=True)
+    start = time.time()
+    futures = {}
+    for i in index_list:
+        futures[executor.submit(map_args[i])] = i
+
+    board_pos = {}
+    durations = {}
+    for future in as_completed(futures):
+        placement, duration = future.result()
+        board_pos.update(placement)
+        durations[futures[future]] = duration
+    total_time = time.time() - start
+
+    print("{0:>8}{1:>10}{2:>14}{3:>14}".format("cluster", "blocks",
+                                               "estimate", "wall (s)"))
+    for i in index_list:
+        print("{0:>8}{1:>10}{2:>14.2f}{3:>14.2f}".format(
+            i, len(map_args[i]["clusters"]), estimates[i], durations[i]))
+    print("Detailed placement takes", total_time, "seconds")
+    return board_pos
+
+
+def serve(port, jobs=None):
+    """local stand-in for the Lambda function"""
+    from six.moves.BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from six.moves.socketserver import ThreadingMixIn
+    pool = ProcessPoolExecutor(jobs if jobs else multiprocessing.cpu_count())
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers["Content-Length"])
+            args = json.loads(self.rfile.read(length).decode("utf-8"))
+            try:
+                res = pool.submit(detailed_placement_thunder, args,
+                                  {}).result()
+            except Exception as ex:
+                res = {"statusCode": 500, "body": str(ex)}
+            data = json.dumps(res, cls=SetEncoder).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    class Server(ThreadingMixIn, HTTPServer):
+        daemon_threads = True
+
+    server = Server(("", port), Handler)
+    print("Serving detailed placement on port", port)
+    try:
+        server.serve_forever()
+    finally:
+        pool.shutdown()
+
+
+def main():
+    parser = ArgumentParser("Local detailed placement server")
+    parser.add_argument("-p", "--port", help="Port to listen on",
+                        default=8080, type=int, action="store", dest="port")
+    parser.add_argument("-j", "--jobs", help="Number of worker processes. " +
+                        "default is the number of cores", default=0,
+                        type=int, action="store", dest="jobs")
+    args = parser.parse_args()
+    serve(args.port, args.jobs)
+
+
+if __name__ == "__main__":
+    main()
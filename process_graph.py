@@ -1,25 +1,34 @@
 from __future__ import print_function
 import os
+import numpy as np
 from argparse import ArgumentParser
 import pycyclone
-from pycyclone import RoutingGraph, SwitchBoxNode, PortNode, SwitchBoxSide
-from pycyclone import Tile, RegisterNode, NodeType
+from pycyclone import RoutingGraph, SwitchBoxSide
+from pycyclone import Tile, NodeType
 from pycyclone import GlobalRouter, SwitchBoxIO, Switch
-from pycyclone.util import get_side_int as gsi, get_disjoint_sb_wires, gsv
-from pycyclone.util import get_opposite_side as gos
+from pycyclone.util import get_disjoint_sb_wires, gsv
 from pycyclone.io import load_placement, load_netlist, setup_router_input
 
-from arch import parse_cgra
-from arch.cgra_route import parse_routing_resource, build_routing_resource
+from arch import ArchModel
+from arch.cgra_analytics import TIMING_INFO
+from stage_cache import StageCache, is_cache_enabled
 
-REG_DELAY = 10
-SWITCHBOX_DELAY = 50
-ALU_DELAY = 200
+SB_IN = int(SwitchBoxIO.SB_IN)
+SB_OUT = int(SwitchBoxIO.SB_OUT)
 
 GRAPH_16 = "16bit.graph"
 GRAPH_1 = "1bit.graph"
 
 
+def get_graph_filename(bus_width):
+    return "{0}bit.graph".format(bus_width)
+
+
+def get_lookahead_filename(graph_filename):
+    """the router lookahead of a routing graph is cached next to it"""
+    return graph_filename + ".lookahead"
+
+
 def get_new_coord(x, y, side):
     # this is relative to the (x, y) itself
     if side == 0:
@@ -38,7 +47,84 @@ def is_fu_tile(layout, x, y):
     return layout.get_blk_type(x, y) != ' '
 
 
+def encode_nodes(node_type, x, y, width, track=0, side=0, io=0, name=0):
+    """encodes nodes as rows of RoutingGraph.add_edges. arguments are
+    broadcast against each other"""
+    columns = (int(node_type), x, y, width, track, side, io, name)
+    shape = np.broadcast(*columns[1:]).shape
+    nodes = np.empty(shape + (len(columns), ), dtype=np.uint32)
+    for i, column in enumerate(columns):
+        nodes[..., i] = column
+    return nodes
+
+
+def build_tile_pair_edges(pairs, side1, side2, clb, width, num_track):
+    """edges between the switch boxes of two adjacent tiles, in the same
+    order as adding them track by track. register names are indexed as
+    track * 4 + side. returns (src, dst) arrays"""
+    x1, y1, x2, y2 = [pairs[:, i, None] for i in range(4)]
+    track = np.arange(num_track)[None, :]
+    sb1_out = encode_nodes(NodeType.SwitchBox, x1, y1, width, track, side1,
+                           SB_OUT)
+    sb1_in = encode_nodes(NodeType.SwitchBox, x1, y1, width, track, side1,
+                          SB_IN)
+    sb2_out = encode_nodes(NodeType.SwitchBox, x2, y2, width, track, side2,
+                           SB_OUT)
+    sb2_in = encode_nodes(NodeType.SwitchBox, x2, y2, width, track, side2,
+                          SB_IN)
+    reg1 = encode_nodes(NodeType.Register, x1, y1, width, track,
+                        name=track * 4 + side1)
+    reg2 = encode_nodes(NodeType.Register, x2, y2, width, track,
+                        name=track * 4 + side2)
+    # per track: sb1 -> sb2, sb1 -> reg1 -> sb2, sb2 -> sb1, sb2 -> reg2 -> sb1
+    src = np.stack([sb1_out, sb1_out, reg1, sb2_out, sb2_out, reg2], axis=2)
+    dst = np.stack([sb2_in, reg1, sb2_in, sb1_in, reg2, sb1_in], axis=2)
+    has_reg1 = np.broadcast_to((width == 16) & clb[pairs[:, 0], pairs[:, 1]],
+                               (num_track, len(pairs))).T
+    has_reg2 = np.broadcast_to((width == 16) & clb[pairs[:, 2], pairs[:, 3]],
+                               (num_track, len(pairs))).T
+    true = np.ones_like(has_reg1)
+    mask = np.stack([true, has_reg1, has_reg1, true, has_reg2, has_reg2],
+                    axis=2)
+    return src[mask], dst[mask]
+
+
+def build_port_edges(entries, port_widths, has_tile):
+    """entries are rows of x, y, port name index, port io, width, io, side,
+    track. returns (src, dst, widths) arrays"""
+    x, y, name, port_io, width, io, side, track = entries.T
+    port = encode_nodes(NodeType.Port, x, y, port_widths, name=name)
+    sb = encode_nodes(NodeType.SwitchBox, x, y, width, track, side, SB_OUT)
+
+    # the switch box of the adjacent tile drives an incoming track
+    incoming = (port_io == 0) & (io == 0)
+    new_x = x + np.choose(side, [1, 0, -1, 0])
+    new_y = y + np.choose(side, [0, 1, 0, -1])
+    new_side = (side + 2) % 4
+    in_bound = (new_x >= 0) & (new_x < has_tile.shape[0]) & \
+               (new_y >= 0) & (new_y < has_tile.shape[1])
+    valid = ~incoming
+    adjacent = incoming & in_bound
+    valid[adjacent] = has_tile[new_x[adjacent], new_y[adjacent]]
+    sb[adjacent, 1] = new_x[adjacent]
+    sb[adjacent, 2] = new_y[adjacent]
+    sb[adjacent, 5] = new_side[adjacent]
+    # as well as the register on that track
+    reg = encode_nodes(NodeType.Register, sb[:, 1], sb[:, 2], width, track,
+                       name=track * 4 + new_side)
+
+    is_output = port_io != 0
+    src = np.stack([np.where(is_output[:, None], port, sb), reg], axis=1)
+    dst = np.stack([np.where(is_output[:, None], sb, port), port], axis=1)
+    mask = np.stack([valid, valid & incoming & (width == 16)], axis=1)
+    widths = np.stack([width, width], axis=1)
+    return src[mask], dst[mask], widths[mask]
+
+
 def build_routing_graph(routing_resource, layout):
+    """builds the routing graphs as edge arrays, which are added to the
+    graphs with a single add_edges call each. routing_resource is a
+    RoutingResource"""
     # FIXME:
     # read the number of track width from the graph
     g_1 = RoutingGraph()
@@ -57,176 +143,115 @@ def build_routing_graph(routing_resource, layout):
                    get_disjoint_sb_wires(NUM_TRACK))
     sb_1 = Switch(0, 0, NUM_TRACK, 1, SWITCH_ID,
                   get_disjoint_sb_wires(NUM_TRACK))
-    tiles = list(routing_resource.keys())
-    for i in range(2):
-        tiles.sort(key=lambda x: x[i])
-    for x, y in tiles:
-        if not is_fu_tile(layout, x, y):
+
+    fu_tile = np.zeros((layout_width, layout_height), dtype=bool)
+    clb = np.zeros((layout_width, layout_height), dtype=bool)
+    mem_tile = np.zeros((layout_width, layout_height), dtype=bool)
+    for x in range(layout_width):
+        for y in range(layout_height):
+            blk_type = layout.get_blk_type(x, y)
+            fu_tile[x, y] = blk_type != ' '
+            clb[x, y] = blk_type == clb_type
+            mem_tile[x, y] = blk_type == 'm'
+
+    # tiles are sorted by y and then x
+    tile_xs = routing_resource.tiles["x"].astype(np.int64)
+    tile_ys = routing_resource.tiles["y"].astype(np.int64)
+    has_tile = np.zeros((layout_width, layout_height), dtype=bool)
+    for x, y in zip(tile_xs.tolist(), tile_ys.tolist()):
+        if not fu_tile[x, y]:
             continue
-        # if "out" not in routing_resource[(x, y)]["port"]:
-        #    continue
         t1 = Tile(x, y, sb_1)
         t16 = Tile(x, y, sb_16)
         g_1.add_tile(t1)
         g_16.add_tile(t16)
+        has_tile[x, y] = True
 
-    for y in range(layout_height - 1):
-        for x in range(margin, layout_width - margin):
-            if (not is_fu_tile(layout, x, y)) or \
-                    (not is_fu_tile(layout, x, y + 1)):
-                continue
-            if not g_16.has_tile(x, y) or not g_16.has_tile(x, y + 1):
-                continue
-            for width in [1, 16]:
-                if width == 1:
-                    g = g_1
-                else:
-                    g = g_16
-                for track in range(NUM_TRACK):
-                    sb_top = SwitchBoxNode(x, y, width, track,
-                                           SwitchBoxSide.Bottom,
-                                           SwitchBoxIO.SB_OUT)
-                    sb_bottom = SwitchBoxNode(x, y + 1, width, track,
-                                              SwitchBoxSide.Top,
-                                              SwitchBoxIO.SB_IN)
-                    g.add_edge(sb_top, sb_bottom)
-                    # also add reg as well
-                    if width == 16 and layout.get_blk_type(x, y) == clb_type:
-                        reg1 = RegisterNode("reg_" + str(track) + "_"
-                                            + str(gsv(SwitchBoxSide.Bottom)),
-                                            x, y,
-                                            16,
-                                            track)
-                        g.add_edge(sb_top, reg1)
-                        g.add_edge(reg1, sb_bottom)
-
-                    sb_bottom.io = SwitchBoxIO.SB_OUT
-                    sb_top.io = SwitchBoxIO.SB_IN
-                    g.add_edge(sb_bottom, sb_top)
-                    if width == 16 and\
-                       layout.get_blk_type(x, y + 1) == clb_type:
-                        reg2 = RegisterNode("reg_" + str(track) + "_"
-                                            + str(gsv(SwitchBoxSide.Top)),
-                                            x, y + 1,
-                                            16,
-                                            track)
-                        g.add_edge(sb_bottom, reg2)
-                        g.add_edge(reg2, sb_top)
-
-    for y in range(margin, layout_height - margin):
-        # connect from left to right and right to left
-        for x in range(layout_width - 1):
-            if (not is_fu_tile(layout, x, y)) or \
-                    (not is_fu_tile(layout, x + 1, y)):
-                continue
-            if not g_16.has_tile(x, y) or not g_16.has_tile(x + 1, y):
-                continue
-            for width in [1, 16]:
-                if width == 1:
-                    g = g_1
-                else:
-                    g = g_16
-                for track in range(NUM_TRACK):
-                    sb_left = SwitchBoxNode(x, y, width, track,
-                                            SwitchBoxSide.Right,
-                                            SwitchBoxIO.SB_OUT)
-                    sb_right = SwitchBoxNode(x + 1, y, width, track,
-                                             SwitchBoxSide.Left,
-                                             SwitchBoxIO.SB_IN)
-                    g.add_edge(sb_left, sb_right)
-                    # also add reg as well
-                    if width == 16  and layout.get_blk_type(x, y) == clb_type:
-                        reg1 = RegisterNode("reg_" + str(track) + "_"
-                                            + str(gsv(SwitchBoxSide.Right)),
-                                            x, y,
-                                            16,
-                                            track)
-                        g.add_edge(sb_left, reg1)
-                        g.add_edge(reg1, sb_right)
-
-                    sb_right.io = SwitchBoxIO.SB_OUT
-                    sb_left.io = SwitchBoxIO.SB_IN
-                    g.add_edge(sb_right, sb_left)
-                    # also add reg as well
-                    if width == 16 and \
-                            layout.get_blk_type(x + 1, y) == clb_type:
-                        reg2 = RegisterNode("reg_" + str(track) + "_"
-                                            + str(gsv(SwitchBoxSide.Left)),
-                                            x + 1, y,
-                                            16,
-                                            track)
-                        g.add_edge(sb_right, reg2)
-                        g.add_edge(reg2, sb_left)
-    for x, y in tiles:
-        ports = routing_resource[(x, y)]["port"]
-        port_io = routing_resource[(x, y)]["port_io"]
-
-        if not is_fu_tile(layout, x, y):
-            for port in ports:
-                assert len(ports[port]) == 0
-            continue
-        if not g_16.has_tile(x, y):
-            continue
+    # register names are indexed by track * 4 + side, followed by ports
+    names = ["reg_" + str(track) + "_" + str(side)
+             for track in range(NUM_TRACK) for side in range(4)]
+
+    # adjacent tiles, scanned row by row
+    ys, xs = np.mgrid[0:layout_height - 1, margin:layout_width - margin]
+    xs, ys = xs.ravel(), ys.ravel()
+    vertical = np.stack([xs, ys, xs, ys + 1], axis=1)
+    vertical = vertical[has_tile[xs, ys] & has_tile[xs, ys + 1]]
+    ys, xs = np.mgrid[margin:layout_height - margin, 0:layout_width - 1]
+    xs, ys = xs.ravel(), ys.ravel()
+    horizontal = np.stack([xs, ys, xs + 1, ys], axis=1)
+    horizontal = horizontal[has_tile[xs, ys] & has_tile[xs + 1, ys]]
+
+    edges = {1: [], 16: []}
+    for width in edges:
+        edges[width].append(build_tile_pair_edges(
+            vertical, gsv(SwitchBoxSide.Bottom), gsv(SwitchBoxSide.Top), clb,
+            width, NUM_TRACK))
+        edges[width].append(build_tile_pair_edges(
+            horizontal, gsv(SwitchBoxSide.Right), gsv(SwitchBoxSide.Left),
+            clb, width, NUM_TRACK))
 
-        # handling ports
-        # sort them
-        port_names = list(ports.keys())
-        port_names.sort()
-        for port_name in port_names:
-            port = PortNode(port_name, x, y, 0)
-            sb = SwitchBoxNode(0, 0, 0, 0, SwitchBoxSide.Bottom,
-                               SwitchBoxIO.SB_OUT)
-            port_entries = list(ports[port_name])
-            # in-place sort
-            for i in range(4):
-                port_entries.sort(key=lambda x: x[i])
-            for width, io, side, track in port_entries:
-                if width == 16:
-                    g = g_16
-                else:
-                    g = g_1
-                if port.width == 0:
-                    port.width = width
-                else:
-                    assert port.width == width
-                sb.width = width
-                sb.track = track
-                # a lot of complications
-                io_dir = port_io[port_name]
-                if io_dir == 0:
-                    sb.io = SwitchBoxIO.SB_OUT
-                    if io == 0:
-                        # this is coming in, so we need to recalculate the
-                        # coordinates to see where the connection comes from
-                        sb.x, sb.y = get_new_coord(x, y, side)
-                        if not g.has_tile(sb.x, sb.y):
-                            continue
-                        new_side = gos(side)
-                        sb.side = new_side
-                        g.add_edge(sb, port)
-
-                        # we also need to connect the registers
-                        if width == 16:
-                            reg = RegisterNode("reg_" + str(track) + "_"
-                                               + str(gsv(new_side)),
-                                               sb.x, sb.y,
-                                               16,
-                                               track)
-                            g.add_edge(reg, port)
-
-                    else:
-                        sb.x, sb.y = x, y
-                        sb.side = gsi(side)
-                        g.add_edge(sb, port)
-                else:
-                    sb.x, sb.y = x, y
-                    sb.side = gsi(side)
-                    sb.io = SwitchBoxIO.SB_OUT
-                    g.add_edge(port, sb)
+    # port connections. ports are sorted by name within a tile and their
+    # wires by track, side, io and width
+    ports = routing_resource.ports
+    port_tiles = routing_resource.get_port_tiles()
+    counts = np.diff(routing_resource.wire_ptr)
+    is_fu = fu_tile[tile_xs[port_tiles], tile_ys[port_tiles]]
+    assert (counts[~is_fu] == 0).all()
+    # port names are indexed in the order they first show up
+    fu_names = ports["name"][is_fu]
+    _, first_index = np.unique(fu_names, return_index=True)
+    fu_names = fu_names[np.sort(first_index)]
+    name_index = np.zeros(len(routing_resource.port_names), dtype=np.int64)
+    name_index[fu_names] = np.arange(len(fu_names)) + len(names)
+    names.extend([routing_resource.port_names[i] for i in fu_names.tolist()])
+    has_wire = is_fu & (counts > 0)
+    if has_wire.any():
+        wires = routing_resource.port_wires[np.repeat(has_wire, counts)]
+        counts = counts[has_wire]
+        port_tiles = np.repeat(port_tiles[has_wire], counts)
+        port_keys = np.repeat(ports[has_wire], counts)
+        entries = np.stack([tile_xs[port_tiles], tile_ys[port_tiles],
+                            name_index[port_keys["name"]], port_keys["io"],
+                            wires["bus"], wires["io"], wires["side"],
+                            wires["track"]], axis=1).astype(np.int64)
+        # the port width is determined by its first entry
+        port_widths = entries[np.cumsum(counts) - counts, 4]
+        port_widths = np.repeat(port_widths, counts)
+        assert (entries[:, 4] == port_widths).all()
+        src, dst, widths = build_port_edges(entries, port_widths, has_tile)
+        for width in edges:
+            edges[width].append((src[widths == width],
+                                 dst[widths == width]))
+
+    for width, g in ((1, g_1), (16, g_16)):
+        src = np.concatenate([e[0] for e in edges[width]])
+        dst = np.concatenate([e[1] for e in edges[width]])
+        g.add_edges(src, dst, names)
+        annotate_delays(g, clb, mem_tile)
 
     return g_1, g_16
 
 
+def annotate_delays(g, clb, mem_tile, timing_info=TIMING_INFO):
+    """sets the node delays used by timing-driven routing from the same table
+    the timing analyzer uses. the delay of a functional unit is put on its
+    outputs. the op of a PE is unknown here, so every PE is an alu"""
+    # switch box muxes sit on the outputs
+    g.set_sb_delays(SwitchBoxIO.SB_IN, 0)
+    g.set_sb_delays(SwitchBoxIO.SB_OUT, timing_info["sb"])
+    g.set_delays(NodeType.Register, timing_info["reg"])
+    g.set_delays(NodeType.Port, timing_info["cb"])
+    for x, y in g:
+        if clb[x, y]:
+            delay = timing_info["alu"]
+        elif mem_tile[x, y]:
+            delay = timing_info["mem"]
+        else:
+            continue
+        for port_name in g[x, y].output_ports():
+            g.get_port(x, y, port_name).set_delay(delay)
+
+
 def main():
     parser = ArgumentParser("CGRA graph creation")
     parser.add_argument("-i", "--input", help="CGRA info file",
@@ -239,11 +264,19 @@ def main():
                                                  "if the output file exists",
                         required=False, default=False, action="store_true",
                         dest="override_graph")
+    parser.add_argument("-b", "--binary", help="Write the graphs in the " +
+                        "binary format, which the router loads much faster",
+                        required=False, default=False, action="store_true",
+                        dest="binary")
 
     args = parser.parse_args()
     cgra_filename = args.cgra_filename
     graph_dirname = args.graph_dirname
     override_graph = args.override_graph
+    if args.binary:
+        dump_graph = pycyclone.io.dump_routing_graph_binary
+    else:
+        dump_graph = pycyclone.io.dump_routing_graph
 
     # if the directory doesn't exit, create one
     if not os.path.isdir(graph_dirname):
@@ -252,18 +285,33 @@ def main():
 
     g_16_filename = os.path.join(graph_dirname, GRAPH_16)
     g_1_filename = os.path.join(graph_dirname, GRAPH_1)
-    if os.path.isfile(g_16_filename) and not override_graph:
-        print("found existing", g_16_filename, "skipped.")
-        exit(0)
-    elif os.path.isfile(g_16_filename):
-        print("override existing graph file")
-
-    layout = parse_cgra(cgra_filename)["CGRA"]
-    raw_routing_resource = parse_routing_resource(cgra_filename)
-    routing_resource = build_routing_resource(raw_routing_resource)
-    g_1, g_16 = build_routing_graph(routing_resource, layout)
-    pycyclone.io.dump_routing_graph(g_16, g_16_filename)
-    pycyclone.io.dump_routing_graph(g_1, g_1_filename)
+    graph_filenames = [g_1_filename, g_16_filename]
+    if not is_cache_enabled():
+        if os.path.isfile(g_16_filename) and not override_graph:
+            print("found existing", g_16_filename, "skipped.")
+            exit(0)
+        elif os.path.isfile(g_16_filename):
+            print("override existing graph file")
+    else:
+        cache = StageCache()
+        root_dir = os.path.dirname(os.path.abspath(__file__))
+        key = cache.key("graph", inputs=[cgra_filename],
+                        params={"binary": args.binary},
+                        tools=[os.path.abspath(__file__),
+                               os.path.join(root_dir, "arch"),
+                               pycyclone.__file__])
+        if not override_graph and cache.fetch(key, graph_filenames):
+            print("restored", g_1_filename, g_16_filename, "from cache")
+            exit(0)
+
+    arch_model = ArchModel(cgra_filename)
+    g_1, g_16 = build_routing_graph(arch_model.routing_resource,
+                                    arch_model.get_layout())
+    dump_graph(g_16, g_16_filename)
+    dump_graph(g_1, g_1_filename)
+
+    if is_cache_enabled():
+        cache.store(key, graph_filenames)
 
     print("graph saved to", g_1_filename, g_16_filename)
 
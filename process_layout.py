@@ -1,7 +1,9 @@
 from __future__ import print_function
-from arch.arch import parse_cgra
+from arch import ArchModel
+import pythunder
 from pythunder.io import dump_layout
 from argparse import ArgumentParser
+from stage_cache import StageCache, is_cache_enabled
 import os
 
 
@@ -22,11 +24,24 @@ def main():
     cgra_filename = args.cgra_filename
     layout_filename = args.layout_filename
     override_layout = args.override_layout
-    if os.path.isfile(layout_filename) and not override_layout:
-        print("found existing", layout_filename, "skipped")
-        exit()
-    layout = parse_cgra(cgra_filename)["CGRA"]
+    if not is_cache_enabled():
+        if os.path.isfile(layout_filename) and not override_layout:
+            print("found existing", layout_filename, "skipped")
+            exit()
+    else:
+        cache = StageCache()
+        root_dir = os.path.dirname(os.path.abspath(__file__))
+        key = cache.key("layout", inputs=[cgra_filename],
+                        tools=[os.path.abspath(__file__),
+                               os.path.join(root_dir, "arch"),
+                               pythunder.__file__])
+        if not override_layout and cache.fetch(key, [layout_filename]):
+            print("restored", layout_filename, "from cache")
+            exit()
+    layout = ArchModel(cgra_filename).get_layout()
     dump_layout(layout, layout_filename)
+    if is_cache_enabled():
+        cache.store(key, [layout_filename])
 
 
 if __name__ == "__main__":
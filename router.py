@@ -1,13 +1,167 @@
 from __future__ import print_function
+import csv
+import json
 import sys
 import os
+import shutil
+import tempfile
+import time
 from argparse import ArgumentParser
 import pycyclone
 from pycyclone import GlobalRouter, SwitchBoxIO, Switch
 from pycyclone.io import load_placement, load_netlist, setup_router_input
 from pycyclone.io import load_routing_graph
 
-from process_graph import GRAPH_16, GRAPH_1
+from process_graph import get_graph_filename, get_lookahead_filename
+
+ROUTING_MODES = ("serial", "thread", "process")
+ITERATION_STATS_FIELDS = ("bus_width", "iteration", "overused_nodes",
+                          "max_occupancy", "wirelength", "nets_rerouted",
+                          "num_expansions", "duration", "critical_path_delay")
+
+
+def get_fmax(critical_path_delay):
+    """estimated max clock frequency in MHz. node delays are in ps. the
+    routing graph times every PE as an alu, use analyzer.py for the fmax of
+    the design"""
+    if critical_path_delay <= 0:
+        return float("inf")
+    return 1e6 / critical_path_delay
+
+
+def get_iteration_stats(router, bus_width):
+    """per-iteration convergence records of a router as a list of dicts"""
+    records = []
+    for stats in router.get_iteration_stats():
+        record = {"bus_width": bus_width}
+        for field in ITERATION_STATS_FIELDS[1:]:
+            record[field] = getattr(stats, field)
+        records.append(record)
+    return records
+
+
+def write_iteration_stats(records, filename):
+    """writes the records as CSV if filename ends with .csv, otherwise as
+    JSON"""
+    if filename.endswith(".csv"):
+        with open(filename, "w") as f:
+            writer = csv.DictWriter(f, fieldnames=ITERATION_STATS_FIELDS)
+            writer.writeheader()
+            writer.writerows(records)
+    else:
+        with open(filename, "w") as f:
+            json.dump(records, f, indent=2)
+
+
+def route_graph(packed_filename, placement_filename, graph_filename,
+                bus_width, route_filename, lookahead=False, num_threads=1,
+                incremental=False, timing_driven=False):
+    """routes the nets of a single bus width and dumps the result to
+    route_filename. returns the number of nets, the setup/routing time, the
+    iteration stats and the error message if the routing failed"""
+    start = time.time()
+    g = load_routing_graph(graph_filename)
+    r = GlobalRouter(40, g)
+    setup_router_input(r, packed_filename, placement_filename, bus_width)
+    # parameter settings
+    r.set_init_pn(10000)
+    r.set_num_threads(num_threads)
+    r.set_incremental(incremental)
+    r.set_timing_driven(timing_driven)
+    if lookahead:
+        r.set_lookahead(get_lookahead_filename(graph_filename))
+    setup_time = time.time() - start
+
+    start = time.time()
+    error = None
+    try:
+        r.route()
+    except RuntimeError as ex:
+        # keep the stats of the failed run
+        error = str(ex)
+    route_time = time.time() - start
+
+    if error is None:
+        pycyclone.io.dump_routing_result(r, route_filename)
+    return len(r.get_netlist()), setup_time, route_time, \
+        get_iteration_stats(r, bus_width), error
+
+
+def route_bus_widths(packed_filename, placement_filename, graph_dirname,
+                     bus_widths, route_file, mode="thread", lookahead=False,
+                     num_threads=1, incremental=False, stats_filename=None,
+                     timing_driven=False):
+    """routes every bus width graph independently. results are merged in the
+    order of bus_widths, so the output is the same for every mode. the
+    iteration stats are written to stats_filename if given"""
+    graph_filenames = []
+    for bus_width in bus_widths:
+        graph_filename = os.path.join(graph_dirname,
+                                      get_graph_filename(bus_width))
+        if not os.path.isfile(graph_filename):
+            raise Exception("Unable to find routing graph " + graph_filename)
+        graph_filenames.append(graph_filename)
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        args_list = []
+        for bus_width, graph_filename in zip(bus_widths, graph_filenames):
+            args_list.append((packed_filename, placement_filename,
+                              graph_filename, bus_width,
+                              os.path.join(tmp_dir, str(bus_width)),
+                              lookahead, num_threads, incremental,
+                              timing_driven))
+
+        start = time.time()
+        if mode == "serial":
+            stats = [route_graph(*args) for args in args_list]
+        else:
+            if mode == "thread":
+                # route() releases the GIL
+                from concurrent.futures import ThreadPoolExecutor as Pool
+            elif mode == "process":
+                from concurrent.futures import ProcessPoolExecutor as Pool
+            else:
+                raise Exception("Unknown routing mode " + mode)
+            pool = Pool(len(args_list))
+            futures = [pool.submit(route_graph, *args) for args in args_list]
+            stats = [future.result() for future in futures]
+            pool.shutdown()
+        total_time = time.time() - start
+
+        if stats_filename is not None:
+            records = []
+            for result in stats:
+                records += result[3]
+            print("saving iteration stats to", stats_filename)
+            write_iteration_stats(records, stats_filename)
+        for bus_width, result in zip(bus_widths, stats):
+            if result[4] is not None:
+                raise Exception("Failed to route bus width " +
+                                str(bus_width) + ": " + result[4])
+
+        if os.path.isfile(route_file):
+            print("removing existing", route_file)
+            os.remove(route_file)
+        print("saving result to", route_file)
+        with open(route_file, "w+") as f:
+            for args in args_list:
+                with open(args[4]) as route_f:
+                    shutil.copyfileobj(route_f, f)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    print("{0:>10}{1:>8}{2:>12}{3:>12}{4:>12}{5:>12}".format(
+        "bus width", "nets", "setup (s)", "route (s)", "wirelength",
+        "est. fmax"))
+    for bus_width, (num_nets, setup_time, route_time, records, _) in \
+            zip(bus_widths, stats):
+        last = records[-1] if records else {"wirelength": 0,
+                                            "critical_path_delay": 0}
+        print("{0:>10}{1:>8}{2:>12.2f}{3:>12.2f}{4:>12}{5:>12.1f}".format(
+            bus_width, num_nets, setup_time, route_time, last["wirelength"],
+            get_fmax(last["critical_path_delay"])))
+    print("Routing takes", total_time, "seconds")
 
 
 def main():
@@ -24,42 +178,45 @@ def main():
     parser.add_argument("-p", "--placement", help="Placement file",
                         required=True, action="store",
                         dest="placement_filename")
+    parser.add_argument("-w", "--width", help="Bus widths to route. Each " +
+                        "one needs a <width>bit.graph in the graph folder",
+                        default=[1, 16], type=int, nargs="+", action="store",
+                        dest="bus_widths")
+    parser.add_argument("-m", "--mode", help="Route the bus width graphs " +
+                        "one after another, or concurrently in threads or " +
+                        "processes", choices=ROUTING_MODES, default="thread",
+                        action="store", dest="mode")
+    parser.add_argument("-l", "--lookahead", help="Use a precomputed A* " +
+                        "lookahead, which is cached next to each routing " +
+                        "graph", action="store_true", default=False,
+                        dest="lookahead")
+    parser.add_argument("-t", "--threads", help="Number of threads to route " +
+                        "the nets of each bus width with. Results are the " +
+                        "same for any number of threads above one",
+                        default=1, type=int, action="store",
+                        dest="num_threads")
+    parser.add_argument("-r", "--incremental", help="Only rip up the nets " +
+                        "on overused nodes after the first iteration",
+                        action="store_true", default=False,
+                        dest="incremental")
+    parser.add_argument("-T", "--timing", help="Route critical pin pairs " +
+                        "for delay, using the node delays of the routing " +
+                        "graphs", action="store_true", default=False,
+                        dest="timing_driven")
+    parser.add_argument("-s", "--stats", help="Write the convergence of " +
+                        "every routing iteration to a JSON file, or CSV " +
+                        "if it ends with .csv", action="store", default=None,
+                        dest="stats_filename")
 
     args = parser.parse_args()
 
-    packed_filename = args.packed_filename
-    route_file = args.route_file
-    graph_dirname = args.graph_dirname
-
     print("reading input files and constructing routing graph")
-    placement_filename = args.placement_filename
-    g1_filename = os.path.join(graph_dirname, GRAPH_1)
-    g16_filename = os.path.join(graph_dirname, GRAPH_16)
-
-    g_1 = load_routing_graph(g1_filename)
-    g_16 = load_routing_graph(g16_filename)
-
-    r_1 = GlobalRouter(40, g_1)
-    r_16 = GlobalRouter(40, g_16)
-
-    setup_router_input(r_1, packed_filename, placement_filename, 1)
-    setup_router_input(r_16, packed_filename, placement_filename, 16)
-
-    # parameter settings
-    r_1.set_init_pn(10000)
-    r_16.set_init_pn(10000)
-
-    # route these nets
     print("start routing")
-    r_1.route()
-    r_16.route()
-
-    if os.path.isfile(route_file):
-        print("removing existing", route_file)
-        os.remove(route_file)
-    print("saving result to", route_file)
-    pycyclone.io.dump_routing_result(r_1, route_file)
-    pycyclone.io.dump_routing_result(r_16, route_file)
+    route_bus_widths(args.packed_filename, args.placement_filename,
+                     args.graph_dirname, args.bus_widths, args.route_file,
+                     args.mode, args.lookahead, args.num_threads,
+                     args.incremental, args.stats_filename,
+                     args.timing_driven)
 
 
 if __name__ == "__main__":
@@ -50,5 +50,16 @@ if ! [ -f "$route" ] ; then
 fi
 
 netlist="${packed%.packed}.json"
-python ${root_dir}/bitstream.py ${option} -c ${cgra} -n ${netlist} \
-                                -i ${packed} -p ${place} -r ${route} -o ${bsb}
+# only regenerate the nets that changed since the last bitstream
+previous=""
+if [ -f "${bsb}" ] && [ -f "${bsb}.idx" ]; then
+    previous="--previous ${bsb}"
+fi
+# stages are skipped if their inputs are unchanged. see stage_cache.py
+python ${root_dir}/stage_cache.py run -s bitstream -i ${cgra} -i ${netlist} \
+    -i ${packed} -i ${place} -i ${route} -p "option=${option}" \
+    -t ${root_dir}/bitstream.py -t ${root_dir}/arch -o ${bsb} \
+    -o ${bsb}.idx -o ${bsb}.json -- \
+    python ${root_dir}/bitstream.py ${option} -c ${cgra} -n ${netlist} \
+                                    -i ${packed} -p ${place} -r ${route} \
+                                    -o ${bsb} ${previous}
@@ -20,6 +20,8 @@ function detect_garnet() {
 
 file_dir=$(dirname "$(realpath $0)")
 root_dir=$(realpath ${file_dir}/../)
+# stages are skipped if their inputs are unchanged. see stage_cache.py
+cache="python ${root_dir}/stage_cache.py run"
 
 if [ "$#" -eq 2 ]; then
     cgra=$1
@@ -57,8 +59,16 @@ placer=${root_dir}/thunder/build/example/placer
 
 if [ -f ${placer} ]; then
     echo "Using C++ implementation"
-    ${placer} ${layout} ${packed} ${place}
+    ${cache} -s place -i ${layout} -i ${packed} -t ${placer} -o ${place} -- \
+        ${placer} ${layout} ${packed} ${place}
 else
     echo "Using Python binding"
-    python ${root_dir}/place.py --layout ${layout} -i ${packed} -o ${place} --no-vis ${option}
+    # the extension module is part of the placer's version
+    pythunder=$(python -c "import pythunder; print(pythunder.__file__)" \
+        2> /dev/null || true)
+    ${cache} -s place -i ${layout} -i ${packed} -p "option=${option}" \
+        -t ${root_dir}/place.py -t ${root_dir}/util.py -t ${root_dir}/arch \
+        -t "${pythunder}" -o ${place} -- \
+        python ${root_dir}/place.py --layout ${layout} -i ${packed} \
+            -o ${place} --no-vis ${option}
 fi
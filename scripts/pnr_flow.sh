@@ -49,10 +49,14 @@ fi
 
 BASEDIR=$(dirname "$0")
 packed="${netlist%.json}.packed"
+# stages are skipped if their inputs are unchanged. see stage_cache.py
+cache="python ${BASEDIR}/../stage_cache.py run"
 
 # assume user already have the env activated
 # pack
-python ${BASEDIR}/../packer.py -n ${netlist} -o ${packed} ${option}
+${cache} -s pack -i ${netlist} -p "option=${option}" \
+    -t ${BASEDIR}/../packer.py -t ${BASEDIR}/../arch -o ${packed} -- \
+    python ${BASEDIR}/../packer.py -n ${netlist} -o ${packed} ${option}
 
 # detect if the cgra file is cgra_info from CGRAGenerator or from garnet
 detect_garnet ${cgra}
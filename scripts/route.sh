@@ -21,6 +21,8 @@ function detect_garnet() {
 file_dir=$(dirname "$(realpath $0)")
 root_dir=$(realpath $file_dir/../)
 router=${root_dir}/cyclone/build/example/router
+# stages are skipped if their inputs are unchanged. see stage_cache.py
+cache="python ${root_dir}/stage_cache.py run"
 
 if [ "$#" -eq 2 ]; then
     cgra=$1
@@ -58,24 +60,44 @@ if [ ${is_garnet} -eq "1" ]; then
         exit 1
     fi
     graphs=$(awk -F "=" '/graph/ {print $2}' ${cgra})
-    ${router} ${packed} ${place} ${graphs[@]} ${route}
+    graph_inputs=""
+    for graph in ${graphs[@]}; do
+        if [ -f ${graph} ]; then
+            graph_inputs="${graph_inputs} -i ${graph}"
+        fi
+    done
+    ${cache} -s route -i ${packed} -i ${place} ${graph_inputs} \
+        -p "graphs=${graphs[*]}" -t ${router} -o ${route} -- \
+        ${router} --parallel ${packed} ${place} ${graphs[@]} ${route}
     echo "Save result to ${route}"
 else
     # dump the graph files
     graph_dir=$(dirname ${packed})
-    python ${root_dir}/process_graph.py -i ${cgra} -o ${graph_dir}
+    python ${root_dir}/process_graph.py -i ${cgra} -o ${graph_dir} --binary
 
 
     # if the C++ binary exists, we will use it instead
     if [ -f ${router} ]; then
         echo "Using C++ implementation"
         rm -rf ${route}
-        ${router} ${packed} ${place} 1 ${graph_dir}/1bit.graph \
-            16 ${graph_dir}/16bit.graph ${route}
+        ${cache} -s route -i ${packed} -i ${place} \
+            -i ${graph_dir}/1bit.graph -i ${graph_dir}/16bit.graph \
+            -t ${router} -o ${route} -- \
+            ${router} --parallel ${packed} ${place} \
+                1 ${graph_dir}/1bit.graph \
+                16 ${graph_dir}/16bit.graph ${route}
     else
         echo "Using Python binding. Results may be undeterministic."
         echo "To use C++ implementation, do ${root_dir}/cyclone/install.sh"
-        python ${root_dir}/router.py ${option} -g ${graph_dir} -i ${packed} -p ${place} -o ${route}
+        # the extension module is part of the router's version
+        pycyclone=$(python -c "import pycyclone; print(pycyclone.__file__)" \
+            2> /dev/null || true)
+        ${cache} -s route -i ${packed} -i ${place} \
+            -i ${graph_dir}/1bit.graph -i ${graph_dir}/16bit.graph \
+            -p "option=${option}" -t ${root_dir}/router.py \
+            -t ${root_dir}/arch -t "${pycyclone}" -o ${route} -- \
+            python ${root_dir}/router.py ${option} -g ${graph_dir} \
+                -i ${packed} -p ${place} -o ${route}
     fi
 fi
 
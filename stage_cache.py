@@ -0,0 +1,203 @@
+"""
+Content-addressed cache for the PnR flow stages. Each stage's artifacts are
+keyed on a hash of its input files, parameters and tool sources/binaries, and
+stored under the cache directory ($CGRA_PNR_CACHE, ~/.cache/cgra_pnr by
+default). The cache is bounded by $CGRA_PNR_CACHE_SIZE (in MB) and evicts the
+least recently used entries. Set $CGRA_PNR_NO_CACHE to disable it.
+
+Shell usage, which runs the command only on a cache miss:
+    python stage_cache.py run -s <stage> -i <input> ... -p <param> ... \
+        -t <tool> ... -o <output> ... -- <command>
+"""
+from __future__ import print_function
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from argparse import ArgumentParser
+
+# bump it whenever the layout of the cache or the key changes
+CACHE_VERSION = 1
+DEFAULT_CACHE_SIZE = 1024
+MANIFEST = "manifest.json"
+
+
+def hash_file(filename, h=None, chunk_size=1 << 20):
+    if h is None:
+        h = hashlib.sha256()
+    with open(filename, "rb") as f:
+        data = f.read(chunk_size)
+        while data:
+            h.update(data)
+            data = f.read(chunk_size)
+    return h
+
+
+def hash_path(path, h):
+    """hashes a file, or every file under a directory in sorted order"""
+    if os.path.isfile(path):
+        h.update(os.path.basename(path).encode("utf-8"))
+        hash_file(path, h)
+        return
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        dirs[:] = [d for d in dirs if d != "__pycache__" and d[0] != "."]
+        for filename in sorted(files):
+            if filename.endswith(".pyc"):
+                continue
+            full_path = os.path.join(root, filename)
+            h.update(os.path.relpath(full_path, path).encode("utf-8"))
+            hash_file(full_path, h)
+
+
+def is_cache_enabled():
+    return not os.environ.get("CGRA_PNR_NO_CACHE")
+
+
+class StageCache(object):
+    def __init__(self, cache_dir=None, max_size=None):
+        if cache_dir is None:
+            cache_dir = os.environ.get("CGRA_PNR_CACHE", os.path.join(
+                os.path.expanduser("~"), ".cache", "cgra_pnr"))
+        if max_size is None:
+            max_size = int(os.environ.get("CGRA_PNR_CACHE_SIZE",
+                                          DEFAULT_CACHE_SIZE))
+        self.cache_dir = cache_dir
+        # in bytes
+        self.max_size = max_size * (1 << 20)
+
+    @staticmethod
+    def key(stage, inputs=(), params=None, tools=()):
+        h = hashlib.sha256()
+        h.update("{0}:{1}".format(CACHE_VERSION, stage).encode("utf-8"))
+        for filename in inputs:
+            h.update(b"\x00input")
+            hash_file(filename, h)
+        if params is not None:
+            h.update(b"\x00params")
+            h.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+        for path in tools:
+            h.update(b"\x00tool")
+            if os.path.exists(path):
+                hash_path(path, h)
+            else:
+                # e.g. a version string
+                h.update(str(path).encode("utf-8"))
+        return h.hexdigest()
+
+    def __entry_dir(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def fetch(self, key, outputs):
+        """copies the cached artifacts to outputs. returns False on a miss"""
+        entry_dir = self.__entry_dir(key)
+        manifest_filename = os.path.join(entry_dir, MANIFEST)
+        if not os.path.isfile(manifest_filename):
+            return False
+        try:
+            with open(manifest_filename) as f:
+                num_outputs = json.load(f)["num_outputs"]
+            if num_outputs != len(outputs):
+                return False
+            for i, output in enumerate(outputs):
+                shutil.copyfile(os.path.join(entry_dir, str(i)), output)
+            # mark it as recently used
+            os.utime(entry_dir, None)
+        except (IOError, OSError):
+            # evicted by a concurrent flow
+            return False
+        return True
+
+    def store(self, key, outputs):
+        entry_dir = self.__entry_dir(key)
+        parent_dir = os.path.dirname(entry_dir)
+        if not os.path.isdir(parent_dir):
+            os.makedirs(parent_dir)
+        # stage in a temp dir so that concurrent flows never see a partial
+        # entry
+        tmp_dir = tempfile.mkdtemp(dir=parent_dir)
+        for i, output in enumerate(outputs):
+            shutil.copyfile(output, os.path.join(tmp_dir, str(i)))
+        with open(os.path.join(tmp_dir, MANIFEST), "w+") as f:
+            json.dump({"num_outputs": len(outputs),
+                       "outputs": [os.path.basename(o) for o in outputs]}, f)
+        try:
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            # someone else stored the same entry
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        total_size = 0
+        if not os.path.isdir(self.cache_dir):
+            return
+        for prefix in os.listdir(self.cache_dir):
+            prefix_dir = os.path.join(self.cache_dir, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for key in os.listdir(prefix_dir):
+                if len(key) != 64:
+                    # entries that are being stored
+                    continue
+                entry_dir = os.path.join(prefix_dir, key)
+                size = sum([os.path.getsize(os.path.join(entry_dir, f))
+                            for f in os.listdir(entry_dir)])
+                entries.append((os.path.getmtime(entry_dir), size, entry_dir))
+                total_size += size
+        entries.sort()
+        for _, size, entry_dir in entries:
+            if total_size <= self.max_size:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total_size -= size
+
+
+def run_cached(stage, command, inputs, outputs, params=None, tools=()):
+    """runs the command unless its outputs are in the cache"""
+    if not is_cache_enabled():
+        return subprocess.call(command)
+    cache = StageCache()
+    key = cache.key(stage, inputs, params, tools)
+    if cache.fetch(key, outputs):
+        print("[cache] {0}: restored".format(stage),
+              ", ".join(outputs))
+        return 0
+    ret = subprocess.call(command)
+    if ret == 0:
+        cache.store(key, outputs)
+    return ret
+
+
+def main():
+    argv = sys.argv[1:]
+    if "--" not in argv:
+        print("[Usage]:", sys.argv[0], "run <options> -- <command>",
+              file=sys.stderr)
+        exit(1)
+    index = argv.index("--")
+    argv, command = argv[:index], argv[index + 1:]
+    parser = ArgumentParser("CGRA PnR stage cache")
+    parser.add_argument("action", choices=["run"])
+    parser.add_argument("-s", "--stage", help="Stage name", required=True,
+                        action="store", dest="stage")
+    parser.add_argument("-i", "--input", help="Input file", default=[],
+                        action="append", dest="inputs")
+    parser.add_argument("-o", "--output", help="Output file", default=[],
+                        action="append", dest="outputs", required=True)
+    parser.add_argument("-p", "--param", help="Parameter, e.g. seed=0",
+                        default=[], action="append", dest="params")
+    parser.add_argument("-t", "--tool", help="Tool file, directory or " +
+                        "version string", default=[], action="append",
+                        dest="tools")
+    args = parser.parse_args(argv)
+    exit(run_cached(args.stage, command, args.inputs, args.outputs,
+                    sorted(args.params), args.tools))
+
+
+if __name__ == "__main__":
+    main()
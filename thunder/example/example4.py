@@ -0,0 +1,66 @@
+from __future__ import print_function, division
+import random
+import threading
+import time
+import pythunder
+
+SIZE = 24
+NUM_BLOCKS = 300
+NUM_NETS = 400
+
+
+def create_placer(seed):
+    rand = random.Random(seed)
+    layout = pythunder.Layout()
+    layer = pythunder.Layer('p', SIZE, SIZE)
+    for x in range(SIZE):
+        for y in range(SIZE):
+            layer.mark_available(x, y)
+    layout.add_layer(layer)
+    # the detailed placer also looks up the register layer, the same as PE
+    reg_layer = pythunder.Layer(layer)
+    reg_layer.blk_type = 'r'
+    layout.add_layer(reg_layer)
+
+    blocks = ["p" + str(i) for i in range(NUM_BLOCKS)]
+    netlist = {}
+    for i in range(NUM_NETS):
+        netlist["e" + str(i)] = rand.sample(blocks, rand.randint(2, 4))
+    placer = pythunder.DetailedPlacer(blocks, netlist,
+                                      layout.produce_available_pos(), {},
+                                      'p', True)
+    placer.set_seed(seed)
+    return placer
+
+
+def place(placer):
+    placer.anneal()
+
+
+def main():
+    # two independent placers, first one after another then in two threads.
+    # anneal releases the GIL so the threaded run should take about half the
+    # time on a multi-core machine
+    placers = [create_placer(i) for i in range(2)]
+    start = time.time()
+    for placer in placers:
+        place(placer)
+    serial_time = time.time() - start
+
+    placers = [create_placer(i) for i in range(2)]
+    threads = [threading.Thread(target=place, args=(placer,))
+               for placer in placers]
+    start = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    threaded_time = time.time() - start
+
+    print("serial:  ", serial_time, "seconds")
+    print("threaded:", threaded_time, "seconds")
+    print("speedup: ", serial_time / threaded_time)
+
+
+if __name__ == "__main__":
+    main()
@@ -115,10 +115,15 @@ void init_pythunder(py::module &m) {
                     ::map<::string, ::pair<int, int>>,
                     char,
                     bool>())
-            .def("anneal", &SimAnneal::anneal)
+            // long-running calls release the GIL so that placers can run
+            // concurrently in Python threads
+            .def("anneal", &SimAnneal::anneal,
+                 py::call_guard<py::gil_scoped_release>())
             .def("realize", &DetailedPlacer::realize)
-            .def("refine", &SimAnneal::refine)
-            .def("estimate", &DetailedPlacer::estimate)
+            .def("refine", &SimAnneal::refine,
+                 py::call_guard<py::gil_scoped_release>())
+            .def("estimate", &DetailedPlacer::estimate,
+                 py::call_guard<py::gil_scoped_release>())
             .def("set_seed", &DetailedPlacer::set_seed)
             .def_readwrite("steps", &DetailedPlacer::steps)
             .def_readwrite("tmax", &DetailedPlacer::tmax)
@@ -131,7 +136,8 @@ void init_pythunder(py::module &m) {
                     std::map<std::string, std::pair<int, int>>,
                     char,
                     bool>())
-            .def("anneal", &VPRPlacer::anneal)
+            .def("anneal", &VPRPlacer::anneal,
+                 py::call_guard<py::gil_scoped_release>())
             .def("realize", &VPRPlacer::realize);
 
     py::class_<GlobalPlacer>(m, "GlobalPlacer")
@@ -139,9 +145,11 @@ void init_pythunder(py::module &m) {
                     std::map<std::string, std::vector<std::string>>,
                     std::map<std::string, std::pair<int, int>>,
                     const Layout&>())
-            .def("solve", &GlobalPlacer::solve)
+            .def("solve", &GlobalPlacer::solve,
+                 py::call_guard<py::gil_scoped_release>())
             .def("realize", &GlobalPlacer::realize)
-            .def("anneal", &SimAnneal::anneal)
+            .def("anneal", &SimAnneal::anneal,
+                 py::call_guard<py::gil_scoped_release>())
             .def("set_seed", &GlobalPlacer::set_seed)
             .def_readwrite("anneal_param_factor",
                            &GlobalPlacer::anneal_param_factor)
@@ -154,14 +162,17 @@ void init_detailed_placement(py::module &m) {
             const ::map<::string, ::map<char, std::set<std::pair<int, int>>>>&,
             const ::map<::string, ::map<std::string, std::vector<std::string>>>&,
             const ::map<::string, ::map<std::string, std::pair<int, int>>>&,
-            char, bool>(&multi_place))
+            char, bool>(&multi_place),
+            py::call_guard<py::gil_scoped_release>())
       .def("detailed_placement",
              py::overload_cast<const ::map<::string, std::set<std::string>>&,
              const ::map<::string, ::map<char, std::set<std::pair<int, int>>>>&,
              const ::map<::string, ::map<::string, std::vector<std::string>>>&,
              const ::map<::string, ::map<::string, std::pair<int, int>>>&,
-             char, bool, uint32_t>(&multi_place))
-      .def("detailed_placement", &detailed_placement);
+             char, bool, uint32_t>(&multi_place),
+             py::call_guard<py::gil_scoped_release>())
+      .def("detailed_placement", &detailed_placement,
+           py::call_guard<py::gil_scoped_release>());
 }
 
 PYBIND11_MODULE(pythunder, m) {
@@ -3,7 +3,9 @@
 #include <iostream>
 #include <fstream>
 #include <algorithm>
+#include <cstring>
 #include <functional>
+#include <iterator>
 #include <sstream>
 #include <unordered_set>
 
@@ -71,11 +73,142 @@ inline bool exists(const std::string &filename) {
     return tokens;
 }
 
+// binary packed netlist, see arch/packed_binary.py for the layout
+constexpr char PACKED_MAGIC[] = "CGRAPKD";
+constexpr uint32_t PACKED_VERSION = 1;
+
+bool is_packed_binary(const ::string &filename) {
+    ::ifstream in(filename, std::ios::binary);
+    char magic[sizeof(PACKED_MAGIC)] = {};
+    in.read(magic, sizeof(magic));
+    return in.gcount() == sizeof(magic) &&
+           std::equal(magic, magic + sizeof(magic), PACKED_MAGIC);
+}
+
+class PackedBinary {
+public:
+    explicit PackedBinary(const ::string &filename) {
+        ::ifstream in(filename, std::ios::binary);
+        buffer_.assign(std::istreambuf_iterator<char>(in),
+                       std::istreambuf_iterator<char>());
+        if (read_u32(sizeof(PACKED_MAGIC)) > PACKED_VERSION)
+            throw ::runtime_error("unsupported packed file version");
+        uint32_t num_sections = read_u32(sizeof(PACKED_MAGIC) + 4);
+        uint64_t pos = sizeof(PACKED_MAGIC) + 8;
+        for (uint32_t i = 0; i < num_sections; i++) {
+            check(pos + 24);
+            ::string name(buffer_.data() + pos,
+                          strnlen(buffer_.data() + pos, 8));
+            sections_.insert({name, {read_u64(pos + 8),
+                                     read_u64(pos + 16)}});
+            pos += 24;
+        }
+
+        uint64_t blob_pos;
+        auto offsets = arrays("strings", blob_pos)[0];
+        if (offsets.empty())
+            throw ::runtime_error("invalid string table in " + filename);
+        check(blob_pos + offsets.back());
+        strings_.reserve(offsets.size() - 1);
+        for (uint32_t i = 0; i + 1 < offsets.size(); i++) {
+            strings_.emplace_back(buffer_.data() + blob_pos + offsets[i],
+                                  offsets[i + 1] - offsets[i]);
+        }
+    }
+
+    bool has_section(const ::string &name) const {
+        return sections_.find(name) != sections_.end();
+    }
+
+    ::vector<::vector<uint32_t>> arrays(const ::string &name) const {
+        uint64_t end;
+        return arrays(name, end);
+    }
+
+    const ::string &str(uint32_t index) const { return strings_.at(index); }
+
+private:
+    ::string buffer_;
+    ::map<::string, ::pair<uint64_t, uint64_t>> sections_;
+    ::vector<::string> strings_;
+
+    void check(uint64_t end) const {
+        if (end > buffer_.size())
+            throw ::runtime_error("truncated packed file");
+    }
+
+    uint32_t read_u32(uint64_t pos) const {
+        check(pos + 4);
+        uint32_t value;
+        std::memcpy(&value, buffer_.data() + pos, sizeof(value));
+        return value;
+    }
+
+    uint64_t read_u64(uint64_t pos) const {
+        check(pos + 8);
+        uint64_t value;
+        std::memcpy(&value, buffer_.data() + pos, sizeof(value));
+        return value;
+    }
+
+    ::vector<::vector<uint32_t>> arrays(const ::string &name,
+                                        uint64_t &end) const {
+        auto const iter = sections_.find(name);
+        if (iter == sections_.end())
+            throw ::runtime_error("missing section " + name);
+        uint64_t pos = iter->second.first;
+        uint32_t num_arrays = read_u32(pos);
+        ::vector<::vector<uint32_t>> result(num_arrays);
+        end = pos + 4 * (1 + static_cast<uint64_t>(num_arrays));
+        for (uint32_t i = 0; i < num_arrays; i++) {
+            uint32_t length = read_u32(pos + 4 * (1 + i));
+            check(end + 4 * static_cast<uint64_t>(length));
+            result[i].resize(length);
+            std::memcpy(result[i].data(), buffer_.data() + end,
+                        4 * static_cast<uint64_t>(length));
+            end += 4 * static_cast<uint64_t>(length);
+        }
+        return result;
+    }
+};
+
+::pair<::map<::string, ::vector<::pair<::string, ::string>>>,
+       ::map<::string, uint32_t>>
+load_netlist_binary(const ::string &filename) {
+    PackedBinary packed(filename);
+    ::map<::string, ::vector<::pair<::string, ::string>>> netlist;
+    ::map<::string, uint32_t> track_mode;
+
+    auto const nets = packed.arrays("netlists");
+    if (nets.size() != 4)
+        throw ::runtime_error("invalid netlists section in " + filename);
+    auto const &net_names = nets[0];
+    auto const &net_offsets = nets[1];
+    for (uint32_t i = 0; i < net_names.size(); i++) {
+        ::vector<::pair<::string, ::string>> net;
+        for (uint32_t j = net_offsets.at(i); j < net_offsets.at(i + 1); j++) {
+            net.emplace_back(make_pair(packed.str(nets[2].at(j)),
+                                       packed.str(nets[3].at(j))));
+        }
+        netlist.insert({packed.str(net_names[i]), net});
+    }
+
+    if (packed.has_section("trackmd")) {
+        auto const modes = packed.arrays("trackmd");
+        for (uint32_t i = 0; i < modes.at(0).size(); i++)
+            track_mode.insert({packed.str(modes[0][i]), modes.at(1).at(i)});
+    }
+
+    return {netlist, track_mode};
+}
+
 ::pair<::map<::string, ::vector<::pair<::string, ::string>>>,
        ::map<::string, uint32_t>>
 load_netlist(const std::string &filename) {
     if (!::exists(filename))
         throw ::runtime_error(filename + " does not exist");
+    if (::is_packed_binary(filename))
+        return ::load_netlist_binary(filename);
     ::ifstream in;
     in.open(filename);
 
@@ -376,6 +509,15 @@ std::map<std::string, std::string>
 load_id_to_name(const std::string &filename) {
     if (!::exists(filename))
         throw ::runtime_error(filename + " does not exist");
+    if (::is_packed_binary(filename)) {
+        PackedBinary packed(filename);
+        std::map<std::string, std::string> id_to_name;
+        auto const ids = packed.arrays("id2name");
+        for (uint32_t i = 0; i < ids.at(0).size(); i++)
+            id_to_name.insert({packed.str(ids[0][i]),
+                               packed.str(ids.at(1).at(i))});
+        return id_to_name;
+    }
     ::ifstream in;
     in.open(filename);
 
@@ -9,7 +9,8 @@ def reduce_cluster_graph(netlists, clusters, fixed_blocks,
         cluster_id = 0
         condense_self = True
     else:
-        condense_self = False
+        return reduce_cluster_graphs(netlists, clusters, fixed_blocks,
+                                     [cluster_id])[cluster_id]
     current_cluster = clusters[cluster_id]
     new_netlist = {}
     for net_id in netlists:
@@ -49,6 +50,54 @@ def reduce_cluster_graph(netlists, clusters, fixed_blocks,
     return new_netlist
 
 
+def reduce_cluster_graphs(netlists, clusters, fixed_blocks,
+                          cluster_ids=None):
+    """reduced netlists for all the clusters in a single pass over the nets.
+    blocks outside the cluster are replaced by x<cid> pseudo-nodes of the
+    cluster they belong to, unless they are fixed.
+    returns {cluster_id: netlist}"""
+    if cluster_ids is None:
+        cluster_ids = list(clusters.keys())
+    # block -> clusters that contain it, in clusters order
+    blk_clusters = {}
+    for cid in clusters:
+        for blk_id in clusters[cid]:
+            if blk_id not in blk_clusters:
+                blk_clusters[blk_id] = [cid]
+            else:
+                blk_clusters[blk_id].append(cid)
+    wanted = set(cluster_ids)
+    result = {}
+    for cid in cluster_ids:
+        result[cid] = {}
+    for net_id in netlists:
+        netlist = []
+        netlist_set = set()
+        for blk_id in netlists[net_id]:
+            if blk_id not in netlist_set:
+                netlist.append(blk_id)
+                netlist_set.add(blk_id)
+        # clusters touched by this net
+        touched = []
+        for blk_id in netlist:
+            for cid in blk_clusters.get(blk_id, []):
+                if cid in wanted and cid not in touched:
+                    touched.append(cid)
+        for cid in touched:
+            new_net = []
+            for blk_id in netlist:
+                blk_cids = blk_clusters.get(blk_id, [])
+                if cid in blk_cids or blk_id in fixed_blocks:
+                    new_net.append(blk_id)
+                elif len(blk_cids) > 0:
+                    # we use "x" for clusters
+                    new_net.append("x" + str(blk_cids[0]))
+                else:
+                    raise Exception("not found blk", blk_id)
+            result[cid][net_id] = new_net
+    return result
+
+
 def compute_centroid(cluster_cells):
     if type(cluster_cells) == list or type(cluster_cells) == set:
         x_sum = 0
@@ -97,9 +97,9 @@ def visualize_clustering_cgra(layout, cluster_cells):
 
 
 def visualize_board(cgra_file):
-    from arch import parse_cgra
+    from arch import ArchModel
     color_index = "imoprI"
-    layout = parse_cgra(cgra_file)["CGRA"]
+    layout = ArchModel(cgra_file).get_layout()
     scale = 30
     height, width = layout.height(), layout.width()
     im, draw = draw_board(width, height, scale)
@@ -138,10 +138,10 @@ def main():
     input_file = sys.argv[3]
     basename = os.path.basename(input_file)
     design_name, ext = os.path.splitext(basename)
-    from arch import parse_cgra
+    from arch import ArchModel
     from arch import load_packed_file
     _, _, _, changed_pe = load_packed_file(packed_file)
-    board_meta = parse_cgra(cgra_info)["CGRA"]
+    board_meta = ArchModel(cgra_info).get_layout()
     if ext == ".place":
         from arch import parse_placement
         board_pos, _ = parse_placement(input_file)